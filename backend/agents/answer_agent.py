@@ -1,53 +1,471 @@
 #!/usr/bin/env python3
 """
 💬 Answer Agent - Provides intelligent answers to user questions
-Uses Groq API and context from memory to generate responses
+Uses an OpenAI-compatible LLM (Groq by default) and context from memory to generate responses
 """
 
 import os
-
-import json
-import requests
-from flask import Flask, request, jsonify
+import re
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from flask import Flask, Blueprint, current_app, request, jsonify, Response, stream_with_context
 from datetime import datetime
 import logging
+import atexit
+from werkzeug.local import LocalProxy
 from dotenv import load_dotenv
 load_dotenv()
 
+from llm import RetryableError, create_backend
+import metrics
+import wire
+from metrics import timed
+from wire import dumps_json
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+bp = Blueprint('answer', __name__)
+
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "32"))
+GROQ_ERROR_MESSAGE = "I'm having trouble connecting to my knowledge base. Please try again later."
+
+
+# Response cache in front of the LLM
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Estimated Jaccard similarity needed for a near-duplicate hit; 0 disables the tier
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+def fingerprint(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word unigrams and bigrams"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, normalized):
+        words = normalized.split()
+        shingles = set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+        if not shingles:
+            return None
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+            for s in shingles
+        ]
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self.params
+        )
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class ResponseCache:
+    """LRU + TTL cache of answers keyed on normalized question and context"""
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, max_bytes=ANSWER_CACHE_MAX_BYTES,
+                 ttl=ANSWER_CACHE_TTL, similarity=ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self.minhash = MinHasher() if similarity > 0 else None
+        self._entries = OrderedDict()
+        self._by_context = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits_exact": 0, "hits_similar": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _key(self, normalized, context_fp):
+        return fingerprint(f"{normalized}\0{context_fp}")
+
+    def get(self, question, context):
+        """Return (answer, tier) on a hit, (None, None) on a miss"""
+        normalized = normalize_question(question)
+        context_fp = fingerprint(context)
+        key = self._key(normalized, context_fp)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["expires"] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits_exact"] += 1
+                    return entry["answer"], "exact"
+                self._remove(key)
+                self.stats["expired"] += 1
+
+            # Near-duplicates are only considered under the same context
+            if self.minhash is not None:
+                candidates = list(self._by_context.get(context_fp, ()))
+                signature = self.minhash.signature(normalized) if candidates else None
+                best_key, best_score = None, self.similarity
+                for candidate in candidates if signature else ():
+                    entry = self._entries[candidate]
+                    if entry["expires"] <= now or entry["signature"] is None:
+                        continue
+                    score = MinHasher.similarity(signature, entry["signature"])
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.stats["hits_similar"] += 1
+                    return self._entries[best_key]["answer"], "similar"
+
+            self.stats["misses"] += 1
+            return None, None
+
+    def put(self, question, context, answer):
+        normalized = normalize_question(question)
+        context_fp = fingerprint(context)
+        key = self._key(normalized, context_fp)
+        entry = {
+            "answer": answer,
+            "context": context_fp,
+            "signature": self.minhash.signature(normalized) if self.minhash else None,
+            "expires": time.monotonic() + self.ttl,
+            "size": len(answer) + len(normalized) + 256,
+        }
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._by_context.setdefault(context_fp, set()).add(key)
+            self._bytes += entry["size"]
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        keys = self._by_context.get(entry["context"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry["context"]]
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits_exact"] + self.stats["hits_similar"] + self.stats["misses"]
+            hits = self.stats["hits_exact"] + self.stats["hits_similar"]
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes,
+                        hit_rate=hits / lookups if lookups else 0.0)
+
+
+# Upstream call scheduling for the LLM API. The limits are per process, and
+# run_answer.sh runs a single worker so they are the service's real limits
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+GROQ_RATE_PER_MINUTE = float(os.getenv("GROQ_RATE_PER_MINUTE", "30"))
+GROQ_BURST = int(os.getenv("GROQ_BURST", "5"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "8"))
+# No retry starts once a call has spent this long; keep it under the master's ANSWER_AGENT_TIMEOUT
+GROQ_RETRY_BUDGET = float(os.getenv("GROQ_RETRY_BUDGET", "25"))
+# Longest a request waits for a rate-limit token and a concurrency slot
+GROQ_QUEUE_TIMEOUT = float(os.getenv("GROQ_QUEUE_TIMEOUT", "15"))
+
+class UpstreamBusy(Exception):
+    """No rate-limit token or concurrency slot became free in time"""
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else timeout
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class UpstreamScheduler:
+    """Bounded, rate-limited, single-flight access to the LLM API with jittered retries"""
+
+    def __init__(self, max_concurrency=GROQ_MAX_CONCURRENCY, rate_per_minute=GROQ_RATE_PER_MINUTE,
+                 burst=GROQ_BURST, max_retries=GROQ_MAX_RETRIES, backoff_base=GROQ_BACKOFF_BASE,
+                 backoff_max=GROQ_BACKOFF_MAX, queue_timeout=GROQ_QUEUE_TIMEOUT,
+                 retry_budget=GROQ_RETRY_BUDGET):
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.retry_budget = retry_budget
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "retries": 0, "rejected": 0, "failed": 0}
+
+    @contextmanager
+    def slot(self):
+        """Hold one rate-limit token and one concurrency slot"""
+        deadline = time.monotonic() + self.queue_timeout
+        if not self.bucket.acquire(self.queue_timeout):
+            self.count("rejected")
+            raise UpstreamBusy("rate limit queue timed out")
+        if not self.slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            self.count("rejected")
+            raise UpstreamBusy("concurrency queue timed out")
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    def call(self, key, fn):
+        """Run fn() under the limits; concurrent calls with the same key share one result"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.stats["calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = self.run_with_retries(fn)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def run_with_retries(self, fn):
+        attempt = 0
+        deadline = time.monotonic() + self.retry_budget
+        while True:
+            try:
+                with self.slot():
+                    return fn()
+            except RetryableError as e:
+                attempt += 1
+                delay = self.retry_delay(attempt, e.retry_after, deadline)
+                if delay is None:
+                    self.count("failed")
+                    raise
+                self.count("retries")
+                time.sleep(delay)
+
+    def retry_delay(self, attempt, retry_after, deadline):
+        """Backoff before retry `attempt`, or None once retries or the time budget run out"""
+        if attempt > self.max_retries:
+            return None
+        delay = self.backoff(attempt, retry_after)
+        return delay if time.monotonic() + delay < deadline else None
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        metrics.count("holomentor_upstream_events_total", help_text="LLM scheduler retries, rejections and failures",
+                      event=name)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, inflight=len(self._inflight))
+
+
+# Prompt context budget, in estimated tokens
+ANSWER_CONTEXT_TOKENS = int(os.getenv("ANSWER_CONTEXT_TOKENS", "600"))
+ANSWER_ITEM_TOKENS = int(os.getenv("ANSWER_ITEM_TOKENS", "120"))
+ANSWER_SUMMARY_TOKENS = int(os.getenv("ANSWER_SUMMARY_TOKENS", "150"))
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Cheap BPE-style estimate: one token per word or symbol, plus one per 6 chars of long words"""
+    return sum(1 + len(piece) // 6 for piece in _TOKEN_RE.findall(text))
+
+
+def truncate_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    for match in _TOKEN_RE.finditer(text):
+        used += 1 + len(match.group()) // 6
+        if used > max_tokens:
+            return text[:match.start()].rstrip() + "…"
+    return text
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps_json(data).decode('utf-8')}\n\n"
+
 
 class AnswerAgent:
-    def __init__(self):
-        # Set Groq API key directly
-        self.groq_api_key = os.getenv("GROQ_API_KEY")
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.model = "llama3-8b-8192"
-
-        if not self.groq_api_key:
-            logger.warning("⚠️ GROQ API key not found. Using fallback responses.")
+    def __init__(self, llm=None):
+        self.llm = llm if llm is not None else create_backend(timeout=GROQ_TIMEOUT, pool_size=GROQ_POOL_SIZE)
+        self.cache = ResponseCache() if ANSWER_CACHE else None
+        self.scheduler = UpstreamScheduler()
+
+        if not self.llm:
+            logger.warning("⚠️ No LLM backend configured. Using fallback responses.")
         else:
-            logger.info("✅ Groq API key loaded successfully")
+            logger.info(f"✅ LLM backend ready: {self.llm.name} {self.llm.model} at {self.llm.api_url}")
 
-    def generate_answer(self, question, user_id, memory_context=None):
+    def close(self):
+        """Close pooled upstream connections"""
+        if self.llm:
+            self.llm.close()
+
+    def generate_answer(self, question, user_id, memory_context=None, use_cache=True):
         try:
-            context = self.build_context(user_id, memory_context)
+            context = self.build_context(user_id, memory_context, question)
             prompt = self.create_prompt(question, user_id, context)
 
-            if self.groq_api_key:
-                return self.get_groq_response(prompt)
+            if self.llm:
+                cache = self.cache if use_cache else None
+                if cache:
+                    cache_context = self.cache_context(user_id, memory_context, question)
+                    answer, tier = cache.get(question, cache_context)
+                    metrics.count("holomentor_answer_cache_total", help_text="Answer cache lookups",
+                                  result=tier or "miss")
+                    if answer is not None:
+                        logger.info(f"✅ Answer cache hit ({tier}) for {user_id}")
+                        return answer
+
+                answer = self.get_llm_response(prompt)
+                if cache and answer != GROQ_ERROR_MESSAGE:
+                    cache.put(question, cache_context, answer)
+                return answer
             else:
                 return self.get_fallback_response(question, user_id, context)
         except Exception as e:
             logger.error(f"❌ Error generating answer: {str(e)}")
             return "Sorry, I'm having trouble answering right now."
 
-    def build_context(self, user_id, memory_context):
-        if not memory_context or not memory_context.get('recent_interactions'):
+    def stream_answer(self, question, user_id, memory_context=None, use_cache=True):
+        """Yield the answer in chunks as the model produces them; returns True if it completed"""
+        try:
+            context = self.build_context(user_id, memory_context, question)
+            prompt = self.create_prompt(question, user_id, context)
+
+            if self.llm:
+                cache = self.cache if use_cache else None
+                if cache:
+                    cache_context = self.cache_context(user_id, memory_context, question)
+                    answer, tier = cache.get(question, cache_context)
+                    metrics.count("holomentor_answer_cache_total", help_text="Answer cache lookups",
+                                  result=tier or "miss")
+                    if answer is not None:
+                        logger.info(f"✅ Answer cache hit ({tier}) for {user_id}")
+                        yield answer
+                        return True
+
+                chunks = []
+                stream = self.stream_llm_response(prompt)
+                while True:
+                    try:
+                        chunk = next(stream)
+                    except StopIteration as done:
+                        complete = done.value
+                        break
+                    chunks.append(chunk)
+                    yield chunk
+
+                # Only a stream that reached [DONE] is worth caching
+                if cache and complete:
+                    cache.put(question, cache_context, "".join(chunks).strip())
+                return complete
+            else:
+                yield self.get_fallback_response(question, user_id, context)
+                return True
+        except Exception as e:
+            logger.error(f"❌ Error streaming answer: {str(e)}")
+            yield "Sorry, I'm having trouble answering right now."
+            return False
+
+    def cache_context(self, user_id, memory_context, question):
+        """build_context() without what changes every turn, for the answer cache key
+
+        The interaction count and timestamps are dropped, and so are earlier asks of
+        this same question, whose answer is what the cache would return anyway. The
+        user id stays in: answers greet the user by it and draw on their history.
+        """
+        if not memory_context:
+            return self.build_context(user_id, memory_context, question)
+        normalized = normalize_question(question)
+
+        def stable(interactions):
+            return [{'question': i['question'], 'answer': i['answer']} for i in interactions or ()
+                    if normalize_question(i['question']) != normalized]
+
+        return self.build_context(user_id, {
+            'summary': memory_context.get('summary'),
+            'recent_interactions': stable(memory_context.get('recent_interactions')),
+            'relevant_interactions': stable(memory_context.get('relevant_interactions')),
+        }, question)
+
+    @timed("answer_build_context")
+    def build_context(self, user_id, memory_context, question=None, budget=ANSWER_CONTEXT_TOKENS):
+        """Assemble memory context that fits in `budget` estimated tokens"""
+        if not memory_context or not (memory_context.get('recent_interactions') or
+                                      memory_context.get('relevant_interactions')):
             return f"This is a new conversation with {user_id}."
 
         context_parts = []
@@ -56,13 +474,54 @@ class AnswerAgent:
         if total_interactions > 0:
             context_parts.append(f"I've spoken with {user_id} {total_interactions} times before.")
 
-        recent = memory_context.get('recent_interactions', [])[:3]
-        for interaction in recent:
-            context_parts.append(f"Q: {interaction['question']}")
-            context_parts.append(f"A: {interaction['answer']}")
+        summary = memory_context.get('summary')
+        if summary:
+            # Summary lines run oldest to newest; keep the newest that fit
+            kept, used = [], 0
+            for line in reversed(summary.split("\n")):
+                used += estimate_tokens(line)
+                if used > ANSWER_SUMMARY_TOKENS:
+                    break
+                kept.append(line)
+            if kept:
+                context_parts.append("Earlier topics:")
+                context_parts.append("\n".join(reversed(kept)))
+
+        remaining = budget - sum(estimate_tokens(part) for part in context_parts)
+        for interaction in self.rank_interactions(memory_context, question):
+            block = (f"Q: {truncate_tokens(interaction['question'], ANSWER_ITEM_TOKENS // 3)}\n"
+                     f"A: {truncate_tokens(interaction['answer'], ANSWER_ITEM_TOKENS)}")
+            cost = estimate_tokens(block)
+            if cost > remaining:
+                continue
+            context_parts.append(block)
+            remaining -= cost
 
         return "\n".join(context_parts)
 
+    def rank_interactions(self, memory_context, question=None):
+        """Order recent and relevant interactions by word overlap with the question, then recency"""
+        question_words = set(re.findall(r"\w+", question.lower())) if question else set()
+        candidates = {}
+
+        recent = memory_context.get('recent_interactions', [])
+        for rank, interaction in enumerate(recent):
+            key = (interaction['question'], interaction.get('timestamp'))
+            candidates[key] = [interaction, 1.0 / (1 + rank)]
+
+        for interaction in memory_context.get('relevant_interactions', []):
+            key = (interaction['question'], interaction.get('timestamp'))
+            candidates.setdefault(key, [interaction, 0.0])
+
+        for entry in candidates.values():
+            interaction = entry[0]
+            if question_words:
+                words = set(re.findall(r"\w+", f"{interaction['question']} {interaction['answer']}".lower()))
+                entry[1] += 3.0 * len(question_words & words) / len(question_words)
+
+        ranked = sorted(candidates.values(), key=lambda entry: entry[1], reverse=True)
+        return [interaction for interaction, _ in ranked]
+
     def create_prompt(self, question, user_id, context):
         return f"""You are HoloMentor, an intelligent AI assistant. You provide helpful, accurate, and engaging responses.
 
@@ -80,50 +539,112 @@ Instructions:
 
 Please respond:"""
 
-    def get_groq_response(self, prompt):
-        headers = {
-            "Authorization": f"Bearer {self.groq_api_key}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": "You are HoloMentor, a helpful AI assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 500
-        }
-
+    @timed("answer_llm")
+    def get_llm_response(self, prompt):
         try:
-            res = requests.post(self.api_url, headers=headers, json=payload)
-            res.raise_for_status()
-            return res.json()["choices"][0]["message"]["content"].strip()
+            # Identical prompts in flight at the same time share one upstream call
+            key = fingerprint(f"{self.llm.model}\0{prompt}")
+            return self.scheduler.call(key, lambda: self.llm.complete(prompt))
         except Exception as e:
-            logger.error(f"Groq API error: {str(e)}")
-            return "I'm having trouble connecting to my knowledge base. Please try again later."
+            logger.error(f"LLM API error: {str(e)}")
+            return GROQ_ERROR_MESSAGE
+
+    def stream_llm_response(self, prompt):
+        """Yield content deltas from the LLM backend's stream"""
+        produced = False
+        complete = False
+        attempt = 0
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.scheduler.retry_budget
+
+        while True:
+            try:
+                with self.scheduler.slot():
+                    stream = self.llm.stream(prompt)
+                    while True:
+                        try:
+                            delta = next(stream)
+                        except StopIteration as done:
+                            complete = done.value
+                            break
+                        if not produced:
+                            metrics.observe("answer_llm_first_token", time.perf_counter() - started)
+                        produced = True
+                        yield delta
+                return complete
+            except RetryableError as e:
+                # Retrying is only safe before the user has seen any tokens
+                attempt += 1
+                delay = None if produced else self.scheduler.retry_delay(attempt, e.retry_after, deadline)
+                if delay is None:
+                    logger.error(f"LLM streaming error: {str(e)}")
+                    break
+                self.scheduler.count("retries")
+                time.sleep(delay)
+            except Exception as e:
+                logger.error(f"LLM streaming error: {str(e)}")
+                break
+
+        if not produced:
+            yield GROQ_ERROR_MESSAGE
+        return complete
 
     def get_fallback_response(self, question, user_id, context):
-        return f"(Fallback mode) Hi {user_id}, I see your question: '{question}'. Memory: {context[:100]}..."
-
-# Initialize agent
-answer_agent = AnswerAgent()
-
-@app.route('/answer', methods=['POST'])
+        return f"(Fallback mode) Hi {user_id}, I see your question: '{question}'. Memory: {truncate_tokens(context, 25)}"
+
+def create_app():
+    """App factory: one AnswerAgent (cache, HTTP session) per worker process"""
+    app = Flask(__name__)
+    agent = AnswerAgent()
+    app.extensions["agent"] = agent
+    app.register_blueprint(bp)
+    metrics.init_app(app, "answer")
+    wire.init_app(app)
+    atexit.register(agent.close)
+    return app
+
+# The current app's answer agent
+answer_agent = LocalProxy(lambda: current_app.extensions["agent"])
+
+@bp.route('/answer', methods=['POST'])
 def generate_answer():
     try:
-        data = request.json
+        data = wire.read_body()
         question = data.get('question')
         user_id = data.get('user_id')
         memory_context = data.get('memory_context', {})
+        # Per-request opt-out: {"cache": false} or Cache-Control: no-cache
+        use_cache = data.get('cache', True) is not False and \
+            'no-cache' not in request.headers.get('Cache-Control', '')
 
         if not question or not user_id:
             return jsonify({"error": "Missing question or user_id"}), 400
 
-        answer = answer_agent.generate_answer(question, user_id, memory_context)
-
-        return jsonify({
+        if request.args.get('stream') == '1':
+            def events():
+                stream = answer_agent.stream_answer(question, user_id, memory_context, use_cache)
+                while True:
+                    try:
+                        chunk = next(stream)
+                    except StopIteration as done:
+                        complete = done.value
+                        break
+                    yield sse_event({"token": chunk})
+                # A cut-off answer ends with an error event so callers do not keep it
+                if complete:
+                    yield sse_event({"status": "success", "complete": True}, event="done")
+                else:
+                    yield sse_event({"status": "error", "error": "Answer stream ended early"}, event="error")
+
+            return Response(stream_with_context(events()), mimetype='text/event-stream',
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+        answer = answer_agent.generate_answer(question, user_id, memory_context, use_cache)
+        if wire.wants_minimal():
+            # The caller already has the question and user_id it sent
+            return wire.respond({"answer": answer})
+
+        return wire.respond({
             "question": question,
             "answer": answer,
             "user_id": user_id,
@@ -135,16 +656,27 @@ def generate_answer():
         logger.error(f"Error in /answer endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/health', methods=['GET'])
+@bp.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         "status": "healthy",
         "agent": "answer",
-        "groq_configured": bool(answer_agent.groq_api_key),
+        "groq_configured": bool(answer_agent.llm),
+        "llm_backend": answer_agent.llm.name if answer_agent.llm else "template",
         "timestamp": datetime.now().isoformat()
     })
 
-@app.route('/test', methods=['GET'])
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if not answer_agent.cache:
+        return jsonify({"enabled": False})
+    return jsonify(dict(answer_agent.cache.snapshot(), enabled=True))
+
+@bp.route('/upstream/stats', methods=['GET'])
+def upstream_stats():
+    return jsonify(answer_agent.scheduler.snapshot())
+
+@bp.route('/test', methods=['GET'])
 def test_endpoint():
     return jsonify({
         "message": "Answer Agent is working!",
@@ -154,4 +686,4 @@ def test_endpoint():
 
 if __name__ == '__main__':
     print("💬 Starting Answer Agent on port 5002...")
-    app.run(host='0.0.0.0', port=5002, debug=True)
+    create_app().run(host='0.0.0.0', port=5002, debug=os.getenv("FLASK_DEBUG", "1") == "1")
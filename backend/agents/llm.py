@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+🧠 LLM backends - how the Answer Agent talks to a language model
+"openai" speaks the OpenAI chat-completions API (Groq by default, or any
+compatible server such as backend/bench/mock_llm.py); "template" disables the
+model so AnswerAgent answers from its fallback templates.
+"""
+
+import os
+import json
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama3-8b-8192"
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_API_URL = os.getenv("LLM_API_URL", GROQ_API_URL)
+LLM_MODEL = os.getenv("LLM_MODEL", GROQ_MODEL)
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "500"))
+
+SYSTEM_PROMPT = "You are HoloMentor, a helpful AI assistant."
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    """Upstream failure worth retrying; retry_after is the server's hint in seconds"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def raise_for_upstream(res):
+    """Turn retryable HTTP statuses into RetryableError, others into HTTPError"""
+    if res.status_code in RETRYABLE_STATUS:
+        retry_after = res.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        raise RetryableError(f"upstream returned {res.status_code}", retry_after)
+    res.raise_for_status()
+
+
+class OpenAIBackend:
+    """Chat completions over HTTP against an OpenAI-compatible endpoint"""
+
+    name = "openai"
+
+    def __init__(self, api_url, api_key, model, timeout=30, pool_size=32):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        # Keep-alive connections to the LLM API, reused across requests
+        self.http = requests.Session()
+        self.http.mount("https://", HTTPAdapter(pool_maxsize=pool_size))
+        self.http.mount("http://", HTTPAdapter(pool_maxsize=pool_size))
+
+    def request(self, prompt, stream=False):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": LLM_TEMPERATURE,
+            "max_tokens": LLM_MAX_TOKENS,
+            "stream": stream
+        }
+        return headers, payload
+
+    def post(self, prompt, stream=False):
+        headers, payload = self.request(prompt, stream)
+        try:
+            res = self.http.post(self.api_url, headers=headers, json=payload,
+                                 timeout=self.timeout, stream=stream)
+        except requests.Timeout:
+            # The attempt already used the whole timeout; retrying would outlive the caller
+            raise
+        except requests.ConnectionError as e:
+            raise RetryableError(str(e))
+        if res.status_code >= 400:
+            res.close()
+        raise_for_upstream(res)
+        return res
+
+    def complete(self, prompt):
+        """Return the full completion text"""
+        res = self.post(prompt)
+        return res.json()["choices"][0]["message"]["content"].strip()
+
+    def stream(self, prompt):
+        """Yield content deltas from the SSE stream; returns True if it reached [DONE]"""
+        with self.post(prompt, stream=True) as res:
+            for line in res.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return True
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        return False
+
+    def close(self):
+        self.http.close()
+
+
+def create_backend(kind=LLM_BACKEND, api_url=LLM_API_URL, model=LLM_MODEL, api_key=None,
+                   timeout=30, pool_size=32):
+    """Build the configured backend, or None when answers should come from templates"""
+    if kind == "template":
+        return None
+    if kind != "openai":
+        raise ValueError(f"Unknown LLM backend: {kind}")
+
+    api_key = api_key or os.getenv("LLM_API_KEY") or os.getenv("GROQ_API_KEY")
+    # A key is only mandatory for the hosted API; local servers usually take none
+    if not api_key and api_url == GROQ_API_URL:
+        return None
+    return OpenAIBackend(api_url, api_key, model, timeout, pool_size)
@@ -5,42 +5,390 @@ Handles messages between agents and coordinates the workflow
 """
 
 import os
-import json
-import requests
-from flask import Flask, request, jsonify
+import re
+import math
+import uuid
+import time
+import threading
+import atexit
+import contextvars
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import Flask, Blueprint, current_app, request, jsonify, Response, stream_with_context
 from datetime import datetime
 import logging
+from werkzeug.local import LocalProxy
 from flask_cors import CORS  # 🔌 Enable CORS
+from transport import AgentError, create_transports
+import metrics
+import wire
+from metrics import timed
+from wire import dumps_json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)  # 🔌 Allow frontend access from browser
+bp = Blueprint('master', __name__)
+
+# Agent endpoints; each may list several replicas, comma-separated
+MEMORY_AGENT_URL = os.getenv("MEMORY_AGENT_URL", "http://localhost:5001")
+ANSWER_AGENT_URL = os.getenv("ANSWER_AGENT_URL", "http://localhost:5002")
+# "http" for separate agent services, "inprocess" to run all agents in this process
+AGENT_TRANSPORT = os.getenv("AGENT_TRANSPORT", "http")
+
+# Per-hop timeouts in seconds: (connect, read)
+CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", "0.5"))
+MEMORY_TIMEOUT = float(os.getenv("MEMORY_AGENT_TIMEOUT", "1.0"))
+ANSWER_TIMEOUT = float(os.getenv("ANSWER_AGENT_TIMEOUT", "30.0"))
+SAVE_TIMEOUT = float(os.getenv("SAVE_AGENT_TIMEOUT", "2.0"))
+# Upper bound on the whole memory -> answer chain
+REQUEST_BUDGET = float(os.getenv("PROCESS_REQUEST_BUDGET", "35.0"))
+# Only what AnswerAgent.build_context reads is fetched and forwarded
+MEMORY_CONTEXT_LIMIT = int(os.getenv("MEMORY_CONTEXT_LIMIT", "5"))
+MEMORY_RELEVANT_LIMIT = int(os.getenv("MEMORY_RELEVANT_LIMIT", "5"))
+MEMORY_CONTEXT_FIELDS = ("user_id", "total_interactions", "summary", "recent_interactions", "relevant_interactions")
+HTTP_POOL_SIZE = int(os.getenv("AGENT_HTTP_POOL_SIZE", "32"))
+SAVE_WORKERS = int(os.getenv("SAVE_WORKERS", "4"))
+
+# Admission control: requests running the memory -> answer chain at once, and how many may wait
+MAX_INFLIGHT = int(os.getenv("MASTER_MAX_INFLIGHT", "8"))
+MAX_QUEUED = int(os.getenv("MASTER_MAX_QUEUED", "32"))
+# One user may hold at most this many queue slots, so a chatty user can't starve the rest
+MAX_QUEUED_PER_USER = int(os.getenv("MASTER_MAX_QUEUED_PER_USER", "4"))
+QUEUE_TIMEOUT = float(os.getenv("MASTER_QUEUE_TIMEOUT", "10"))
+# Served in this order; within a class users take turns
+PRIORITIES = ("high", "normal", "low")
+# Asynchronous /process jobs: workers, how many may be pending, how long results are kept
+JOB_WORKERS = int(os.getenv("MASTER_JOB_WORKERS", "4"))
+MAX_PENDING_JOBS = int(os.getenv("MASTER_MAX_PENDING_JOBS", "256"))
+MAX_PENDING_JOBS_PER_USER = int(os.getenv("MASTER_MAX_PENDING_JOBS_PER_USER", "16"))
+JOB_TTL = float(os.getenv("MASTER_JOB_TTL", "600"))
+JOB_QUEUE_TIMEOUT = float(os.getenv("MASTER_JOB_QUEUE_TIMEOUT", "300"))
+JOB_MAX_WAIT = 30
+
+# Identity extraction: only the start of a message is scanned for an introduction
+IDENTITY_SCAN_CHARS = 200
+IDENTITY_PATTERN = re.compile(r"""
+    (?=[mnic]) \b
+    (?: my \s+ name (?: \s+ is | ['’]s )
+      | name ['’]s
+      | (?P<i_am> i (?: ['’]m | m ) | (?P<long_form> i \s+ am ) )
+      | call \s+ me
+    )
+    [\s,:]+ (?P<name> [^\W\d_] [\w'’-]{0,39} )
+""", re.VERBOSE)
+# Words that follow "I'm" / "I am" without being a name
+NOT_NAMES = frozenset("""
+    a an the not so very just really also still here there back new fine good great ok okay
+    well sure sorry glad happy sad tired going trying looking doing working learning
+    interested curious confused stuck from in at on with about ready done
+    unable able afraid aware lost unsure struggling wondering asking having using
+""".split())
+# Remembered identities, keyed by client-supplied session id
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps_json(data).decode('utf-8')}\n\n"
+
+
+class SessionCache:
+    """Bounded LRU of session key -> user_id with a time-to-live"""
+
+    def __init__(self, max_sessions=SESSION_CACHE_SIZE, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def put(self, key, user_id):
+        with self._lock:
+            self._entries[key] = (user_id, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+
+def session_key(data):
+    """Client-supplied session id, or None: clients behind one NAT/proxy share an address"""
+    explicit = request.headers.get("X-Session-ID") or data.get("session_id")
+    return f"session:{explicit}" if explicit else None
+
+
+class Overloaded(Exception):
+    """A request was shed; `status` is 429 (this user is over its share) or 503 (server busy)"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded admission for /process work with priority classes and per-user fairness
+
+    Up to max_inflight requests run at once. Others wait in a queue per
+    priority, where each user has their own FIFO and users are served
+    round-robin. Requests beyond the queue bounds, or that wait longer than
+    their timeout, are shed with a Retry-After estimate instead of piling up.
+    """
+
+    def __init__(self, max_inflight=MAX_INFLIGHT, max_queued=MAX_QUEUED, max_queued_per_user=MAX_QUEUED_PER_USER):
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.inflight = 0
+        self.queued = 0
+        # priority -> user_id -> deque of waiting tickets, users in round-robin order
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        # Smoothed seconds a request holds its slot, for Retry-After
+        self._service_time = 1.0
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "waited": 0, "shed_busy": 0, "shed_user": 0, "timed_out": 0}
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, assuming the queue drains at the current pace"""
+        return max(1, math.ceil(self._service_time * (self.queued + 1) / self.max_inflight))
+
+    def acquire(self, user_id, priority="normal", timeout=QUEUE_TIMEOUT):
+        started = time.monotonic()
+        with self._lock:
+            if self.inflight < self.max_inflight and not self.queued:
+                self.inflight += 1
+                self._record("admitted")
+                return
+            waiting = self._queues[priority].get(user_id)
+            if waiting is not None and len(waiting) >= self.max_queued_per_user:
+                self._record("shed_user")
+                raise Overloaded("Too many requests queued for this user", 429, self.retry_after())
+            if self.queued >= self.max_queued:
+                self._record("shed_busy")
+                raise Overloaded("Server is busy", 503, self.retry_after())
+
+            ticket = threading.Event()
+            self._queues[priority].setdefault(user_id, deque()).append(ticket)
+            self.queued += 1
+            self._record("waited")
+
+        granted = ticket.wait(timeout)
+        with self._lock:
+            if not granted and not ticket.is_set():
+                waiting = self._queues[priority][user_id]
+                waiting.remove(ticket)
+                if not waiting:
+                    del self._queues[priority][user_id]
+                self.queued -= 1
+                self._record("timed_out")
+                raise Overloaded("Timed out waiting for capacity", 503, self.retry_after())
+        metrics.observe("master_admission_wait", time.monotonic() - started, priority=priority)
+
+    def release(self, held_for):
+        with self._lock:
+            self._service_time += 0.2 * (held_for - self._service_time)
+            for users in self._queues.values():
+                if users:
+                    user_id, waiting = next(iter(users.items()))
+                    ticket = waiting.popleft()
+                    if waiting:
+                        users.move_to_end(user_id)
+                    else:
+                        del users[user_id]
+                    self.queued -= 1
+                    # The slot passes straight to the next request, inflight is unchanged
+                    ticket.set()
+                    return
+            self.inflight -= 1
+
+    @contextmanager
+    def admit(self, user_id, priority="normal", timeout=QUEUE_TIMEOUT):
+        self.acquire(user_id, priority, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def _record(self, outcome):
+        self.stats[outcome] += 1
+        metrics.count("holomentor_admission_total", help_text="Admission decisions for /process",
+                      outcome=outcome)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                inflight=self.inflight,
+                max_inflight=self.max_inflight,
+                queued=self.queued,
+                max_queued=self.max_queued,
+                queued_by_priority={p: sum(map(len, users.values())) for p, users in self._queues.items()},
+                service_time_s=round(self._service_time, 3)
+            )
+
+
+class JobStore:
+    """Asynchronous /process jobs by id; finished jobs are kept for JOB_TTL seconds
+
+    Waiting jobs sit in per-user queues that take() serves in turn, so one user's
+    backlog cannot push everyone else's jobs to the back.
+    """
+
+    def __init__(self, ttl=JOB_TTL, max_pending=MAX_PENDING_JOBS, max_pending_per_user=MAX_PENDING_JOBS_PER_USER):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_pending_per_user = max_pending_per_user
+        self.pending = 0
+        self._pending_by_user = {}
+        self._waiting = OrderedDict()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, user_id, work, retry_after):
+        """Queue `work` as a new job and return its id; raises Overloaded when the store
+        (503) or this user's share of it (429) is full"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            if self.pending >= self.max_pending:
+                raise Overloaded("Too many pending jobs", 503, retry_after())
+            if self._pending_by_user.get(user_id, 0) >= self.max_pending_per_user:
+                raise Overloaded("Too many pending jobs for this user", 429, retry_after())
+            self.pending += 1
+            self._pending_by_user[user_id] = self._pending_by_user.get(user_id, 0) + 1
+            self._waiting.setdefault(user_id, deque()).append((job_id, work))
+            self._jobs[job_id] = {
+                "job": {"job_id": job_id, "user_id": user_id, "status": "queued",
+                        "created": datetime.now().isoformat()},
+                "done": threading.Event(),
+                "expires": None
+            }
+        return job_id
+
+    def take(self):
+        """(job_id, work) of the next waiting job, taking users in turn"""
+        with self._lock:
+            user_id, waiting = self._waiting.popitem(last=False)
+            job = waiting.popleft()
+            if waiting:
+                # Back of the line until every other waiting user has had a turn
+                self._waiting[user_id] = waiting
+            return job
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return
+            entry["job"].update(fields)
+            if fields.get("status") in ("done", "error"):
+                self.pending -= 1
+                user_id = entry["job"]["user_id"]
+                self._pending_by_user[user_id] -= 1
+                if not self._pending_by_user[user_id]:
+                    del self._pending_by_user[user_id]
+                entry["expires"] = time.monotonic() + self.ttl
+                entry["done"].set()
+
+    def get(self, job_id, wait=0):
+        """The job's current state, waiting up to `wait` seconds for it to finish"""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return None
+        if wait:
+            entry["done"].wait(wait)
+        with self._lock:
+            return dict(entry["job"])
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, entry in self._jobs.items()
+                   if entry["expires"] is not None and entry["expires"] < now]
+        for job_id in expired:
+            del self._jobs[job_id]
 
-# Agent endpoints
-MEMORY_AGENT_URL = "http://localhost:5001"
-ANSWER_AGENT_URL = "http://localhost:5002"
 
 class MasterAgent:
-    def __init__(self):
-        self.session_data = {}
+    def __init__(self, transport=AGENT_TRANSPORT):
+        # Session key -> resolved user_id, so follow-up messages skip extraction
+        self.session_data = SessionCache()
+        self.memory, self.answer = create_transports(
+            transport, MEMORY_AGENT_URL, ANSWER_AGENT_URL, HTTP_POOL_SIZE
+        )
+        # Saves run off the request path; the pool bounds how many are in flight
+        self.save_executor = ThreadPoolExecutor(max_workers=SAVE_WORKERS, thread_name_prefix="save")
+        self.admission = AdmissionController()
+        self.jobs = JobStore()
+        self.job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+    def close(self):
+        """Finish pending jobs and saves, then close pooled connections"""
+        self.job_executor.shutdown(wait=True)
+        self.save_executor.shutdown(wait=True)
+        self.memory.close()
+        self.answer.close()
+
+    def submit_job(self, user_input, user_id, priority="low"):
+        """Run /process in the background; returns the job id to poll"""
+        work = (contextvars.copy_context(), user_input, user_id, priority)
+        job_id = self.jobs.create(user_id, work, self.admission.retry_after)
+        # One executor task per job, but each runs whichever job is next in turn
+        self.job_executor.submit(self.run_next_job)
+        return job_id
+
+    def run_next_job(self):
+        job_id, (context, user_input, user_id, priority) = self.jobs.take()
+        context.run(self.run_job, job_id, user_input, user_id, priority)
+
+    def run_job(self, job_id, user_input, user_id, priority):
+        try:
+            # Jobs go through the same admission queue as synchronous requests
+            with self.admission.admit(user_id, priority, JOB_QUEUE_TIMEOUT):
+                self.jobs.update(job_id, status="running")
+                result = self.process_user_request(user_input, user_id)
+            if result.get("status") == "success":
+                self.jobs.update(job_id, status="done", result=result)
+            else:
+                self.jobs.update(job_id, status="error", error=result.get("error"))
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} failed: {str(e)}")
+            self.jobs.update(job_id, status="error", error=str(e))
 
-    def process_user_request(self, user_input, user_id=None):
+    @timed("master_process")
+    def process_user_request(self, user_input, user_id=None, session_key=None):
         try:
-            if not user_id:
-                user_id = self.extract_user_id(user_input)
+            user_id = self.resolve_user_id(user_input, user_id, session_key)
 
-            memory_context = self.get_user_memory(user_id)
-            answer = self.get_answer(user_input, memory_context, user_id)
-            self.save_interaction(user_id, user_input, answer)
+            deadline = time.monotonic() + REQUEST_BUDGET
+            memory_context = self.get_user_memory(user_id, user_input)
+            answer = self.get_answer(user_input, memory_context, user_id, deadline)
+            # Fire-and-forget: the user gets the answer without waiting on the save
+            timestamp = datetime.now().isoformat()
+            self.save_executor.submit(contextvars.copy_context().run, self.save_interaction,
+                                      user_id, user_input, answer, timestamp)
 
             response = {
                 "user_id": user_id,
                 "question": user_input,
                 "answer": answer,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "status": "success"
             }
 
@@ -54,96 +402,260 @@ class MasterAgent:
                 "status": "error"
             }
 
-    def extract_user_id(self, user_input):
-        words = user_input.lower().split()
+    def stream_user_request(self, user_input, user_id=None, session_key=None):
+        """Relay answer tokens as server-sent events, saving once the stream completes"""
+        user_id = self.resolve_user_id(user_input, user_id, session_key)
 
-        if "i'm" in words:
-            try:
-                idx = words.index("i'm")
-                if idx + 1 < len(words):
-                    return words[idx + 1].capitalize()
-            except:
-                pass
+        yield sse_event({"user_id": user_id}, event="start")
 
-        if "my name is" in user_input.lower():
+        deadline = time.monotonic() + REQUEST_BUDGET
+        memory_context = self.get_user_memory(user_id, user_input)
+        chunks = []
+        stream = self.stream_answer(user_input, memory_context, user_id, deadline)
+        while True:
             try:
-                parts = user_input.lower().split("my name is")
-                if len(parts) > 1:
-                    name = parts[1].strip().split()[0]
-                    return name.capitalize()
-            except:
-                pass
+                chunk = next(stream)
+            except StopIteration as done:
+                complete = done.value
+                break
+            chunks.append(chunk)
+            yield sse_event({"token": chunk})
+
+        if not complete:
+            # A cut-off answer is neither saved nor reported as a success
+            logger.warning(f"⚠️ Answer stream for user {user_id} ended early; not saving it")
+            yield sse_event({"user_id": user_id, "status": "error", "error": "The answer could not be completed"},
+                            event="error")
+            return
+
+        answer = "".join(chunks)
+        timestamp = datetime.now().isoformat()
+        self.save_executor.submit(contextvars.copy_context().run, self.save_interaction,
+                                  user_id, user_input, answer, timestamp)
+        logger.info(f"✅ Streamed request for user {user_id}")
 
+        yield sse_event({"user_id": user_id, "timestamp": timestamp, "status": "success"}, event="done")
+
+    def resolve_user_id(self, user_input, user_id=None, session_key=None):
+        """Explicit user_id, else the session's remembered one, else extracted from the message"""
+        if user_id:
+            if session_key:
+                self.session_data.put(session_key, user_id)
+            return user_id
+
+        if session_key:
+            cached = self.session_data.get(session_key)
+            if cached:
+                metrics.count("holomentor_identity_total", help_text="How user ids were resolved", source="session")
+                return cached
+
+        user_id = self.extract_user_id(user_input)
+        metrics.count("holomentor_identity_total", help_text="How user ids were resolved",
+                      source="anonymous" if user_id == "anonymous" else "message")
+        if session_key and user_id != "anonymous":
+            self.session_data.put(session_key, user_id)
+        return user_id
+
+    def extract_user_id(self, user_input):
+        """First self-introduction in the start of the message, in one regex pass"""
+        # Matching on the lowered prefix avoids IGNORECASE, which defeats the lookahead filter
+        prefix = user_input[:IDENTITY_SCAN_CHARS]
+        lowered = prefix.lower()
+        for match in IDENTITY_PATTERN.finditer(lowered):
+            name = match.group("name")
+            if name in NOT_NAMES:
+                continue
+            # "I'm asking", "I am using": an -ing word after "I'm" / "I am" is not a name
+            if match.group("i_am") and name.endswith("ing"):
+                continue
+            # The long "I am ..." also opens sentences like "I am unable", so it only
+            # names someone when the word is written as a name
+            if match.group("long_form") and (len(lowered) != len(prefix)
+                                             or not prefix[match.start("name")].isupper()):
+                continue
+            return name.capitalize()
         return "anonymous"
 
-    def get_user_memory(self, user_id):
+    def read_timeout(self, limit, deadline=None):
+        """(connect, read) timeout for a hop, clipped to what is left of the budget"""
+        if deadline is not None:
+            limit = min(limit, max(deadline - time.monotonic(), 0.1))
+        return (CONNECT_TIMEOUT, limit)
+
+    @timed("master_memory_fetch")
+    def get_user_memory(self, user_id, question=None):
         try:
-            response = requests.get(f"{MEMORY_AGENT_URL}/get_memory/{user_id}")
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.warning(f"Memory agent returned {response.status_code}")
-                return {"user_id": user_id, "interactions": []}
+            # A slow memory agent costs at most MEMORY_TIMEOUT; we answer without context
+            return self.memory.get_memory(
+                user_id,
+                MEMORY_CONTEXT_LIMIT,
+                fields=MEMORY_CONTEXT_FIELDS,
+                question=question,
+                relevant=MEMORY_RELEVANT_LIMIT,
+                timeout=self.read_timeout(MEMORY_TIMEOUT)
+            )
+        except AgentError as e:
+            logger.warning(str(e))
+            return {"user_id": user_id, "interactions": []}
         except Exception as e:
             logger.error(f"Error getting memory: {str(e)}")
             return {"user_id": user_id, "interactions": []}
 
-    def get_answer(self, question, memory_context, user_id):
+    @timed("master_answer")
+    def get_answer(self, question, memory_context, user_id, deadline=None):
         try:
-            payload = {
-                "question": question,
-                "user_id": user_id,
-                "memory_context": memory_context
-            }
-
-            response = requests.post(f"{ANSWER_AGENT_URL}/answer", json=payload)
-            if response.status_code == 200:
-                return response.json().get("answer", "I couldn't generate an answer.")
-            else:
-                logger.error(f"Answer agent returned {response.status_code}")
-                return "I'm having trouble generating an answer right now."
+            return self.answer.answer(
+                question, user_id, memory_context,
+                timeout=self.read_timeout(ANSWER_TIMEOUT, deadline)
+            )
+        except AgentError as e:
+            logger.error(str(e))
+            return "I'm having trouble generating an answer right now."
         except Exception as e:
             logger.error(f"Error getting answer: {str(e)}")
             return "I'm having trouble connecting to my knowledge base."
 
-    def save_interaction(self, user_id, question, answer):
+    def stream_answer(self, question, memory_context, user_id, deadline=None):
+        """Yield answer chunks from the answer agent as they are produced; returns True if it completed"""
+        produced = False
         try:
-            payload = {
-                "user_id": user_id,
-                "question": question,
-                "answer": answer,
-                "timestamp": datetime.now().isoformat()
-            }
+            for token in self.answer.stream_answer(
+                question, user_id, memory_context,
+                timeout=self.read_timeout(ANSWER_TIMEOUT, deadline)
+            ):
+                produced = True
+                yield token
+            return True
+        except AgentError as e:
+            logger.error(str(e))
+            if not produced:
+                yield "I'm having trouble generating an answer right now."
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            if not produced:
+                yield "I'm having trouble connecting to my knowledge base."
+        return False
 
-            response = requests.post(f"{MEMORY_AGENT_URL}/save_interaction", json=payload)
-            if response.status_code == 200:
-                logger.info(f"✅ Saved interaction for {user_id}")
-            else:
-                logger.warning(f"Failed to save interaction: {response.status_code}")
+    @timed("master_save")
+    def save_interaction(self, user_id, question, answer, timestamp=None):
+        try:
+            self.memory.save_interaction(
+                user_id, question, answer, timestamp or datetime.now().isoformat(),
+                timeout=self.read_timeout(SAVE_TIMEOUT)
+            )
+            logger.info(f"✅ Saved interaction for {user_id}")
+        except AgentError as e:
+            logger.warning(str(e))
         except Exception as e:
             logger.error(f"Error saving interaction: {str(e)}")
 
-# Initialize master agent
-master = MasterAgent()
+def create_app():
+    """App factory: one MasterAgent (HTTP pool, save workers) per worker process"""
+    app = Flask(__name__)
+    CORS(app)  # 🔌 Allow frontend access from browser
+    agent = MasterAgent()
+    app.extensions["agent"] = agent
+    app.register_blueprint(bp)
+    metrics.init_app(app, "master")
+    wire.init_app(app)
+    atexit.register(agent.close)
+    return app
+
+# The current app's master agent
+master = LocalProxy(lambda: current_app.extensions["agent"])
 
-@app.route('/process', methods=['POST'])
+def request_priority(data, default="normal"):
+    """Priority class from the X-Priority header or the body's "priority" field"""
+    priority = request.headers.get("X-Priority") or data.get("priority") or default
+    return priority if priority in PRIORITIES else default
+
+def shed(error):
+    """429/503 with Retry-After for a request admission control turned away"""
+    response = jsonify({"error": str(error), "retry_after": error.retry_after, "status": "error"})
+    response.status_code = error.status
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+@bp.route('/process', methods=['POST'])
 def process_request():
+    """Answer a message (?async=1 queues it as a job and returns 202 with the job id)"""
     try:
-        data = request.json
+        data = wire.read_body()
         user_input = data.get('message', '')
         user_id = data.get('user_id', None)
 
         if not user_input:
             return jsonify({"error": "No message provided"}), 400
 
-        response = master.process_user_request(user_input, user_id)
-        return jsonify(response)
+        user_id = master.resolve_user_id(user_input, user_id, session_key(data))
+        if request.args.get('async') == '1':
+            job_id = master.submit_job(user_input, user_id, request_priority(data, "low"))
+            response = jsonify({"job_id": job_id, "user_id": user_id, "status": "queued"})
+            response.status_code = 202
+            response.headers["Location"] = f"/jobs/{job_id}"
+            return response
 
+        with master.admission.admit(user_id, request_priority(data)):
+            response = master.process_user_request(user_input, user_id)
+        return wire.respond(response)
+
+    except Overloaded as e:
+        return shed(e)
     except Exception as e:
         logger.error(f"Error in /process endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/health', methods=['GET'])
+@bp.route('/process/stream', methods=['POST'])
+def process_stream():
+    try:
+        data = wire.read_body()
+        user_input = data.get('message', '')
+        user_id = data.get('user_id', None)
+
+        if not user_input:
+            return jsonify({"error": "No message provided"}), 400
+
+        user_id = master.resolve_user_id(user_input, user_id, session_key(data))
+        # The slot is held until the stream is closed, not just until the response starts
+        admission = master.admission
+        admission.acquire(user_id, request_priority(data))
+        started = time.monotonic()
+        try:
+            events = master.stream_user_request(user_input, user_id)
+            response = Response(stream_with_context(events), mimetype='text/event-stream',
+                                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        except Exception:
+            admission.release(time.monotonic() - started)
+            raise
+        response.call_on_close(lambda: admission.release(time.monotonic() - started))
+        return response
+
+    except Overloaded as e:
+        return shed(e)
+    except Exception as e:
+        logger.error(f"Error in /process/stream endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll an async /process job; ?wait=<seconds> holds the request until it finishes"""
+    wait = min(max(request.args.get('wait', 0, type=float), 0), JOB_MAX_WAIT)
+    job = master.jobs.get(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job)
+
+@bp.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    return jsonify(dict(master.admission.snapshot(), pending_jobs=master.jobs.pending))
+
+@bp.route('/replicas', methods=['GET'])
+def replica_stats():
+    """Health, breaker state and load of every downstream replica (HTTP transport only)"""
+    return jsonify([transport.replicas.snapshot() for transport in (master.memory, master.answer)
+                    if hasattr(transport, "replicas")])
+
+@bp.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         "status": "healthy",
@@ -154,4 +666,4 @@ def health_check():
 # ✅ Add this block to start the server
 if __name__ == '__main__':
     print("🎓 Starting Master Agent on port 5000...")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=os.getenv("FLASK_DEBUG", "1") == "1")
@@ -5,85 +5,945 @@ Stores user interactions and provides context for better responses
 """
 
 import os
+import re
 import json
+import base64
+import atexit
+import time
+import queue
 import sqlite3
-from flask import Flask, request, jsonify
-from datetime import datetime
+import threading
+import weakref
+import zlib
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from flask import Flask, Blueprint, current_app, request, jsonify, Response, stream_with_context
+from datetime import datetime, timedelta
 import logging
+from werkzeug.local import LocalProxy
+
+import metrics
+import wire
+from metrics import count, timed
+from vectors import VectorIndex
+from wire import dumps_json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+bp = Blueprint('memory', __name__)
+
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "memory.db")
+
+# SQLite tuning (override through the environment)
+DB_SYNCHRONOUS = os.getenv("MEMORY_DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.getenv("MEMORY_DB_CACHE_SIZE", "-16000"))  # negative = KiB
+DB_MMAP_SIZE = int(os.getenv("MEMORY_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("MEMORY_DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE = int(os.getenv("MEMORY_DB_STATEMENT_CACHE", "128"))
+# Connections of exited threads kept for reuse; the rest are closed
+DB_POOL_IDLE = int(os.getenv("MEMORY_DB_POOL_IDLE", "16"))
+
+# Write-behind persistence for /save_interaction
+WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "1") == "1"
+WRITE_BATCH_SIZE = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "256"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("MEMORY_WRITE_FLUSH_INTERVAL", "0.05"))
+WRITE_MAX_PENDING = int(os.getenv("MEMORY_WRITE_MAX_PENDING", "100000"))
+
+# Per-user memory snapshots kept in RAM
+MEMORY_CACHE = os.getenv("MEMORY_CACHE", "1") == "1"
+MEMORY_CACHE_USERS = int(os.getenv("MEMORY_CACHE_USERS", "10000"))
+MEMORY_CACHE_DEPTH = int(os.getenv("MEMORY_CACHE_DEPTH", "20"))
+
+# Embedding index for /recall and relevant_interactions (vectors.py); 0 falls back to full-text search
+MEMORY_VECTORS = os.getenv("MEMORY_VECTORS", "1") == "1"
+RECALL_LIMIT_MAX = 50
+
+# Rolling summaries of interactions older than the most recent SUMMARY_WINDOW
+SUMMARY_WINDOW = int(os.getenv("MEMORY_SUMMARY_WINDOW", "10"))
+SUMMARY_MAX_CHARS = int(os.getenv("MEMORY_SUMMARY_MAX_CHARS", "1200"))
+SUMMARY_TOPIC_CHARS = 100
+SUMMARY_FOLD_BATCH = 200
+
+# Paging and export
+USERS_PAGE_SIZE = int(os.getenv("MEMORY_USERS_PAGE_SIZE", "100"))
+USERS_PAGE_MAX = 1000
+EXPORT_BATCH_SIZE = 500
+
+# Default and largest windows served by /stats
+STATS_DAYS = 7
+STATS_HOURS = 24
+STATS_MAX_DAYS = 366
+STATS_MAX_HOURS = 24 * 14
+
+# Retention and background maintenance; a limit of 0 means unlimited
+RETENTION_KEEP_LAST = int(os.getenv("MEMORY_RETENTION_KEEP_LAST", "0"))
+RETENTION_DAYS = float(os.getenv("MEMORY_RETENTION_DAYS", "0"))
+MAINTENANCE_INTERVAL = float(os.getenv("MEMORY_MAINTENANCE_INTERVAL", "3600"))  # 0 disables
+MAINTENANCE_BATCH = int(os.getenv("MEMORY_MAINTENANCE_BATCH", "200"))
+MAINTENANCE_PAUSE = float(os.getenv("MEMORY_MAINTENANCE_PAUSE", "0.01"))
+VACUUM_PAGES = int(os.getenv("MEMORY_VACUUM_PAGES", "20000"))  # per pass
+VACUUM_SLICE_PAGES = 256
+
+_STOP = object()
+
+
+class _ThreadConnection:
+    """Holds one thread's connection; dropped with the thread's locals when the thread exits"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """Thread-safe pool handing each thread its own persistent SQLite connection
+
+    When a thread exits its connection goes back to a small idle list for the
+    next new thread (or is closed), so servers that start a thread per request
+    neither reconnect every time nor accumulate open connections.
+    """
+
+    def __init__(self, db_path, synchronous=DB_SYNCHRONOUS, cache_size=DB_CACHE_SIZE,
+                 mmap_size=DB_MMAP_SIZE, busy_timeout_ms=DB_BUSY_TIMEOUT_MS,
+                 statement_cache=DB_STATEMENT_CACHE, max_idle=DB_POOL_IDLE):
+        self.db_path = db_path
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache = statement_cache
+        self.max_idle = max_idle
+        self._idle = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._connections = []
+
+    def _open(self):
+        """Open a connection and apply the journal and cache pragmas"""
+        # isolation_level=None leaves transaction control to transaction();
+        # cached_statements keeps compiled statements alive across requests
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        # Only takes effect on a new file; lets maintenance return free pages incrementally
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _release(self, conn):
+        """The owning thread exited: keep its connection for reuse, or close it"""
+        with self._lock:
+            if conn not in self._connections:
+                return  # already closed by close_all()
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._connections.remove(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            return self._open()
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        return conn
+
+    def get(self):
+        """Return the calling thread's connection, opening it on first use"""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = _ThreadConnection(self._checkout())
+            weakref.finalize(holder, self._release, holder.conn)
+            self._local.holder = holder
+        return holder.conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow the thread's connection for reads"""
+        yield self.get()
+
+    @contextmanager
+    def transaction(self):
+        """Run a block inside a single write transaction"""
+        conn = self.get()
+        # SQLite admits one writer at a time anyway; queueing on a lock here
+        # hands the write lock over directly instead of busy-timeout polling
+        with self._write_lock:
+            # IMMEDIATE takes the write lock up front so two writers never
+            # deadlock upgrading from a shared read lock
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    @contextmanager
+    def writing(self):
+        """Hold the writer slot for statements that manage their own transaction"""
+        conn = self.get()
+        with self._write_lock:
+            yield conn
+
+    def close_all(self):
+        """Close every connection the pool has handed out"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._idle = []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_ts(timestamp=None):
+    """Convert an ISO timestamp (or now) to the integer microsecond sort key"""
+    if timestamp:
+        try:
+            dt = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+            if dt.tzinfo is not None:
+                dt = dt.astimezone().replace(tzinfo=None)
+        except ValueError:
+            dt = datetime.now()
+    else:
+        dt = datetime.now()
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _migration_base_schema(cursor):
+    """v1: users and interactions tables"""
+    # Create users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT UNIQUE NOT NULL,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            total_interactions INTEGER DEFAULT 0
+        )
+    ''')
+
+    # Create interactions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+
+def _migration_time_key(cursor):
+    """v2: integer time key on interactions, backfilled, plus lookup index"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(interactions)")]
+    if "ts" not in columns:
+        cursor.execute("ALTER TABLE interactions ADD COLUMN ts INTEGER")
+
+    # Backfill in chunks so large existing files don't need the rows in RAM
+    reader = cursor.connection.cursor()
+    reader.execute("SELECT id, timestamp FROM interactions WHERE ts IS NULL")
+    while True:
+        rows = reader.fetchmany(5000)
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE interactions SET ts = ? WHERE id = ?",
+            [(to_ts(timestamp), row_id) for row_id, timestamp in rows],
+        )
+
+    # Serves WHERE user_id = ? ORDER BY ts DESC LIMIT ? as a range scan
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_interactions_user_ts
+        ON interactions (user_id, ts DESC, id DESC)
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_interactions_ts ON interactions (ts DESC)")
+
+
+def _migration_search_index(cursor):
+    """v3: FTS5 index over questions and answers, kept in sync by triggers"""
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+                question, answer,
+                content='interactions', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search keeps using the LIKE scan
+        logger.warning(f"⚠️ FTS5 unavailable, search will scan: {str(e)}")
+        return
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS interactions_fts_insert AFTER INSERT ON interactions BEGIN
+            INSERT INTO interactions_fts (rowid, question, answer)
+            VALUES (new.id, new.question, new.answer);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS interactions_fts_delete AFTER DELETE ON interactions BEGIN
+            INSERT INTO interactions_fts (interactions_fts, rowid, question, answer)
+            VALUES ('delete', old.id, old.question, old.answer);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS interactions_fts_update AFTER UPDATE OF question, answer ON interactions BEGIN
+            INSERT INTO interactions_fts (interactions_fts, rowid, question, answer)
+            VALUES ('delete', old.id, old.question, old.answer);
+            INSERT INTO interactions_fts (rowid, question, answer)
+            VALUES (new.id, new.question, new.answer);
+        END
+    ''')
+
+    # Index everything stored before the migration
+    cursor.execute("INSERT INTO interactions_fts (interactions_fts) VALUES ('rebuild')")
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word, as a prefix, must match"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def encode_cursor(*values):
+    """Opaque pagination cursor from the last row's sort key"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class BadCursor(ValueError):
+    """A pagination cursor this server could not have issued"""
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise BadCursor("Malformed cursor") from e
+
+
+def is_search_key(value):
+    """A (rank, id) keyset position as /search cursors carry it"""
+    return (isinstance(value, list) and len(value) == 2 and
+            all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value))
+
+
+def decode_users_cursor(cursor):
+    """(last_seen, user_id) to resume a /users page after; raises BadCursor for anything else"""
+    after = decode_cursor(cursor)
+    if not (isinstance(after, list) and len(after) == 2 and all(isinstance(v, str) for v in after)):
+        raise BadCursor("Malformed cursor")
+    return after
+
+
+def decode_search_cursor(cursor):
+    """(rank, id) to resume a search after; raises BadCursor for anything else"""
+    after = decode_cursor(cursor)
+    if not is_search_key(after):
+        raise BadCursor("Malformed cursor")
+    return after
+
+
+def _migration_summaries(cursor):
+    """v4: rolling per-user summaries of interactions older than the recent window"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_summaries (
+            user_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            covered_through_ts INTEGER NOT NULL,
+            covered_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP
+        )
+    ''')
+
+
+def _migration_users_last_seen(cursor):
+    """v5: index for paging users by recency"""
+    # Serves ORDER BY last_seen DESC, user_id DESC with keyset cursors as a range scan
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_last_seen
+        ON users (last_seen DESC, user_id DESC)
+    ''')
+
+
+def _migration_retention(cursor):
+    """v6: per-user retention policies and compressed archives of pruned interactions"""
+    # NULL inherits the global default; 0 disables that limit for the user
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS retention_policies (
+            user_id TEXT PRIMARY KEY,
+            keep_last INTEGER,
+            keep_days REAL,
+            updated_at TIMESTAMP
+        )
+    ''')
+    # One row per archived batch; payload is zlib-compressed JSON
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS interactions_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            first_ts INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            archived_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_interactions_archive_user
+        ON interactions_archive (user_id, last_ts)
+    ''')
+
+
+def _migration_rollups(cursor):
+    """v7: incrementally maintained activity rollups, backfilled from existing rows"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_user_daily (
+            user_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            interactions INTEGER NOT NULL DEFAULT 0,
+            question_chars INTEGER NOT NULL DEFAULT 0,
+            answer_chars INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_activity_user_daily_day ON activity_user_daily (day)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_hourly (
+            hour TEXT PRIMARY KEY,
+            interactions INTEGER NOT NULL DEFAULT 0,
+            question_chars INTEGER NOT NULL DEFAULT 0,
+            answer_chars INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    # Length histogram with power-of-two buckets: bucket b holds lengths in [2**(b-1), 2**b)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS size_stats (
+            kind TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            chars INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, bucket)
+        ) WITHOUT ROWID
+    ''')
+    rebuild_rollups(cursor)
+
+
+def pack_archive(rows):
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack_archive(payload):
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def summarize_interaction(question):
+    """One short topic line for an interaction: the question's first sentence"""
+    text = " ".join(question.split())
+    sentence = re.split(r"(?<=[.?!])\s", text, maxsplit=1)[0]
+    if len(sentence) > SUMMARY_TOPIC_CHARS:
+        sentence = sentence[:SUMMARY_TOPIC_CHARS].rsplit(" ", 1)[0] + "…"
+    return sentence
+
+
+def roll_summary(summary, topics, max_chars=SUMMARY_MAX_CHARS):
+    """Append topic lines, moving repeats to the end and dropping the oldest past max_chars"""
+    lines = summary.split("\n") if summary else []
+    for topic in topics:
+        line = f"- {topic}"
+        if line in lines:
+            lines.remove(line)
+        lines.append(line)
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+# Insert-or-increment in place: no delete/reinsert, no correlated lookups
+UPSERT_USER_SQL = '''
+    INSERT INTO users (user_id, first_seen, last_seen, total_interactions)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT (user_id) DO UPDATE SET
+        last_seen = MAX(users.last_seen, excluded.last_seen),
+        total_interactions = users.total_interactions + 1
+'''
+
+INSERT_INTERACTION_SQL = '''
+    INSERT INTO interactions (user_id, question, answer, timestamp, ts)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+ROLLUP_TABLES = ("activity_user_daily", "activity_hourly", "size_stats")
+
+
+class RollupBatch:
+    """Rollup increments for a set of interactions, summed in memory and written as upserts"""
+
+    def __init__(self):
+        self.rows = 0
+        self.daily = defaultdict(lambda: [0, 0, 0])
+        self.hourly = defaultdict(lambda: [0, 0, 0])
+        self.sizes = defaultdict(lambda: [0, 0])
+
+    def add(self, user_id, question_chars, answer_chars, ts):
+        # ts counts microseconds from EPOCH in local time, so this is the local hour
+        hour = (EPOCH + timedelta(microseconds=ts)).isoformat()[:13]
+        for totals in (self.daily[(user_id, hour[:10])], self.hourly[hour]):
+            totals[0] += 1
+            totals[1] += question_chars
+            totals[2] += answer_chars
+        for kind, chars in (("question", question_chars), ("answer", answer_chars)):
+            size = self.sizes[(kind, chars.bit_length())]
+            size[0] += 1
+            size[1] += chars
+        self.rows += 1
+
+    def write(self, cursor, daily_only=False):
+        cursor.executemany('''
+            INSERT INTO activity_user_daily (user_id, day, interactions, question_chars, answer_chars)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                interactions = activity_user_daily.interactions + excluded.interactions,
+                question_chars = activity_user_daily.question_chars + excluded.question_chars,
+                answer_chars = activity_user_daily.answer_chars + excluded.answer_chars
+        ''', [key + tuple(totals) for key, totals in self.daily.items()])
+        if daily_only:
+            return
+        cursor.executemany('''
+            INSERT INTO activity_hourly (hour, interactions, question_chars, answer_chars)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (hour) DO UPDATE SET
+                interactions = activity_hourly.interactions + excluded.interactions,
+                question_chars = activity_hourly.question_chars + excluded.question_chars,
+                answer_chars = activity_hourly.answer_chars + excluded.answer_chars
+        ''', [(hour,) + tuple(totals) for hour, totals in self.hourly.items()])
+        cursor.executemany('''
+            INSERT INTO size_stats (kind, bucket, count, chars)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (kind, bucket) DO UPDATE SET
+                count = size_stats.count + excluded.count,
+                chars = size_stats.chars + excluded.chars
+        ''', [key + tuple(totals) for key, totals in self.sizes.items()])
+
+
+def rebuild_rollups(cursor, user_id=None):
+    """Recompute rollups from interactions and the archive; returns interactions counted
+
+    With a user_id only that user's daily rows are rebuilt, which is what a
+    shard move needs: the global rollups only have to add up across shards.
+    """
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id else ("", ())
+    if user_id:
+        cursor.execute("DELETE FROM activity_user_daily WHERE user_id = ?", params)
+    else:
+        for table in ROLLUP_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+
+    batch = RollupBatch()
+    reader = cursor.connection.cursor()
+    reader.execute(f"SELECT user_id, length(question), length(answer), ts FROM interactions {where}", params)
+    while True:
+        rows = reader.fetchmany(5000)
+        if not rows:
+            break
+        for row in rows:
+            batch.add(*row)
+    reader.execute(f"SELECT user_id, payload FROM interactions_archive {where}", params)
+    for archived_user, payload in reader:
+        for item in unpack_archive(payload):
+            batch.add(archived_user, len(item["question"]), len(item["answer"]), to_ts(item["timestamp"]))
+    batch.write(cursor, daily_only=bool(user_id))
+    return batch.rows
+
+
+def merge_stats_totals(parts):
+    """Add up stats_totals() from several shards; a user's rows live on one shard only"""
+    merged = {"daily": {}, "active_users": 0, "hourly": {}, "sizes": {}, "user": None}
+    for part in parts:
+        merged["active_users"] += part["active_users"]
+        for key in ("daily", "hourly", "sizes", "user"):
+            if part[key] is None:
+                continue
+            target = merged[key] = merged[key] or {}
+            for bucket, values in part[key].items():
+                target[bucket] = [a + b for a, b in zip(target.get(bucket, [0] * len(values)), values)]
+    return merged
+
+
+def render_stats(totals, days, hours, user_id=None):
+    """The /stats response from raw rollup sums"""
+    def average(chars, count):
+        return round(chars / count, 1) if count else 0
+
+    sizes = {}
+    for kind in ("question", "answer"):
+        buckets = sorted((bucket, values) for (k, bucket), values in totals["sizes"].items() if k == kind)
+        count = sum(values[0] for _, values in buckets)
+        sizes[kind] = {
+            "count": count,
+            "avg_chars": average(sum(values[1] for _, values in buckets), count),
+            "histogram": [{"max_chars": (1 << bucket) - 1, "count": values[0]} for bucket, values in buckets]
+        }
+
+    stats = {
+        "days": days,
+        "hours": hours,
+        "total_interactions": sizes["answer"]["count"],
+        "avg_question_chars": sizes["question"]["avg_chars"],
+        "avg_answer_chars": sizes["answer"]["avg_chars"],
+        "active_users": totals["active_users"],
+        "daily": [
+            {"day": day, "interactions": n, "active_users": users,
+             "avg_question_chars": average(question_chars, n), "avg_answer_chars": average(answer_chars, n)}
+            for day, (n, users, question_chars, answer_chars) in sorted(totals["daily"].items())
+        ],
+        "hourly": [
+            {"hour": hour, "interactions": n, "avg_answer_chars": average(answer_chars, n)}
+            for hour, (n, _, answer_chars) in sorted(totals["hourly"].items())
+        ],
+        "sizes": sizes
+    }
+    if user_id:
+        daily = sorted((totals["user"] or {}).items())
+        stats["user"] = {
+            "user_id": user_id,
+            "interactions": sum(values[0] for _, values in daily),
+            "daily": [{"day": day, "interactions": n, "avg_answer_chars": average(answer_chars, n)}
+                      for day, (n, _, answer_chars) in daily]
+        }
+    return stats
+
+
+# Ordered schema migrations; PRAGMA user_version records the last one applied
+MIGRATIONS = [
+    (1, _migration_base_schema),
+    (2, _migration_time_key),
+    (3, _migration_search_index),
+    (4, _migration_summaries),
+    (5, _migration_users_last_seen),
+    (6, _migration_retention),
+    (7, _migration_rollups),
+]
+
+
+class WriteBehindQueue:
+    """Buffers interactions in memory and persists them in group commits"""
+
+    def __init__(self, flush, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 max_pending=WRITE_MAX_PENDING):
+        self._flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        """Queue one interaction; False when the queue is closed or full"""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            # Collect until the batch is full or the flush interval elapses
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            dropped = self._flush(batch)
+            if dropped:
+                logger.error(f"❌ Dropped {dropped} of {len(batch)} queued interactions after a failed flush")
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def join(self):
+        """Block until everything queued so far has been written"""
+        self._queue.join()
+
+    def close(self):
+        """Stop accepting work and drain what is already queued"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+
+class MaintenanceWorker:
+    """Runs a maintenance pass every `interval` seconds, or sooner when triggered"""
+
+    def __init__(self, run, interval=MAINTENANCE_INTERVAL):
+        self._run_pass = run
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-maintenance", daemon=True)
+        self._thread.start()
+
+    def trigger(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self._run_pass(self._stop)
+            except Exception as e:
+                logger.error(f"❌ Maintenance pass failed: {str(e)}")
+
+    def close(self):
+        """Stop after the current batch; a pass in progress is abandoned between batches"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+
+class UserMemoryCache:
+    """LRU of per-user memory snapshots, updated in place on every save"""
+
+    def __init__(self, max_users=MEMORY_CACHE_USERS, depth=MEMORY_CACHE_DEPTH):
+        self.max_users = max_users
+        self.depth = depth
+        self._snapshots = OrderedDict()
+        self._pending = {}
+        self._written = OrderedDict()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def token(self):
+        """Marker taken before a database load; put() rejects loads older than a write"""
+        with self._lock:
+            return self._seq
+
+    def get(self, user_id, limit):
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            # Enough rows cached, or the snapshot already holds the user's whole history
+            if snapshot is None or (limit > len(snapshot["recent"]) and
+                                    snapshot["total_interactions"] > len(snapshot["recent"])):
+                self.misses += 1
+                return None
+            self._snapshots.move_to_end(user_id)
+            self.hits += 1
+            return self._render(snapshot, limit)
+
+    def needs_snapshot(self, user_id):
+        """No snapshot for the user and none of their writes still queued"""
+        with self._lock:
+            return user_id not in self._snapshots and not self._pending.get(user_id)
+
+    def put(self, user_id, snapshot, token):
+        with self._lock:
+            if self._pending.get(user_id) or self._written.get(user_id, -1) > token:
+                return
+            self._snapshots[user_id] = snapshot
+            self._snapshots.move_to_end(user_id)
+            while len(self._snapshots) > self.max_users:
+                self._snapshots.popitem(last=False)
+
+    def record_write(self, user_id, question, answer, timestamp, pending=False):
+        """Fold a new interaction into the cached snapshot (if any)"""
+        ts = to_ts(timestamp)
+        with self._lock:
+            self._mark_written(user_id)
+            if pending:
+                self._pending[user_id] = self._pending.get(user_id, 0) + 1
+
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is None:
+                return
+            if snapshot["first_seen"] is None:
+                snapshot["first_seen"] = timestamp
+            if snapshot["last_seen"] is None or timestamp > snapshot["last_seen"]:
+                snapshot["last_seen"] = timestamp
+            snapshot["total_interactions"] += 1
+
+            recent = snapshot["recent"]
+            recent.append((ts, {"question": question, "answer": answer, "timestamp": timestamp}))
+            if len(recent) > 1 and ts < recent[-2][0]:
+                recent.sort(key=lambda item: item[0])
+            if len(recent) > self.depth:
+                del recent[:len(recent) - self.depth]
+
+    def set_summaries(self, summaries):
+        """Refresh rolling summaries of cached users after a fold"""
+        with self._lock:
+            for user_id, summary in summaries.items():
+                snapshot = self._snapshots.get(user_id)
+                if snapshot is not None:
+                    snapshot["summary"] = summary
+
+    def settle(self, user_ids, failed=False):
+        """Queued writes for these users have been committed (or dropped)"""
+        with self._lock:
+            for user_id in user_ids:
+                self._mark_written(user_id)
+                count = self._pending.get(user_id, 0) - 1
+                if count > 0:
+                    self._pending[user_id] = count
+                else:
+                    self._pending.pop(user_id, None)
+                if failed:
+                    self._snapshots.pop(user_id, None)
+
+    def invalidate(self, user_ids):
+        """Drop snapshots whose rows changed underneath the cache"""
+        with self._lock:
+            for user_id in user_ids:
+                self._mark_written(user_id)
+                self._snapshots.pop(user_id, None)
+
+    def _mark_written(self, user_id):
+        self._seq += 1
+        self._written[user_id] = self._seq
+        self._written.move_to_end(user_id)
+        while len(self._written) > self.max_users * 4:
+            self._written.popitem(last=False)
+
+    @staticmethod
+    def _render(snapshot, limit):
+        recent = snapshot["recent"][-limit:] if limit > 0 else []
+        return {
+            "user_id": snapshot["user_id"],
+            "first_seen": snapshot["first_seen"],
+            "last_seen": snapshot["last_seen"],
+            "total_interactions": snapshot["total_interactions"],
+            "summary": snapshot["summary"],
+            "recent_interactions": [item for _, item in reversed(recent)]
+        }
+
 
 class MemoryAgent:
-    def __init__(self, db_path="memory.db"):
+    def __init__(self, db_path="memory.db", write_behind=WRITE_BEHIND, memory_cache=MEMORY_CACHE,
+                 maintenance_interval=MAINTENANCE_INTERVAL, vectors=MEMORY_VECTORS):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
         self.init_database()
+        self.has_search_index = self._table_exists("interactions_fts")
+        self.vectors = VectorIndex(db_path, self.pool) if vectors else None
+        self.memory_cache = UserMemoryCache() if memory_cache else None
+        self.writer = WriteBehindQueue(self._flush_queued) if write_behind else None
+        self.maintenance_status = {"last_run": None}
+        self._maintenance_lock = threading.Lock()
+        self.maintenance = (MaintenanceWorker(self.run_maintenance, maintenance_interval)
+                            if maintenance_interval > 0 else None)
+
+    def close(self):
+        """Drain queued writes and release pooled database connections"""
+        if self.maintenance:
+            self.maintenance.close()
+        if self.writer:
+            self.writer.close()
+        if self.vectors:
+            self.vectors.close()
+        self.pool.close_all()
         
     def init_database(self):
-        """Initialize SQLite database for storing user interactions"""
+        """Initialize SQLite database, applying any pending schema migrations"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT UNIQUE NOT NULL,
-                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    total_interactions INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # Create interactions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS interactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    question TEXT NOT NULL,
-                    answer TEXT NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+            for target, migration in MIGRATIONS:
+                if target <= version:
+                    continue
+                with self.pool.transaction() as conn:
+                    migration(conn.cursor())
+                    conn.execute(f"PRAGMA user_version = {target}")
+                logger.info(f"✅ Applied schema migration v{target}")
+
             logger.info("✅ Database initialized successfully")
             
         except Exception as e:
             logger.error(f"❌ Error initializing database: {str(e)}")
     
+    def _table_exists(self, name):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    @timed("memory_save")
     def save_interaction(self, user_id, question, answer, timestamp=None):
         """Save a new interaction to the database"""
         try:
             if not timestamp:
                 timestamp = datetime.now().isoformat()
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Insert or update user
-            cursor.execute('''
-                INSERT OR REPLACE INTO users (user_id, first_seen, last_seen, total_interactions)
-                VALUES (?, 
-                        COALESCE((SELECT first_seen FROM users WHERE user_id = ?), ?),
-                        ?,
-                        COALESCE((SELECT total_interactions FROM users WHERE user_id = ?), 0) + 1)
-            ''', (user_id, user_id, timestamp, timestamp, user_id))
-            
-            # Insert interaction
-            cursor.execute('''
-                INSERT INTO interactions (user_id, question, answer, timestamp)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, question, answer, timestamp))
-            
-            conn.commit()
-            conn.close()
+            # User counter and interaction row commit together or not at all
+            with self.pool.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(UPSERT_USER_SQL, (user_id, timestamp, timestamp))
+                ts = to_ts(timestamp)
+                cursor.execute(INSERT_INTERACTION_SQL, (user_id, question, answer, timestamp, ts))
+                rollups = RollupBatch()
+                rollups.add(user_id, len(question), len(answer), ts)
+                rollups.write(cursor)
+                summaries = self._roll_summaries(cursor, [user_id])
+
+            if self.vectors:
+                self.vectors.notify()
+            if self.memory_cache:
+                self.memory_cache.record_write(user_id, question, answer, timestamp)
+                self.memory_cache.set_summaries(summaries)
             
             logger.info(f"✅ Saved interaction for user {user_id}")
             return True
@@ -92,83 +952,291 @@ class MemoryAgent:
             logger.error(f"❌ Error saving interaction: {str(e)}")
             return False
     
-    def get_user_memory(self, user_id, limit=10):
-        """Get user's interaction history"""
+    def save_interactions(self, interactions):
+        """Save a batch of (user_id, question, answer, timestamp) in one group commit"""
+        rows = self._write_batch(interactions)
+        if rows is None:
+            return False
+        if self.memory_cache:
+            for user_id, question, answer, timestamp in rows:
+                self.memory_cache.record_write(user_id, question, answer, timestamp)
+        return True
+
+    @timed("memory_write_batch")
+    def _write_batch(self, interactions):
+        """Group-commit a batch; returns the rows written, or None on failure"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            rows = []
+            for user_id, question, answer, timestamp in interactions:
+                rows.append((user_id, question, answer, timestamp or datetime.now().isoformat()))
+
+            keys = [to_ts(row[3]) for row in rows]
+            rollups = RollupBatch()
+            for row, ts in zip(rows, keys):
+                rollups.add(row[0], len(row[1]), len(row[2]), ts)
+
+            with self.pool.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(UPSERT_USER_SQL, [(row[0], row[3], row[3]) for row in rows])
+                cursor.executemany(INSERT_INTERACTION_SQL, [row + (ts,) for row, ts in zip(rows, keys)])
+                rollups.write(cursor)
+                summaries = self._roll_summaries(cursor, {row[0] for row in rows})
+
+            if self.vectors:
+                self.vectors.notify()
+            if self.memory_cache:
+                self.memory_cache.set_summaries(summaries)
+
+            logger.info(f"✅ Saved {len(rows)} interactions in one commit")
+            return rows
+
+        except Exception as e:
+            logger.error(f"❌ Error saving interactions: {str(e)}")
+            return None
+
+    def _roll_summaries(self, cursor, user_ids):
+        """Fold interactions that just left the recent window into each user's summary"""
+        updated = {}
+        for user_id in user_ids:
+            # Newest interaction outside the window; nothing to fold if there is none
+            boundary = cursor.execute('''
+                SELECT ts FROM interactions WHERE user_id = ?
+                ORDER BY ts DESC, id DESC LIMIT 1 OFFSET ?
+            ''', (user_id, SUMMARY_WINDOW)).fetchone()
+            if boundary is None:
+                continue
+
+            current = cursor.execute(
+                "SELECT summary, covered_through_ts, covered_count FROM user_summaries WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            summary, covered_ts, covered_count = current if current else ("", -1, 0)
+            if boundary[0] <= covered_ts:
+                continue
+
+            rows = cursor.execute('''
+                SELECT question, ts FROM interactions
+                WHERE user_id = ? AND ts > ? AND ts <= ?
+                ORDER BY ts ASC, id ASC LIMIT ?
+            ''', (user_id, covered_ts, boundary[0], SUMMARY_FOLD_BATCH)).fetchall()
+            if not rows:
+                continue
+
+            summary = roll_summary(summary, [summarize_interaction(row[0]) for row in rows])
+            cursor.execute('''
+                INSERT INTO user_summaries (user_id, summary, covered_through_ts, covered_count, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    covered_through_ts = excluded.covered_through_ts,
+                    covered_count = excluded.covered_count,
+                    updated_at = excluded.updated_at
+            ''', (user_id, summary, rows[-1][1], covered_count + len(rows), datetime.now().isoformat()))
+            updated[user_id] = summary
+        return updated
+
+    def _flush_queued(self, batch):
+        """Write-behind flush: the cache already reflects these rows; returns rows dropped
+
+        If the group commit fails, the rows are retried one at a time so a bad
+        row only loses itself, not every acknowledged write it was batched with.
+        """
+        if self._write_batch(batch) is not None:
+            written, failed = batch, []
+        elif len(batch) == 1:
+            written, failed = [], batch
+        else:
+            written, failed = [], []
+            for row in batch:
+                (written if self._write_batch([row]) is not None else failed).append(row)
+        if self.memory_cache:
+            self.memory_cache.settle([row[0] for row in written])
+            self.memory_cache.settle([row[0] for row in failed], failed=True)
+        return len(failed)
+
+    def queue_interaction(self, user_id, question, answer, timestamp=None):
+        """Hand an interaction to the write-behind queue, or write it directly"""
+        if not timestamp:
+            timestamp = datetime.now().isoformat()
+        if self.writer:
+            # Readers see the interaction immediately, before the flush lands;
+            # recorded first so a fast flush can't settle it before it is pending
+            if self.memory_cache:
+                if self.memory_cache.needs_snapshot(user_id):
+                    self._cache_snapshot(user_id)
+                self.memory_cache.record_write(user_id, question, answer, timestamp, pending=True)
+            if self.writer.put((user_id, question, answer, timestamp)):
+                return True
+            if self.memory_cache:
+                self.memory_cache.settle([user_id], failed=True)
+        return self.save_interaction(user_id, question, answer, timestamp)
+
+    def _cache_snapshot(self, user_id):
+        """Cache the user's stored history so a queued write has a snapshot to land in
+
+        Without one, reads would come from the database, which does not have the
+        row until the flush, and put() refuses loads while the write is pending.
+        """
+        try:
+            token = self.memory_cache.token()
+            self.memory_cache.put(user_id, self._load_user_memory(user_id, self.memory_cache.depth), token)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not cache memory for {user_id} before queueing: {str(e)}")
+
+    @timed("memory_get")
+    def get_user_memory(self, user_id, limit=10, fields=None, query=None, relevant=5):
+        """Get user's interaction history, optionally projected to `fields`
+
+        With `query`, also returns the user's best-matching older interactions
+        as relevant_interactions.
+        """
+        try:
+            memory = self.memory_cache.get(user_id, limit) if self.memory_cache else None
+            count("holomentor_memory_cache_total", help_text="Memory snapshot cache lookups",
+                  result="miss" if memory is None else "hit")
+            if memory is None:
+                depth = max(limit, self.memory_cache.depth) if self.memory_cache else limit
+                token = self.memory_cache.token() if self.memory_cache else None
+                snapshot = self._load_user_memory(user_id, depth)
+                if self.memory_cache:
+                    self.memory_cache.put(user_id, snapshot, token)
+                memory = UserMemoryCache._render(snapshot, limit)
+
+            if query and relevant > 0 and (not fields or "relevant_interactions" in fields):
+                memory["relevant_interactions"] = self.recall(user_id, query, relevant)
             
+            if fields:
+                memory = {key: value for key, value in memory.items() if key in fields}
+
+            logger.info(f"✅ Retrieved memory for user {user_id}")
+            return memory
+            
+        except Exception as e:
+            logger.error(f"❌ Error getting user memory: {str(e)}")
+            return {
+                "user_id": user_id,
+                "error": str(e),
+                "recent_interactions": []
+            }
+
+    @timed("memory_recall")
+    def recall(self, user_id, query, limit=5):
+        """The user's interactions closest in meaning to `query`, best first"""
+        if not self.vectors:
+            results, _ = self.search_interactions(query, limit, user_id)
+            return [
+                {
+                    "question": result["question"],
+                    "answer": result["answer"],
+                    "timestamp": result["timestamp"],
+                    "score": result.get("score", 0.0)
+                }
+                for result in results
+            ]
+
+        # Over-fetch: rows archived or moved since the last compaction drop out below
+        hits = self.vectors.search(user_id, query, limit * 2)
+        if not hits:
+            return []
+        # Rowid lookups; filtering on user_id in SQL would scan the user's index range
+        placeholders = ",".join("?" * len(hits))
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT id, user_id, question, answer, timestamp FROM interactions
+                WHERE id IN ({placeholders})
+            ''', [interaction_id for interaction_id, _ in hits]).fetchall()
+        found = {row[0]: row[1:] for row in rows if row[1] == user_id}
+        return [
+            {
+                "question": found[interaction_id][1],
+                "answer": found[interaction_id][2],
+                "timestamp": found[interaction_id][3],
+                "score": round(score, 4)
+            }
+            for interaction_id, score in hits if interaction_id in found
+        ][:limit]
+
+    @timed("memory_load")
+    def _load_user_memory(self, user_id, limit):
+        """Read a user's snapshot (recent interactions oldest-first) from SQLite"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+
             # Get user info
             cursor.execute('''
                 SELECT user_id, first_seen, last_seen, total_interactions
                 FROM users WHERE user_id = ?
             ''', (user_id,))
-            
+
             user_info = cursor.fetchone()
-            
+
             # Get recent interactions
             cursor.execute('''
-                SELECT question, answer, timestamp
+                SELECT question, answer, timestamp, ts
                 FROM interactions 
                 WHERE user_id = ?
-                ORDER BY timestamp DESC
+                ORDER BY ts DESC, id DESC
                 LIMIT ?
             ''', (user_id, limit))
-            
+
             interactions = cursor.fetchall()
-            conn.close()
-            
-            # Format response
-            if user_info:
-                memory = {
-                    "user_id": user_info[0],
-                    "first_seen": user_info[1],
-                    "last_seen": user_info[2],
-                    "total_interactions": user_info[3],
-                    "recent_interactions": [
-                        {
-                            "question": interaction[0],
-                            "answer": interaction[1],
-                            "timestamp": interaction[2]
-                        }
-                        for interaction in interactions
-                    ]
-                }
-            else:
-                memory = {
-                    "user_id": user_id,
-                    "first_seen": None,
-                    "last_seen": None,
-                    "total_interactions": 0,
-                    "recent_interactions": []
-                }
-            
-            logger.info(f"✅ Retrieved memory for user {user_id}")
-            return memory
-            
-        except Exception as e:
-            logger.error(f"❌ Error getting user memory: {str(e)}")
+
+            summary = cursor.execute(
+                "SELECT summary FROM user_summaries WHERE user_id = ?", (user_id,)
+            ).fetchone()
+
+        summary = summary[0] if summary else None
+        recent = [
+            (row[3], {"question": row[0], "answer": row[1], "timestamp": row[2]})
+            for row in reversed(interactions)
+        ]
+        if user_info:
             return {
-                "user_id": user_id,
-                "error": str(e),
-                "recent_interactions": []
+                "user_id": user_info[0],
+                "first_seen": user_info[1],
+                "last_seen": user_info[2],
+                "total_interactions": user_info[3],
+                "summary": summary,
+                "recent": recent
             }
+        return {
+            "user_id": user_id,
+            "first_seen": None,
+            "last_seen": None,
+            "total_interactions": 0,
+            "summary": summary,
+            "recent": recent
+        }
     
-    def get_all_users(self):
-        """Get list of all users"""
+    @timed("memory_users")
+    def get_all_users(self, limit=USERS_PAGE_SIZE, cursor=None):
+        """Page through users, most recently seen first; returns (users, next_cursor)
+
+        Raises BadCursor for a cursor that did not come from an earlier page.
+        """
+        after = decode_users_cursor(cursor) if cursor else None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            sql = '''
                 SELECT user_id, first_seen, last_seen, total_interactions
                 FROM users
-                ORDER BY last_seen DESC
-            ''')
-            
-            users = cursor.fetchall()
-            conn.close()
-            
+            '''
+            params = []
+            if after:
+                # Keyset on (last_seen, user_id): resume strictly after the last row served
+                last_seen, last_user = after
+                sql += " WHERE (last_seen, user_id) < (?, ?)"
+                params.extend([last_seen, last_user])
+            sql += " ORDER BY last_seen DESC, user_id DESC LIMIT ?"
+            params.append(limit + 1)
+
+            with self.pool.connection() as conn:
+                users = conn.execute(sql, params).fetchall()
+
+            next_cursor = None
+            if len(users) > limit:
+                users = users[:limit]
+                next_cursor = encode_cursor(users[-1][2], users[-1][0])
+
             return [
                 {
                     "user_id": user[0],
@@ -177,61 +1245,444 @@ class MemoryAgent:
                     "total_interactions": user[3]
                 }
                 for user in users
-            ]
-            
+            ], next_cursor
+
         except Exception as e:
             logger.error(f"❌ Error getting all users: {str(e)}")
-            return []
-    
-    def search_interactions(self, query, limit=20):
-        """Search through interactions"""
+            return [], None
+
+    @timed("memory_stats")
+    def stats_totals(self, days=STATS_DAYS, hours=STATS_HOURS, user_id=None):
+        """Raw rollup sums for the last `days` days and `hours` hours; read only from rollup tables"""
+        now = datetime.now()
+        first_day = (now - timedelta(days=days - 1)).date().isoformat()
+        first_hour = (now - timedelta(hours=hours - 1)).isoformat()[:13]
+        with self.pool.connection() as conn:
+            totals = {
+                "daily": {row[0]: list(row[1:]) for row in conn.execute('''
+                    SELECT day, SUM(interactions), COUNT(*), SUM(question_chars), SUM(answer_chars)
+                    FROM activity_user_daily WHERE day >= ? GROUP BY day
+                ''', (first_day,))},
+                "active_users": conn.execute(
+                    "SELECT COUNT(DISTINCT user_id) FROM activity_user_daily WHERE day >= ?", (first_day,)
+                ).fetchone()[0],
+                "hourly": {row[0]: list(row[1:]) for row in conn.execute('''
+                    SELECT hour, interactions, question_chars, answer_chars
+                    FROM activity_hourly WHERE hour >= ?
+                ''', (first_hour,))},
+                "sizes": {(row[0], row[1]): list(row[2:]) for row in conn.execute(
+                    "SELECT kind, bucket, count, chars FROM size_stats"
+                )},
+                "user": None
+            }
+            if user_id:
+                totals["user"] = {row[0]: list(row[1:]) for row in conn.execute('''
+                    SELECT day, interactions, question_chars, answer_chars
+                    FROM activity_user_daily WHERE user_id = ? AND day >= ?
+                ''', (user_id, first_day))}
+        return totals
+
+    def get_stats(self, days=STATS_DAYS, hours=STATS_HOURS, user_id=None):
+        return render_stats(self.stats_totals(days, hours, user_id), days, hours, user_id)
+
+    def rebuild_rollups(self):
+        """Regenerate every rollup from raw interactions and archives in one transaction"""
+        started = time.perf_counter()
+        with self.pool.transaction() as conn:
+            counted = rebuild_rollups(conn.cursor())
+        logger.info(f"📊 Rebuilt rollups from {counted} interactions in {time.perf_counter() - started:.2f}s")
+        return counted
+
+    def get_retention(self, user_id):
+        """Effective retention policy for a user (0 means unlimited)"""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT keep_last, keep_days FROM retention_policies WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        keep_last, keep_days = row if row else (None, None)
+        return {
+            "user_id": user_id,
+            "keep_last": RETENTION_KEEP_LAST if keep_last is None else keep_last,
+            "keep_days": RETENTION_DAYS if keep_days is None else keep_days,
+            "inherited": row is None
+        }
+
+    def set_retention(self, user_id, keep_last=None, keep_days=None):
+        """Override the global retention policy for one user; None inherits the default"""
+        with self.pool.transaction() as conn:
+            if keep_last is None and keep_days is None:
+                conn.execute("DELETE FROM retention_policies WHERE user_id = ?", (user_id,))
+            else:
+                conn.execute('''
+                    INSERT INTO retention_policies (user_id, keep_last, keep_days, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        keep_last = excluded.keep_last,
+                        keep_days = excluded.keep_days,
+                        updated_at = excluded.updated_at
+                ''', (user_id, keep_last, keep_days, datetime.now().isoformat()))
+        return self.get_retention(user_id)
+
+    def run_maintenance(self, stop=None, full_vacuum=False):
+        """Archive interactions past each user's retention, then vacuum and analyze
+
+        Work is done in short transactions of MAINTENANCE_BATCH rows with a pause
+        between them, so foreground reads (WAL) and writes are never held up for long.
+        """
+        if not self._maintenance_lock.acquire(blocking=False):
+            return self.maintenance_status
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT user_id, question, answer, timestamp
-                FROM interactions 
-                WHERE question LIKE ? OR answer LIKE ?
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (f'%{query}%', f'%{query}%', limit))
-            
-            results = cursor.fetchall()
-            conn.close()
-            
-            return [
-                {
-                    "user_id": result[0],
-                    "question": result[1],
-                    "answer": result[2],
-                    "timestamp": result[3]
-                }
-                for result in results
-            ]
-            
+            started = time.perf_counter()
+            archived, users = self._apply_retention(stop)
+            vacuumed = self._compact(full_vacuum)
+            vectors_dropped = self.vectors.compact() if self.vectors else 0
+            self.maintenance_status = {
+                "last_run": datetime.now().isoformat(),
+                "duration_s": round(time.perf_counter() - started, 3),
+                "archived_interactions": archived,
+                "users_pruned": users,
+                "pages_vacuumed": vacuumed,
+                "vectors_dropped": vectors_dropped,
+                "interrupted": bool(stop and stop.is_set())
+            }
+            if archived or vacuumed:
+                logger.info(f"🧹 Maintenance archived {archived} interactions "
+                            f"for {users} users, vacuumed {vacuumed} pages")
+            return self.maintenance_status
+        finally:
+            self._maintenance_lock.release()
+
+    def _apply_retention(self, stop=None):
+        archived = pruned = 0
+        last_user = ""
+        while not (stop and stop.is_set()):
+            with self.pool.connection() as conn:
+                page = conn.execute('''
+                    SELECT u.user_id, p.keep_last, p.keep_days
+                    FROM users u LEFT JOIN retention_policies p ON p.user_id = u.user_id
+                    WHERE u.user_id > ?
+                    ORDER BY u.user_id LIMIT ?
+                ''', (last_user, MAINTENANCE_BATCH)).fetchall()
+            if not page:
+                break
+            last_user = page[-1][0]
+
+            for user_id, keep_last, keep_days in page:
+                keep_last = RETENTION_KEEP_LAST if keep_last is None else keep_last
+                keep_days = RETENTION_DAYS if keep_days is None else keep_days
+                if not keep_last and not keep_days:
+                    continue
+
+                moved = 0
+                while not (stop and stop.is_set()):
+                    count = self._archive_batch(user_id, keep_last, keep_days)
+                    moved += count
+                    if count < MAINTENANCE_BATCH:
+                        break
+                    time.sleep(MAINTENANCE_PAUSE)
+                if moved:
+                    archived += moved
+                    pruned += 1
+                    time.sleep(MAINTENANCE_PAUSE)
+        return archived, pruned
+
+    def _archive_batch(self, user_id, keep_last, keep_days):
+        """Move one batch of a user's oldest out-of-policy interactions into the archive"""
+        with self.pool.transaction() as conn:
+            conditions, params = [], [user_id]
+            if keep_last:
+                # Newest row past the keep_last most recent; it and everything older go
+                boundary = conn.execute('''
+                    SELECT ts, id FROM interactions WHERE user_id = ?
+                    ORDER BY ts DESC, id DESC LIMIT 1 OFFSET ?
+                ''', (user_id, keep_last)).fetchone()
+                if boundary:
+                    conditions.append("(ts, id) <= (?, ?)")
+                    params.extend(boundary)
+            if keep_days:
+                conditions.append("ts < ?")
+                params.append(to_ts((datetime.now() - timedelta(days=keep_days)).isoformat()))
+            if not conditions:
+                return 0
+
+            rows = conn.execute(f'''
+                SELECT id, question, answer, timestamp, ts FROM interactions
+                WHERE user_id = ? AND ({" OR ".join(conditions)})
+                ORDER BY ts, id LIMIT ?
+            ''', params + [MAINTENANCE_BATCH]).fetchall()
+            if not rows:
+                return 0
+
+            # Anything not yet folded into the rolling summary is folded before it goes
+            current = conn.execute(
+                "SELECT summary, covered_through_ts, covered_count FROM user_summaries WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            summary, covered_ts, covered_count = current if current else ("", -1, 0)
+            unfolded = [row for row in rows if row[4] > covered_ts]
+            if unfolded:
+                summary = roll_summary(summary, [summarize_interaction(row[1]) for row in unfolded])
+                conn.execute('''
+                    INSERT INTO user_summaries (user_id, summary, covered_through_ts, covered_count, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        summary = excluded.summary,
+                        covered_through_ts = excluded.covered_through_ts,
+                        covered_count = excluded.covered_count,
+                        updated_at = excluded.updated_at
+                ''', (user_id, summary, unfolded[-1][4], covered_count + len(unfolded),
+                      datetime.now().isoformat()))
+
+            payload = pack_archive([
+                {"id": row[0], "question": row[1], "answer": row[2], "timestamp": row[3]}
+                for row in rows
+            ])
+            conn.execute('''
+                INSERT INTO interactions_archive (user_id, first_ts, last_ts, count, payload, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, rows[0][4], rows[-1][4], len(rows), payload, datetime.now().isoformat()))
+            conn.executemany("DELETE FROM interactions WHERE id = ?", [(row[0],) for row in rows])
+
+        if self.memory_cache:
+            self.memory_cache.invalidate([user_id])
+        return len(rows)
+
+    def _compact(self, full_vacuum=False):
+        """Return free pages to the OS a slice at a time, refresh planner stats, checkpoint"""
+        vacuumed = 0
+        if full_vacuum:
+            # Rewrites the whole file and blocks writers meanwhile; only on request.
+            # Also switches databases created before auto_vacuum to incremental mode.
+            with self.pool.writing() as conn:
+                pages = conn.execute("PRAGMA page_count").fetchone()[0]
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                vacuumed = pages - conn.execute("PRAGMA page_count").fetchone()[0]
+        else:
+            with self.pool.connection() as conn:
+                incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+            # Small slices keep each write lock short; executescript steps the
+            # pragma to completion (execute() would free a single page)
+            while incremental and vacuumed < VACUUM_PAGES:
+                with self.pool.writing() as conn:
+                    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                    if not free:
+                        break
+                    conn.executescript(f"PRAGMA incremental_vacuum({min(free, VACUUM_SLICE_PAGES)});")
+                    vacuumed += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                time.sleep(MAINTENANCE_PAUSE)
+
+        with self.pool.writing() as conn:
+            conn.execute("PRAGMA analysis_limit = 400")
+            conn.execute("PRAGMA optimize")
+        with self.pool.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return vacuumed
+
+    def trigger_maintenance(self, full_vacuum=False):
+        """Start a maintenance pass in the background"""
+        if self.maintenance and not full_vacuum:
+            self.maintenance.trigger()
+        else:
+            threading.Thread(target=self.run_maintenance, kwargs={"full_vacuum": full_vacuum},
+                             name="memory-maintenance-once", daemon=True).start()
+
+    def export_archive(self, user_id):
+        """Yield a user's archived interactions, oldest first"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute('''
+                SELECT payload FROM interactions_archive
+                WHERE user_id = ? ORDER BY last_ts, id
+            ''', (user_id,))
+            for (payload,) in cursor:
+                for item in unpack_archive(payload):
+                    yield dict(item, user_id=user_id)
+
+    def export_users(self):
+        """Yield every user as a dict, most recently seen first, straight off the cursor"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute('''
+                SELECT user_id, first_seen, last_seen, total_interactions
+                FROM users
+                ORDER BY last_seen DESC, user_id DESC
+            ''')
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield {
+                        "user_id": row[0],
+                        "first_seen": row[1],
+                        "last_seen": row[2],
+                        "total_interactions": row[3]
+                    }
+
+    def export_interactions(self, user_id):
+        """Yield a user's full interaction history, oldest first, straight off the cursor"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute('''
+                SELECT id, question, answer, timestamp
+                FROM interactions
+                WHERE user_id = ?
+                ORDER BY ts, id
+            ''', (user_id,))
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield {
+                        "id": row[0],
+                        "user_id": user_id,
+                        "question": row[1],
+                        "answer": row[2],
+                        "timestamp": row[3]
+                    }
+
+    @timed("memory_search")
+    def search_interactions(self, query, limit=20, user_id=None, cursor=None):
+        """Search through interactions, best matches first; returns (results, next_cursor)
+
+        Raises BadCursor for a cursor that did not come from an earlier search.
+        """
+        after = decode_search_cursor(cursor) if cursor else None
+        try:
+            if not self.has_search_index:
+                return self._scan_interactions(query, limit, user_id), None
+
+            rows = self.search_rows(query, limit + 1, user_id, after)
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(*rows[-1][0])
+            return [result for _, result in rows], next_cursor
+
         except Exception as e:
             logger.error(f"❌ Error searching interactions: {str(e)}")
+            return [], None
+
+    def search_rows(self, query, limit, user_id=None, after=None):
+        """Full-text matches as ((rank, id), result) pairs, resuming strictly after `after`"""
+        match = fts_query(query)
+        if not match:
             return []
 
-# Initialize memory agent
-memory_agent = MemoryAgent()
+        sql = '''
+            SELECT i.id, i.user_id, i.question, i.answer, i.timestamp,
+                   bm25(interactions_fts) AS rank,
+                   snippet(interactions_fts, 0, '<mark>', '</mark>', '…', 12),
+                   snippet(interactions_fts, 1, '<mark>', '</mark>', '…', 12)
+            FROM interactions_fts
+            JOIN interactions i ON i.id = interactions_fts.rowid
+            WHERE interactions_fts MATCH ?
+        '''
+        params = [match]
+        if user_id:
+            sql += " AND i.user_id = ?"
+            params.append(user_id)
+        if after:
+            # Keyset on (rank, id): resume strictly after the last row served
+            last_rank, last_id = after
+            sql += " AND (bm25(interactions_fts) > ? OR (bm25(interactions_fts) = ? AND i.id > ?))"
+            params.extend([last_rank, last_rank, last_id])
+        sql += " ORDER BY rank, i.id LIMIT ?"
+        params.append(limit)
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [
+            ((row[5], row[0]), {
+                "user_id": row[1],
+                "question": row[2],
+                "answer": row[3],
+                "timestamp": row[4],
+                "score": -row[5],
+                "question_snippet": row[6],
+                "answer_snippet": row[7]
+            })
+            for row in rows
+        ]
+
+    def _scan_interactions(self, query, limit, user_id=None):
+        """Substring scan used when SQLite has no FTS5 support"""
+        sql = '''
+            SELECT user_id, question, answer, timestamp
+            FROM interactions 
+            WHERE (question LIKE ? OR answer LIKE ?)
+        '''
+        params = [f'%{query}%', f'%{query}%']
+        if user_id:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
 
-@app.route('/save_interaction', methods=['POST'])
+        with self.pool.connection() as conn:
+            results = conn.execute(sql, params).fetchall()
+
+        return [
+            {
+                "user_id": result[0],
+                "question": result[1],
+                "answer": result[2],
+                "timestamp": result[3]
+            }
+            for result in results
+        ]
+
+def create_app(db_path=None):
+    """App factory: one MemoryAgent (connections, queue, caches) per worker process"""
+    # Imported here because sharding builds on this module
+    from sharding import create_memory_agent
+
+    app = Flask(__name__)
+    agent = create_memory_agent(db_path or MEMORY_DB_PATH)
+    app.extensions["agent"] = agent
+    app.register_blueprint(bp)
+    metrics.init_app(app, "memory")
+    wire.init_app(app)
+    atexit.register(agent.close)
+    return app
+
+# The current app's memory agent
+memory_agent = LocalProxy(lambda: current_app.extensions["agent"])
+
+def interaction_error(item):
+    """Why a save body cannot be stored, or None
+
+    Checked before queueing: a bad row acknowledged with 200 would only fail
+    later, inside a group commit shared with other users' writes.
+    """
+    if not isinstance(item, dict):
+        return "Each interaction must be an object"
+    if not all([item.get('user_id'), item.get('question'), item.get('answer')]):
+        return "Missing required fields"
+    if not all(isinstance(item[key], str) for key in ('user_id', 'question', 'answer')):
+        return "user_id, question and answer must be strings"
+    if item.get('timestamp') is not None and not isinstance(item['timestamp'], str):
+        return "timestamp must be an ISO 8601 string"
+    return None
+
+@bp.route('/save_interaction', methods=['POST'])
 def save_interaction():
     """Save a new interaction"""
     try:
-        data = request.json
-        user_id = data.get('user_id')
-        question = data.get('question')
-        answer = data.get('answer')
+        data = wire.read_body()
+        error = interaction_error(data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        user_id = data['user_id']
+        question = data['question']
+        answer = data['answer']
         timestamp = data.get('timestamp')
         
-        if not all([user_id, question, answer]):
-            return jsonify({"error": "Missing required fields"}), 400
-        
-        success = memory_agent.save_interaction(user_id, question, answer, timestamp)
+        success = memory_agent.queue_interaction(user_id, question, answer, timestamp)
         
+        if success and wire.wants_minimal():
+            return Response(status=204)
         if success:
             return jsonify({"status": "success", "message": "Interaction saved"})
         else:
@@ -241,47 +1692,180 @@ def save_interaction():
         logger.error(f"Error in /save_interaction: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/get_memory/<user_id>', methods=['GET'])
+@bp.route('/save_interactions', methods=['POST'])
+def save_interactions():
+    """Save a batch of interactions in a single transaction"""
+    try:
+        data = wire.read_body()
+        interactions = (data.get('interactions') or []) if isinstance(data, dict) else []
+
+        if not interactions or not isinstance(interactions, list):
+            return jsonify({"error": "No interactions provided"}), 400
+
+        rows = []
+        for item in interactions:
+            error = interaction_error(item)
+            if error:
+                return jsonify({"error": error}), 400
+            rows.append((item['user_id'], item['question'], item['answer'], item.get('timestamp')))
+
+        if memory_agent.save_interactions(rows):
+            return jsonify({"status": "success", "saved": len(rows)})
+        else:
+            return jsonify({"error": "Failed to save interactions"}), 500
+
+    except Exception as e:
+        logger.error(f"Error in /save_interactions: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/get_memory/<user_id>', methods=['GET'])
 def get_memory(user_id):
     """Get user's memory context"""
     try:
         limit = request.args.get('limit', 10, type=int)
-        memory = memory_agent.get_user_memory(user_id, limit)
-        return jsonify(memory)
+        # ?fields=user_id,total_interactions,... returns only what the caller uses
+        fields = request.args.get('fields')
+        fields = set(fields.split(',')) if fields else None
+        # ?q=<question> adds the user's most relevant older interactions
+        query = request.args.get('q')
+        relevant = request.args.get('relevant', 5, type=int)
+        memory = memory_agent.get_user_memory(user_id, limit, fields, query, relevant)
+        return wire.respond(memory)
         
     except Exception as e:
         logger.error(f"Error in /get_memory: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/users', methods=['GET'])
+@bp.route('/users', methods=['GET'])
 def get_users():
-    """Get all users"""
+    """Page through users, most recently seen first (?limit=&cursor=)"""
     try:
-        users = memory_agent.get_all_users()
-        return jsonify({"users": users})
-        
+        limit = min(max(request.args.get('limit', USERS_PAGE_SIZE, type=int), 1), USERS_PAGE_MAX)
+        cursor = request.args.get('cursor')
+        users, next_cursor = memory_agent.get_all_users(limit, cursor)
+        return jsonify({"users": users, "next_cursor": next_cursor})
+
+    except BadCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error in /users: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/search', methods=['GET'])
+def ndjson(rows):
+    """Stream dicts as newline-delimited JSON"""
+    return Response(stream_with_context(dumps_json(row) + b"\n" for row in rows),
+                    mimetype='application/x-ndjson')
+
+@bp.route('/export/users', methods=['GET'])
+def export_users():
+    """Every user as NDJSON"""
+    return ndjson(memory_agent.export_users())
+
+@bp.route('/export/interactions/<user_id>', methods=['GET'])
+def export_interactions(user_id):
+    """A user's full interaction history as NDJSON"""
+    return ndjson(memory_agent.export_interactions(user_id))
+
+def non_negative(value, types=(int, float)):
+    """None, or a number of `types` that is >= 0; JSON true/false are not numbers here"""
+    # bool is an int subclass, so it has to be ruled out explicitly
+    return value is None or (isinstance(value, types) and not isinstance(value, bool) and value >= 0)
+
+@bp.route('/retention/<user_id>', methods=['GET', 'PUT'])
+def retention(user_id):
+    """Read or override a user's retention policy ({"keep_last": n, "keep_days": d})"""
+    try:
+        if request.method == 'GET':
+            return jsonify(memory_agent.get_retention(user_id))
+
+        data = wire.read_body()
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected an object"}), 400
+        keep_last = data.get('keep_last')
+        keep_days = data.get('keep_days')
+        if not (non_negative(keep_last, int) and non_negative(keep_days)):
+            return jsonify({"error": "keep_last and keep_days must be non-negative numbers"}), 400
+        return jsonify(memory_agent.set_retention(user_id, keep_last, keep_days))
+
+    except Exception as e:
+        logger.error(f"Error in /retention: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/maintenance/run', methods=['POST'])
+def run_maintenance():
+    """Start a retention/compaction pass in the background (?vacuum=full rewrites the file)"""
+    memory_agent.trigger_maintenance(full_vacuum=request.args.get('vacuum') == 'full')
+    return jsonify({"status": "scheduled"}), 202
+
+@bp.route('/maintenance/status', methods=['GET'])
+def maintenance_status():
+    return jsonify(memory_agent.maintenance_status)
+
+@bp.route('/stats', methods=['GET'])
+def get_stats():
+    """Activity rollups (?days=7&hours=24&user_id=); cost grows with the window, not the history"""
+    try:
+        days = min(max(request.args.get('days', STATS_DAYS, type=int), 1), STATS_MAX_DAYS)
+        hours = min(max(request.args.get('hours', STATS_HOURS, type=int), 1), STATS_MAX_HOURS)
+        return jsonify(memory_agent.get_stats(days, hours, request.args.get('user_id')))
+
+    except Exception as e:
+        logger.error(f"Error in /stats: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/stats/rebuild', methods=['POST'])
+def rebuild_stats():
+    """Regenerate the rollups from raw interactions (blocks writes while it runs)"""
+    try:
+        return jsonify({"status": "success", "interactions": memory_agent.rebuild_rollups()})
+
+    except Exception as e:
+        logger.error(f"Error in /stats/rebuild: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/export/archive/<user_id>', methods=['GET'])
+def export_archive(user_id):
+    """A user's archived interactions as NDJSON"""
+    return ndjson(memory_agent.export_archive(user_id))
+
+@bp.route('/search', methods=['GET'])
 def search_interactions():
     """Search through interactions"""
     try:
         query = request.args.get('q', '')
-        limit = request.args.get('limit', 20, type=int)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        user_id = request.args.get('user_id')
+        cursor = request.args.get('cursor')
         
         if not query:
             return jsonify({"error": "No search query provided"}), 400
         
-        results = memory_agent.search_interactions(query, limit)
-        return jsonify({"results": results})
+        results, next_cursor = memory_agent.search_interactions(query, limit, user_id, cursor)
+        return jsonify({"results": results, "next_cursor": next_cursor})
         
+    except BadCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error in /search: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/health', methods=['GET'])
+@bp.route('/recall/<user_id>', methods=['GET'])
+def recall(user_id):
+    """The user's past interactions closest in meaning to ?q= (?limit=5)"""
+    try:
+        query = request.args.get('q', '')
+        limit = min(max(request.args.get('limit', 5, type=int), 1), RECALL_LIMIT_MAX)
+
+        if not query:
+            return jsonify({"error": "No recall query provided"}), 400
+
+        return jsonify({"user_id": user_id, "results": memory_agent.recall(user_id, query, limit)})
+
+    except Exception as e:
+        logger.error(f"Error in /recall: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
@@ -291,5 +1875,20 @@ def health_check():
     })
 
 if __name__ == '__main__':
-    print("🧠 Starting Memory Agent on port 5001...")
-    app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="🧠 Memory Agent")
+    parser.add_argument("--db", default=MEMORY_DB_PATH, help="database path (base path when sharded)")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="regenerate the /stats rollups and exit")
+    args = parser.parse_args()
+
+    if args.rebuild_rollups:
+        from sharding import create_memory_agent
+        agent = create_memory_agent(args.db, write_behind=False, memory_cache=False, maintenance_interval=0,
+                                    vectors=False)
+        try:
+            print(f"✅ Rebuilt rollups from {agent.rebuild_rollups()} interactions")
+        finally:
+            agent.close()
+    else:
+        print("🧠 Starting Memory Agent on port 5001...")
+        create_app(args.db).run(host='0.0.0.0', port=5001, debug=os.getenv("FLASK_DEBUG", "1") == "1") 
\ No newline at end of file
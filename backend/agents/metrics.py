@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+📈 Metrics - timing spans, counters and request IDs shared by every agent
+Spans feed fixed-bucket histograms (one bisect and a short lock per
+observation), exposed in Prometheus text format on each agent's /metrics.
+Each process keeps its own registry, so scrape every gunicorn worker or run
+one worker per port when you need exact totals.
+"""
+
+import os
+import time
+import uuid
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from flask import Response, request, g
+
+METRICS = os.getenv("METRICS", "1") == "1"
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The request being served on this thread (or copied into an executor task)
+current_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Registry:
+    """Named metric families, each keyed by a sorted tuple of label pairs"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        if family is None or key not in family["series"]:
+            with self._lock:
+                family = self._families.setdefault(name, {"kind": kind, "help": help_text, "series": {}})
+                family["series"].setdefault(key, factory())
+        return family["series"][key]
+
+    def histogram(self, name, help_text="", **labels):
+        return self._get("histogram", name, help_text, labels, Histogram)
+
+    def counter(self, name, help_text="", **labels):
+        return self._get("counter", name, help_text, labels, Counter)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            families = [(name, dict(f, series=dict(f["series"]))) for name, f in sorted(self._families.items())]
+
+        for name, family in families:
+            if family["help"]:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for key, metric in sorted(family["series"].items()):
+                if family["kind"] == "counter":
+                    lines.append(f"{name}{format_labels(key)} {metric.value}")
+                    continue
+                counts, total = metric.snapshot()
+                cumulative = 0
+                for bound, n in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{format_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(key)} {total}")
+                lines.append(f"{name}_count{format_labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+
+registry = Registry()
+
+
+def observe(name, seconds, **labels):
+    """Record one duration into the holomentor_span_seconds histogram"""
+    if METRICS:
+        registry.histogram("holomentor_span_seconds", "Time spent in instrumented code paths",
+                           span=name, **labels).observe(seconds)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block as span `name`"""
+    if not METRICS:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of span()"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, amount=1, help_text="", **labels):
+    if METRICS:
+        registry.counter(name, help_text, **labels).inc(amount)
+
+
+def request_headers():
+    """Headers that carry the current request ID to a downstream agent"""
+    request_id = current_request_id.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+def init_app(app, agent):
+    """Assign request IDs, time every request and serve GET /metrics"""
+
+    @app.before_request
+    def start_request():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.request_token = current_request_id.set(g.request_id)
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def finish_request(response):
+        request_id = getattr(g, "request_id", None)
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        if METRICS and request.endpoint != "metrics" and hasattr(g, "request_start"):
+            registry.histogram("holomentor_http_request_seconds", "HTTP request latency by route",
+                               agent=agent, route=request.url_rule.rule if request.url_rule else "unmatched",
+                               method=request.method).observe(time.perf_counter() - g.request_start)
+            count("holomentor_http_responses_total", help_text="HTTP responses by status",
+                  agent=agent, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def end_request(exc=None):
+        token = g.pop("request_token", None)
+        if token is not None:
+            try:
+                current_request_id.reset(token)
+            except ValueError:
+                # Streamed responses finish in a different context
+                pass
+
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics, methods=["GET"])
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+⚖️ Replica sets - spread calls to a downstream agent over its replicas
+Each call goes to the healthy replica with the fewest requests in flight.
+A background thread probes every replica's /health route, and a per-replica
+circuit breaker stops sending traffic to one that keeps failing, so a
+single bad replica fails fast instead of slowing every request.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+import requests
+from urllib3.exceptions import NewConnectionError
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds between active /health probes of every replica; 0 disables probing
+HEALTH_INTERVAL = float(os.getenv("AGENT_HEALTH_INTERVAL", "5"))
+HEALTH_TIMEOUT = float(os.getenv("AGENT_HEALTH_TIMEOUT", "1"))
+# Consecutive failures that open a replica's breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("AGENT_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("AGENT_BREAKER_COOLDOWN", "10"))
+
+
+class NoReplicaAvailable(Exception):
+    """Every replica of an agent is unhealthy or has its breaker open"""
+
+
+def parse_urls(value):
+    """"http://a:5001, http://b:5001" -> ["http://a:5001", "http://b:5001"]"""
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+def never_sent(error):
+    """The request failed before reaching the replica, so retrying elsewhere cannot duplicate it"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` in a row -> half-open (one trial call) after `cooldown`"""
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go through now; in half-open state only one trial is let through"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                return True
+            return False
+
+    def available(self):
+        """Like allow() but without claiming the half-open trial"""
+        return self.state == "closed" or (
+            self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown
+        )
+
+    def record(self, ok):
+        """Returns True when this result opened the breaker"""
+        with self._lock:
+            if ok:
+                self.state = "closed"
+                self.consecutive = 0
+                return False
+            self.consecutive += 1
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive >= self.failures):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class Replica:
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.breaker = CircuitBreaker()
+        self.requests = 0
+        self.failures = 0
+
+    def snapshot(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "breaker": self.breaker.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+
+class ReplicaSet:
+    """The replicas of one downstream agent, sharing one HTTP session"""
+
+    def __init__(self, name, urls, session, health_interval=HEALTH_INTERVAL):
+        if not urls:
+            raise ValueError(f"No URLs configured for the {name} agent")
+        self.name = name
+        self.replicas = [Replica(url) for url in urls]
+        self.http = session
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prober = None
+        if health_interval > 0:
+            # Probes get their own connection so a saturated pool never delays them
+            self._probe_session = requests.Session()
+            self._prober = threading.Thread(target=self._probe_loop, args=(health_interval,),
+                                            name=f"{name}-health", daemon=True)
+            self._prober.start()
+
+    @property
+    def urls(self):
+        return [replica.url for replica in self.replicas]
+
+    def pick(self, exclude=()):
+        """Healthy replica with the fewest requests in flight; ties are broken at random"""
+        with self._lock:
+            candidates = [r for r in self.replicas
+                          if r not in exclude and r.healthy and r.breaker.available()]
+            random.shuffle(candidates)
+            for replica in sorted(candidates, key=lambda r: r.outstanding):
+                if replica.breaker.allow():
+                    replica.outstanding += 1
+                    replica.requests += 1
+                    return replica
+        self.event("rejected")
+        raise NoReplicaAvailable(f"No healthy {self.name} agent replica available")
+
+    def release(self, replica, ok):
+        with self._lock:
+            replica.outstanding -= 1
+            if not ok:
+                replica.failures += 1
+        if replica.breaker.record(ok):
+            self.event("breaker_open")
+            logger.warning(f"⚡ Circuit opened for {self.name} replica {replica.url}")
+
+    @contextmanager
+    def request(self, method, path, idempotent=True, **kwargs):
+        """Send one call to the best replica, failing over once if it cannot be reached
+
+        Idempotent calls also fail over on connection errors and 5xx answers;
+        others only when the request provably never left this process.
+        The replica counts as busy until the with-block exits, so streamed
+        responses are balanced for their whole duration.
+        """
+        tried = []
+        while True:
+            replica = self.pick(exclude=tried)
+            tried.append(replica)
+            can_retry = len(tried) < 2 and len(tried) < len(self.replicas)
+            try:
+                response = self.http.request(method, replica.url + path, **kwargs)
+            except requests.RequestException as e:
+                self.release(replica, ok=False)
+                retryable = (idempotent and isinstance(e, requests.ConnectionError)) or never_sent(e)
+                if can_retry and retryable:
+                    self.event("failover")
+                    continue
+                raise
+            if response.status_code >= 500 and idempotent and can_retry:
+                response.close()
+                self.release(replica, ok=False)
+                self.event("failover")
+                continue
+            break
+
+        ok = response.status_code < 500
+        try:
+            yield response
+        except requests.RequestException:
+            ok = False
+            raise
+        finally:
+            response.close()
+            self.release(replica, ok)
+
+    def event(self, kind):
+        metrics.count("holomentor_replica_events_total", help_text="Downstream replica selection events",
+                      agent=self.name, event=kind)
+
+    def _probe_loop(self, interval):
+        while not self._stop.wait(interval):
+            for replica in self.replicas:
+                try:
+                    healthy = self._probe_session.get(f"{replica.url}/health", timeout=HEALTH_TIMEOUT).ok
+                except requests.RequestException:
+                    healthy = False
+                if healthy != replica.healthy:
+                    logger.info(f"{'💚' if healthy else '💔'} {self.name} replica {replica.url} "
+                                f"is {'healthy' if healthy else 'unhealthy'}")
+                replica.healthy = healthy
+
+    def snapshot(self):
+        with self._lock:
+            return {"agent": self.name, "replicas": [replica.snapshot() for replica in self.replicas]}
+
+    def close(self):
+        self._stop.set()
+        if self._prober:
+            self._prober.join(timeout=HEALTH_TIMEOUT + 1)
+            self._probe_session.close()
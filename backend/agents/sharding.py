@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+🧩 Memory sharding - spreads users over several SQLite files
+Each user_id is placed on a shard by consistent hashing, so every shard has its
+own writer lock, write-behind queue and cache, and writes for users on
+different shards proceed in parallel. Cross-shard reads (/users, /search,
+exports) fan out to every shard and merge.
+
+With MEMORY_SHARDS=1 (the default) the plain single-file MemoryAgent is used.
+Shard files sit next to the configured path: memory.db -> memory.shard0.db, ...
+
+After changing MEMORY_SHARDS (or to split an existing memory.db), stop the
+memory agent and move users to their new shards:
+    python sharding.py --db memory.db --shards 4
+"""
+
+import os
+import glob
+import heapq
+import hashlib
+import logging
+import argparse
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from memory_agent import (MemoryAgent, BadCursor, encode_cursor, decode_cursor, decode_users_cursor,
+                          is_search_key, INSERT_INTERACTION_SQL, STATS_DAYS, STATS_HOURS,
+                          merge_stats_totals, rebuild_rollups, render_stats)
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SHARDS = int(os.getenv("MEMORY_SHARDS", "1"))
+# Points per shard on the hash ring; more points, more even spread
+SHARD_VNODES = 64
+MOVE_BATCH_SIZE = 1000
+
+
+def ring_hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shard_path(db_path, name):
+    base, ext = os.path.splitext(db_path)
+    return f"{base}.{name}{ext or '.db'}"
+
+
+def shard_names(count):
+    return [f"shard{i}" for i in range(count)]
+
+
+class HashRing:
+    """Consistent hash ring: adding a shard only moves the users it takes over"""
+
+    def __init__(self, names, vnodes=SHARD_VNODES):
+        points = sorted((ring_hash(f"{name}#{v}"), name) for name in names for v in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def lookup(self, key):
+        index = bisect_right(self._points, ring_hash(key)) % len(self._points)
+        return self._names[index]
+
+
+class ShardedMemoryAgent:
+    """The MemoryAgent interface over several shard files, routed by user_id"""
+
+    def __init__(self, db_path, shards=MEMORY_SHARDS, **agent_options):
+        self.db_path = db_path
+        self.names = shard_names(shards)
+        self.shards = {name: MemoryAgent(shard_path(db_path, name), **agent_options) for name in self.names}
+        self.ring = HashRing(self.names)
+        self.has_search_index = all(shard.has_search_index for shard in self.shards.values())
+        self.executor = ThreadPoolExecutor(max_workers=len(self.names), thread_name_prefix="memory-shard")
+
+    def shard_for(self, user_id):
+        return self.shards[self.ring.lookup(user_id)]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for shard in self.shards.values():
+            shard.close()
+
+    def _fan_out(self, call):
+        """Run call(shard) on every shard in parallel; returns {name: result}"""
+        futures = {name: self.executor.submit(call, shard) for name, shard in self.shards.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    # Single-user operations go straight to the owning shard
+
+    def save_interaction(self, user_id, question, answer, timestamp=None):
+        return self.shard_for(user_id).save_interaction(user_id, question, answer, timestamp)
+
+    def queue_interaction(self, user_id, question, answer, timestamp=None):
+        return self.shard_for(user_id).queue_interaction(user_id, question, answer, timestamp)
+
+    def get_user_memory(self, user_id, limit=10, fields=None, query=None, relevant=5):
+        return self.shard_for(user_id).get_user_memory(user_id, limit, fields, query, relevant)
+
+    def recall(self, user_id, query, limit=5):
+        return self.shard_for(user_id).recall(user_id, query, limit)
+
+    def get_retention(self, user_id):
+        return self.shard_for(user_id).get_retention(user_id)
+
+    def set_retention(self, user_id, keep_last=None, keep_days=None):
+        return self.shard_for(user_id).set_retention(user_id, keep_last, keep_days)
+
+    def export_interactions(self, user_id):
+        return self.shard_for(user_id).export_interactions(user_id)
+
+    def export_archive(self, user_id):
+        return self.shard_for(user_id).export_archive(user_id)
+
+    # Multi-user operations are split by shard or fanned out and merged
+
+    def save_interactions(self, interactions):
+        """Write each shard's share of the batch in parallel"""
+        groups = defaultdict(list)
+        for row in interactions:
+            groups[self.ring.lookup(row[0])].append(row)
+        futures = [self.executor.submit(self.shards[name].save_interactions, rows) for name, rows in groups.items()]
+        return all([future.result() for future in futures])
+
+    def get_all_users(self, limit=100, cursor=None):
+        """One page of users across shards, most recently seen first"""
+        if cursor:
+            decode_users_cursor(cursor)  # raises BadCursor before any shard is asked
+        pages = self._fan_out(lambda shard: shard.get_all_users(limit, cursor))
+        # The (last_seen, user_id) keyset is global, so one cursor serves every shard
+        merged = heapq.merge(*(users for users, _ in pages.values()),
+                             key=lambda user: (user["last_seen"], user["user_id"]), reverse=True)
+        users = [user for _, user in zip(range(limit + 1), merged)]
+        more = len(users) > limit or any(next_cursor for _, next_cursor in pages.values())
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1]["last_seen"], users[-1]["user_id"]) if more and users else None
+        return users, next_cursor
+
+    def export_users(self):
+        return heapq.merge(*(shard.export_users() for shard in self.shards.values()),
+                           key=lambda user: (user["last_seen"], user["user_id"]), reverse=True)
+
+    def search_interactions(self, query, limit=20, user_id=None, cursor=None):
+        """Best matches across shards; the cursor remembers where each shard left off"""
+        if user_id:
+            return self.shard_for(user_id).search_interactions(query, limit, user_id, cursor)
+
+        # Per shard: last (rank, id) served, or None once it has nothing left
+        state = decode_cursor(cursor) if cursor else [{}]
+        if not (isinstance(state, list) and len(state) == 1 and isinstance(state[0], dict) and
+                all(key is None or is_search_key(key) for key in state[0].values())):
+            raise BadCursor("Malformed cursor")
+        state = state[0]
+        try:
+            if not self.has_search_index:
+                results = self._fan_out(lambda shard: shard._scan_interactions(query, limit))
+                merged = sorted((r for rs in results.values() for r in rs),
+                                key=lambda r: r["timestamp"], reverse=True)
+                return merged[:limit], None
+
+            active = {name: shard for name, shard in self.shards.items()
+                      if name not in state or state[name] is not None}
+            futures = {name: self.executor.submit(shard.search_rows, query, limit + 1, None, state.get(name))
+                       for name, shard in active.items()}
+            fetched = {name: future.result() for name, future in futures.items()}
+
+            merged = heapq.merge(*([(key, name, result) for key, result in rows]
+                                   for name, rows in fetched.items()),
+                                 key=lambda item: (item[0], item[1]))
+            taken = [item for _, item in zip(range(limit), merged)]
+
+            consumed = defaultdict(int)
+            for key, name, _ in taken:
+                state[name] = list(key)
+                consumed[name] += 1
+            more = False
+            for name, rows in fetched.items():
+                if consumed[name] < len(rows):
+                    more = True
+                elif len(rows) <= limit:
+                    state[name] = None
+
+            return [result for _, _, result in taken], encode_cursor(state) if more else None
+
+        except Exception as e:
+            logger.error(f"❌ Error searching shards: {str(e)}")
+            return [], None
+
+    # Rollups add up across shards because every user lives on exactly one
+
+    def stats_totals(self, days=STATS_DAYS, hours=STATS_HOURS, user_id=None):
+        parts = self._fan_out(lambda shard: shard.stats_totals(days, hours, user_id))
+        return merge_stats_totals(parts.values())
+
+    def get_stats(self, days=STATS_DAYS, hours=STATS_HOURS, user_id=None):
+        return render_stats(self.stats_totals(days, hours, user_id), days, hours, user_id)
+
+    def rebuild_rollups(self):
+        return sum(self._fan_out(lambda shard: shard.rebuild_rollups()).values())
+
+    # Maintenance runs independently on every shard
+
+    def run_maintenance(self, stop=None, full_vacuum=False):
+        return self._fan_out(lambda shard: shard.run_maintenance(stop, full_vacuum))
+
+    def trigger_maintenance(self, full_vacuum=False):
+        for shard in self.shards.values():
+            shard.trigger_maintenance(full_vacuum)
+
+    @property
+    def maintenance_status(self):
+        return {name: shard.maintenance_status for name, shard in self.shards.items()}
+
+
+def create_memory_agent(db_path, shards=MEMORY_SHARDS, **agent_options):
+    """A plain MemoryAgent for one shard, otherwise the sharded facade"""
+    if shards <= 1:
+        return MemoryAgent(db_path, **agent_options)
+    return ShardedMemoryAgent(db_path, shards, **agent_options)
+
+
+def move_user(source, target, user_id):
+    """Copy one user's rows from source to target, then delete them from source
+
+    Interactions and archive batches already present on the target are skipped,
+    so a move interrupted between the two commits can simply be run again.
+    """
+    with source.pool.connection() as src:
+        user = src.execute(
+            "SELECT first_seen, last_seen, total_interactions FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        summary = src.execute(
+            "SELECT summary, covered_through_ts, covered_count, updated_at FROM user_summaries WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        policy = src.execute(
+            "SELECT keep_last, keep_days, updated_at FROM retention_policies WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        archive = src.execute('''
+            SELECT first_ts, last_ts, count, payload, archived_at
+            FROM interactions_archive WHERE user_id = ?
+        ''', (user_id,)).fetchall()
+        interactions = src.execute(
+            "SELECT question, answer, timestamp, ts FROM interactions WHERE user_id = ? ORDER BY ts, id",
+            (user_id,)
+        )
+
+        skipped = 0
+        with target.pool.transaction() as dst:
+            while True:
+                rows = interactions.fetchmany(MOVE_BATCH_SIZE)
+                if not rows:
+                    break
+                for question, answer, timestamp, ts in rows:
+                    exists = dst.execute('''
+                        SELECT 1 FROM interactions
+                        WHERE user_id = ? AND ts = ? AND question = ? AND answer = ?
+                    ''', (user_id, ts, question, answer)).fetchone()
+                    if exists:
+                        skipped += 1
+                        continue
+                    dst.execute(INSERT_INTERACTION_SQL, (user_id, question, answer, timestamp, ts))
+
+            if user:
+                dst.execute('''
+                    INSERT INTO users (user_id, first_seen, last_seen, total_interactions)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        first_seen = MIN(users.first_seen, excluded.first_seen),
+                        last_seen = MAX(users.last_seen, excluded.last_seen),
+                        total_interactions = users.total_interactions + excluded.total_interactions
+                ''', (user_id, user[0], user[1], max(user[2] - skipped, 0)))
+            if summary:
+                # A summary already on the target is newer than the moved one
+                dst.execute('''
+                    INSERT OR IGNORE INTO user_summaries
+                        (user_id, summary, covered_through_ts, covered_count, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (user_id,) + tuple(summary))
+            if policy:
+                dst.execute('''
+                    INSERT OR IGNORE INTO retention_policies (user_id, keep_last, keep_days, updated_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (user_id,) + tuple(policy))
+            for first_ts, last_ts, count, payload, archived_at in archive:
+                dst.execute('''
+                    INSERT INTO interactions_archive (user_id, first_ts, last_ts, count, payload, archived_at)
+                    SELECT ?, ?, ?, ?, ?, ?
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM interactions_archive
+                        WHERE user_id = ? AND first_ts = ? AND last_ts = ? AND count = ?
+                    )
+                ''', (user_id, first_ts, last_ts, count, payload, archived_at,
+                      user_id, first_ts, last_ts, count))
+            # Hourly and size rollups stay where they are; only their sum over shards matters
+            rebuild_rollups(dst.cursor(), user_id)
+
+    with source.pool.transaction() as src:
+        for table in ("interactions", "users", "user_summaries", "retention_policies", "interactions_archive",
+                      "activity_user_daily"):
+            src.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+
+    for agent in (source, target):
+        if agent.memory_cache:
+            agent.memory_cache.invalidate([user_id])
+
+
+def rebalance(db_path, shards):
+    """Move every user to the shard the ring assigns for `shards` shards
+
+    Sources are the unsharded file at db_path (if any) and every existing
+    shard file, including ones beyond the new count. Returns users moved.
+    """
+    names = shard_names(shards)
+    ring = HashRing(names)
+    # Vector files catch up with the moved rows when the agent next starts
+    agent_options = {"write_behind": False, "memory_cache": False, "maintenance_interval": 0, "vectors": False}
+    targets = {name: MemoryAgent(shard_path(db_path, name), **agent_options) for name in names}
+
+    base, ext = os.path.splitext(db_path)
+    sources = {}
+    for path in sorted(glob.glob(f"{glob.escape(base)}.shard*{ext or '.db'}")):
+        name = os.path.basename(path)[len(os.path.basename(base)) + 1:-len(ext or '.db')]
+        if name not in targets:
+            sources[name] = MemoryAgent(path, **agent_options)
+    if os.path.exists(db_path):
+        sources["unsharded"] = MemoryAgent(db_path, **agent_options)
+
+    moved = 0
+    try:
+        for name, source in list(targets.items()) + list(sources.items()):
+            with source.pool.connection() as conn:
+                users = [row[0] for row in conn.execute("SELECT user_id FROM users ORDER BY user_id")]
+            for user_id in users:
+                owner = ring.lookup(user_id)
+                if owner != name:
+                    move_user(source, targets[owner], user_id)
+                    moved += 1
+            logger.info(f"🧩 {name}: checked {len(users)} users")
+        # Global rollups left on retired shard files would otherwise drop out of the sums
+        if moved:
+            for target in targets.values():
+                target.rebuild_rollups()
+    finally:
+        for agent in list(targets.values()) + list(sources.values()):
+            agent.close()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move memory users onto their consistent-hash shards")
+    parser.add_argument("--db", default=os.getenv("MEMORY_DB_PATH", "memory.db"), help="base database path")
+    parser.add_argument("--shards", type=int, default=MEMORY_SHARDS)
+    args = parser.parse_args()
+
+    if args.shards < 2:
+        parser.error("--shards must be at least 2")
+    logging.basicConfig(level=logging.INFO)
+    moved = rebalance(args.db, args.shards)
+    print(f"✅ Moved {moved} users onto {args.shards} shards")
+
+
+if __name__ == '__main__':
+    main()
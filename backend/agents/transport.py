@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+🔌 Agent transports - how the Master Agent reaches the Memory and Answer agents
+"http" calls their Flask endpoints (distributed deployments), balancing
+over every replica listed in the agent's URL setting; "inprocess"
+calls MemoryAgent / AnswerAgent directly inside the master's process.
+"""
+
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import request_headers
+from wire import WireClient, loads_json
+from replicas import ReplicaSet, parse_urls
+
+logger = logging.getLogger(__name__)
+
+
+class AgentError(Exception):
+    """A downstream agent answered with an error status"""
+
+
+def create_session(pool_size=32, hosts=4):
+    """HTTP session with bounded keep-alive connection pools (one per host)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max(hosts, 4), pool_maxsize=pool_size, pool_block=True, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HttpMemoryTransport:
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.wire = WireClient()
+
+    def get_memory(self, user_id, limit, fields=None, question=None, relevant=0, timeout=None):
+        params = {"limit": limit}
+        if fields:
+            params["fields"] = ",".join(fields)
+        if question:
+            params["q"] = question
+            params["relevant"] = relevant
+
+        with self.replicas.request("GET", f"/get_memory/{user_id}", params=params,
+                                   headers=dict(self.wire.headers, **request_headers()), timeout=timeout) as response:
+            if response.status_code != 200:
+                raise AgentError(f"Memory agent returned {response.status_code}")
+            return self.wire.parse(response)
+
+    def save_interaction(self, user_id, question, answer, timestamp, timeout=None):
+        payload = {
+            "user_id": user_id,
+            "question": question,
+            "answer": answer,
+            "timestamp": timestamp
+        }
+        data, headers = self.wire.body(payload)
+        # Not idempotent: a retry on another replica could store the interaction twice
+        with self.replicas.request("POST", "/save_interaction", idempotent=False, data=data,
+                                   headers=dict(self.wire.headers, **headers, **request_headers()),
+                                   timeout=timeout) as response:
+            if response.status_code not in (200, 204):
+                raise AgentError(f"Failed to save interaction: {response.status_code}")
+
+    def close(self):
+        self.replicas.close()
+        self.replicas.http.close()
+
+
+class HttpAnswerTransport:
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.wire = WireClient()
+
+    def answer(self, question, user_id, memory_context, timeout=None):
+        payload = {
+            "question": question,
+            "user_id": user_id,
+            "memory_context": memory_context
+        }
+        data, headers = self.wire.body(payload)
+        with self.replicas.request("POST", "/answer", data=data,
+                                   headers=dict(self.wire.headers, **headers, **request_headers()),
+                                   timeout=timeout) as response:
+            if response.status_code != 200:
+                raise AgentError(f"Answer agent returned {response.status_code}")
+            return self.wire.parse(response).get("answer", "I couldn't generate an answer.")
+
+    def stream_answer(self, question, user_id, memory_context, timeout=None):
+        """Yield tokens relayed from the answer agent's SSE stream
+
+        Raises AgentError if the stream reports an error or ends without its done event.
+        """
+        payload = {
+            "question": question,
+            "user_id": user_id,
+            "memory_context": memory_context
+        }
+        data, headers = self.wire.body(payload)
+        with self.replicas.request("POST", "/answer", params={"stream": "1"}, data=data,
+                                   headers=dict(headers, **request_headers()), timeout=timeout,
+                                   stream=True) as response:
+            if response.status_code != 200:
+                raise AgentError(f"Answer agent returned {response.status_code}")
+
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    event = None
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = loads_json(line[len("data:"):])
+                    if event == "done":
+                        return
+                    if event == "error":
+                        raise AgentError(f"Answer stream failed: {data.get('error')}")
+                    token = data.get("token")
+                    if token:
+                        yield token
+            raise AgentError("Answer stream ended before its done event")
+
+    def close(self):
+        self.replicas.close()
+        self.replicas.http.close()
+
+
+class InProcessMemoryTransport:
+    """Calls a MemoryAgent living in this process; timeouts do not apply"""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def get_memory(self, user_id, limit, fields=None, question=None, relevant=0, timeout=None):
+        memory = self.agent.get_user_memory(user_id, limit, set(fields) if fields else None, question, relevant)
+        if "error" in memory:
+            raise AgentError(memory["error"])
+        return memory
+
+    def save_interaction(self, user_id, question, answer, timestamp, timeout=None):
+        if not self.agent.queue_interaction(user_id, question, answer, timestamp):
+            raise AgentError("Failed to save interaction")
+
+    def close(self):
+        self.agent.close()
+
+
+class InProcessAnswerTransport:
+    """Calls an AnswerAgent living in this process; timeouts do not apply"""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def answer(self, question, user_id, memory_context, timeout=None):
+        return self.agent.generate_answer(question, user_id, memory_context)
+
+    def stream_answer(self, question, user_id, memory_context, timeout=None):
+        if not (yield from self.agent.stream_answer(question, user_id, memory_context)):
+            raise AgentError("Answer stream ended early")
+
+    def close(self):
+        self.agent.close()
+
+
+def create_transports(mode, memory_url, answer_url, pool_size=32):
+    """Build the (memory, answer) transport pair for the configured mode"""
+    if mode == "inprocess":
+        # Imported lazily so the http mode never loads the other agents
+        from memory_agent import MEMORY_DB_PATH
+        from sharding import create_memory_agent
+        from answer_agent import AnswerAgent
+
+        logger.info("🔌 Using in-process agent transport")
+        return InProcessMemoryTransport(create_memory_agent(MEMORY_DB_PATH)), InProcessAnswerTransport(AnswerAgent())
+
+    if mode != "http":
+        raise ValueError(f"Unknown agent transport: {mode}")
+
+    # Each URL setting may list several replicas, comma-separated
+    memory_urls, answer_urls = parse_urls(memory_url), parse_urls(answer_url)
+    session = create_session(pool_size, len(memory_urls) + len(answer_urls))
+    memory = ReplicaSet("memory", memory_urls, session)
+    answer = ReplicaSet("answer", answer_urls, session)
+    logger.info(f"🔌 Using HTTP agent transport: memory {memory.urls}, answer {answer.urls}")
+    return HttpMemoryTransport(memory), HttpAnswerTransport(answer)
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+🧭 Vector index - semantic recall over each user's past interactions
+Interactions are embedded with a CPU-only hashing embedder (no model to
+download) and appended to int8 arrays memory-mapped next to the database
+file, so older conversations that share no exact phrase with a question can
+still be recalled. Vectors are indexed in a background thread after each
+commit, picking up every interaction id above the last one indexed.
+
+NumPy is optional: with it, recall is a vectorized scan of the user's rows
+(pre-filtered by a bit sketch for very long histories); without it, a pure
+Python scan that is fine for a few thousand interactions per user.
+"""
+
+import os
+import re
+import mmap
+import time
+import zlib
+import heapq
+import struct
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Embedding width; a multiple of 64 so the bit sketch packs into whole words
+VECTOR_DIM = int(os.getenv("MEMORY_VECTOR_DIM", "256"))
+# Users with more rows than this are pre-filtered by bit sketch before exact scoring
+VECTOR_EXACT_ROWS = int(os.getenv("MEMORY_VECTOR_EXACT_ROWS", "8192"))
+VECTOR_CANDIDATES = 4096
+# Long histories whose sketch is kept in RAM column-major (8 bytes per row and dim/64)
+VECTOR_SKETCH_USERS = int(os.getenv("MEMORY_VECTOR_SKETCH_USERS", "8"))
+VECTOR_SYNC_BATCH = 1000
+# Compact once this share of indexed rows no longer exists in the database
+VECTOR_COMPACT_RATIO = 0.2
+
+EMBEDDER_VERSION = 1
+QUESTION_WEIGHT = 2.0
+ANSWER_CHARS = 1000
+STEM_CHARS = 5
+STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from how i if in is it its me my of on or "
+    "so that the this to was we what when where which who why will with would you your".split()
+)
+WORD = re.compile(r"\w+")
+
+# Every file starts with magic, dim, embedder version and a generation that
+# changes on compaction, so a half-finished compaction is detected on open
+HEADER = struct.Struct("<8sIIQ8x")
+MAGIC = b"HMVECT01"
+KEY = struct.Struct("<qQf")  # interaction id, user hash, dequantization scale
+PARTS = ("keys", "i8", "bits")
+
+if np is not None:
+    KEY_DTYPE = np.dtype([("id", "<i8"), ("user", "<u8"), ("scale", "<f4")])
+    POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+@lru_cache(maxsize=1 << 16)
+def feature_slot(feature, dim):
+    """(bucket, sign) of a hashed feature; words repeat a lot, so this is cached"""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+def user_hash(user_id):
+    return int.from_bytes(hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def popcount(words):
+    """Set bits of each element of a 1-D uint64 array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return POPCOUNT[words.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words, word pairs and word stems into `dim` buckets"""
+
+    version = EMBEDDER_VERSION
+
+    def __init__(self, dim=VECTOR_DIM):
+        self.dim = dim
+
+    def _features(self, vector, text, weight):
+        dim = self.dim
+        half = weight * 0.5
+        previous = None
+        for word in WORD.findall(text.lower()):
+            if word in STOPWORDS:
+                continue
+            slot, sign = feature_slot(word, dim)
+            vector[slot] += sign * weight
+            # "recursion" and "recursive" share a stem feature
+            if len(word) > STEM_CHARS:
+                slot, sign = feature_slot(word[:STEM_CHARS] + "~", dim)
+                vector[slot] += sign * half
+            if previous:
+                slot, sign = feature_slot(previous + " " + word, dim)
+                vector[slot] += sign * half
+            previous = word
+
+    def embed(self, question, answer=""):
+        """Unit-length sparse vector {bucket: weight}; empty when there are no content words"""
+        vector = defaultdict(float)
+        self._features(vector, question, QUESTION_WEIGHT)
+        if answer:
+            self._features(vector, answer[:ANSWER_CHARS], 1.0)
+        norm = sum(x * x for x in vector.values()) ** 0.5
+        return {i: x / norm for i, x in vector.items() if x} if norm else {}
+
+    def quantize(self, vector):
+        """(scale, int8 bytes, sketch bytes); the sketch has one bit plane for positive
+        components and one for negative, so it approximates the sign of each term of a dot product"""
+        peak = max(map(abs, vector.values()), default=0.0)
+        scale = peak / 127 if peak else 1.0
+        values = bytearray(self.dim)
+        positive = negative = 0
+        for i, x in vector.items():
+            value = round(x / scale)
+            if value > 0:
+                positive |= 1 << i
+            elif value < 0:
+                negative |= 1 << i
+            values[i] = value & 0xFF
+        width = self.dim // 8
+        return scale, bytes(values), positive.to_bytes(width, "little") + negative.to_bytes(width, "little")
+
+
+class VectorIndex:
+    """Append-only vector files for one database, indexed incrementally by interaction id"""
+
+    def __init__(self, db_path, pool, embedder=None, background=True):
+        self.pool = pool
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = self.embedder.dim
+        self.paths = {part: f"{db_path}.vectors.{part}" for part in PARTS}
+        self.widths = {"keys": KEY.size, "i8": self.dim, "bits": self.dim // 4}
+        self._lock = threading.Lock()        # index state
+        self._sync_lock = threading.Lock()   # one writer of the files at a time
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._sketch_lock = threading.Lock()
+        self.epoch = 0
+        self._open()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="vector-index", daemon=True)
+            self._thread.start()
+            self._wake.set()
+
+    # --- files ---
+
+    def _open(self):
+        """Map existing files, or start empty when they are missing or don't match"""
+        headers = set()
+        for path in self.paths.values():
+            try:
+                with open(path, "rb") as f:
+                    headers.add(f.read(HEADER.size))
+            except OSError:
+                headers.add(b"")
+        header = headers.pop() if len(headers) == 1 else b""
+        if len(header) != HEADER.size or HEADER.unpack(header)[:3] != (MAGIC, self.dim, self.embedder.version):
+            self._create(time.time_ns())
+        self._files = {part: open(path, "r+b") for part, path in self.paths.items()}
+
+        # An append cut short by a crash leaves trailing partial rows; drop them
+        count = min((os.path.getsize(self.paths[part]) - HEADER.size) // self.widths[part] for part in PARTS)
+        for part, f in self._files.items():
+            f.truncate(HEADER.size + count * self.widths[part])
+        self._load(count)
+
+        # Files from another database (restored backup, replaced file) start over
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'interactions'").fetchone()
+        if self.last_id > (row[0] if row else 0):
+            logger.warning("⚠️ Vector index is ahead of the database, rebuilding it")
+            self._reset()
+
+    def _create(self, generation, suffix=""):
+        header = HEADER.pack(MAGIC, self.dim, self.embedder.version, generation)
+        for path in self.paths.values():
+            with open(path + suffix, "wb") as f:
+                f.write(header)
+
+    def _reset(self):
+        for f in self._files.values():
+            f.close()
+        self._create(time.time_ns())
+        self._files = {part: open(path, "r+b") for part, path in self.paths.items()}
+        self._load(0)
+
+    def _load(self, count):
+        """Rebuild the per-user row lists from the key file"""
+        groups = {}
+        last_id = 0
+        self._files["keys"].seek(HEADER.size)
+        data = self._files["keys"].read(count * KEY.size)
+        for row, (interaction_id, user, _) in enumerate(KEY.iter_unpack(data)):
+            groups.setdefault(user, array("q")).append(row)
+            last_id = max(last_id, interaction_id)
+        with self._lock:
+            # Row numbers change on reload; the epoch tells cached sketches apart
+            self.epoch += 1
+            self.count = count
+            self.last_id = last_id
+            self.groups = groups
+            self._views = None
+        with self._sketch_lock:
+            self._sketches = OrderedDict()
+
+    def _mapped(self):
+        """Views over the rows written so far, remapped after appends; call with _lock held"""
+        if self._views is None or self._views[0] != self.count:
+            self._views = (self.count, self._map(self.count))
+        return self._views[1]
+
+    def _map(self, count):
+        if count == 0:
+            return None
+        if np is not None:
+            return (
+                np.memmap(self.paths["keys"], dtype=KEY_DTYPE, mode="r", offset=HEADER.size, shape=(count,)),
+                np.memmap(self.paths["i8"], dtype=np.int8, mode="r", offset=HEADER.size, shape=(count, self.dim)),
+                np.memmap(self.paths["bits"], dtype=np.uint64, mode="r", offset=HEADER.size,
+                          shape=(count, self.dim // 32)),
+            )
+        maps = {part: mmap.mmap(self._files[part].fileno(), 0, access=mmap.ACCESS_READ) for part in ("keys", "i8")}
+        return maps["keys"], memoryview(maps["i8"])[HEADER.size:HEADER.size + count * self.dim].cast("b")
+
+    # --- indexing ---
+
+    def notify(self):
+        """New interactions were committed"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"❌ Error indexing vectors: {str(e)}")
+                self._stop.wait(1)
+
+    def sync(self):
+        """Embed and append every committed interaction not indexed yet; returns rows added"""
+        added = 0
+        with self._sync_lock:
+            while not self._stop.is_set():
+                with self.pool.connection() as conn:
+                    rows = conn.execute('''
+                        SELECT id, user_id, question, answer FROM interactions
+                        WHERE id > ? ORDER BY id LIMIT ?
+                    ''', (self.last_id, VECTOR_SYNC_BATCH)).fetchall()
+                if not rows:
+                    break
+                self._append(rows)
+                added += len(rows)
+        if added:
+            logger.info(f"🧭 Indexed {added} interaction vectors")
+        return added
+
+    def _append(self, rows):
+        chunks = {part: bytearray() for part in PARTS}
+        users = []
+        for interaction_id, user_id, question, answer in rows:
+            scale, values, sketch = self.embedder.quantize(self.embedder.embed(question, answer))
+            user = user_hash(user_id)
+            chunks["keys"] += KEY.pack(interaction_id, user, scale)
+            chunks["i8"] += values
+            chunks["bits"] += sketch
+            users.append(user)
+        # Keys go last: a row only counts once its key is on disk
+        for part in ("i8", "bits", "keys"):
+            self._files[part].seek(0, os.SEEK_END)
+            self._files[part].write(chunks[part])
+            self._files[part].flush()
+
+        with self._lock:
+            for row, user in enumerate(users, self.count):
+                self.groups.setdefault(user, array("q")).append(row)
+            self.count += len(rows)
+            self.last_id = rows[-1][0]
+
+    # --- search ---
+
+    def search(self, user_id, query, limit):
+        """[(interaction_id, score)] for the user's rows closest to `query`, best first"""
+        vector = self.embedder.embed(query)
+        if not vector or limit <= 0:
+            return []
+        user = user_hash(user_id)
+        with self._lock:
+            group = self.groups.get(user)
+            if not group:
+                return []
+            rows = group[:]
+            epoch = self.epoch
+            views = self._mapped()
+        if np is not None:
+            rows = np.frombuffer(rows, dtype=np.int64)
+            hits = self._search_numpy(views, (epoch, user), rows, vector, limit)
+        else:
+            hits = self._search_python(views, rows, list(vector.items()), limit)
+        # Rows sharing no feature with the query are not matches
+        return [hit for hit in hits if hit[1] > 0]
+
+    def _sketch(self, key, rows, bits):
+        """Column-major copy of a long history's sketch, so each word is scanned contiguously
+
+        A user's row list only grows within an epoch, so the cached prefix
+        stays valid and only new rows are copied in.
+        """
+        with self._sketch_lock:
+            filled, columns = self._sketches.pop(key, (0, None))
+            if columns is None or columns.shape[1] < len(rows):
+                grown = np.empty((bits.shape[1], max(len(rows), 2 * filled)), dtype=np.uint64)
+                if filled:
+                    grown[:, :filled] = columns[:, :filled]
+                columns = grown
+            if filled < len(rows):
+                columns[:, filled:len(rows)] = np.take(bits, rows[filled:], axis=0).T
+            self._sketches[key] = (len(rows), columns)
+            while len(self._sketches) > VECTOR_SKETCH_USERS:
+                self._sketches.popitem(last=False)
+            return columns[:, :len(rows)]
+
+    def _search_numpy(self, views, key, rows, vector, limit):
+        keys, values, bits = views
+        query = np.zeros(self.dim, dtype=np.float32)
+        query[list(vector)] = list(vector.values())
+        if len(rows) > max(VECTOR_EXACT_ROWS, VECTOR_CANDIDATES):
+            # Agreeing minus disagreeing signs on the query's terms approximates the
+            # dot product; the best candidates are then scored exactly
+            _, _, sketch = self.embedder.quantize(vector)
+            plane = np.frombuffer(sketch, dtype=np.uint64)
+            half = len(plane) // 2
+            swapped = np.concatenate((plane[half:], plane[:half]))
+            columns = self._sketch(key, rows, bits)
+            approx = np.zeros(len(rows), dtype=np.int16)
+            for word, agree, disagree in zip(columns, plane, swapped):
+                if agree:
+                    approx += popcount(word & agree)
+                if disagree:
+                    approx -= popcount(word & disagree)
+            rows = rows[np.argpartition(approx, len(rows) - VECTOR_CANDIDATES)[-VECTOR_CANDIDATES:]]
+
+        scores = (np.take(values, rows, axis=0).astype(np.float32) @ query) * np.take(keys["scale"], rows)
+        if len(scores) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        ids = np.take(keys["id"], rows[best])
+        return [(int(i), float(s)) for i, s in zip(ids, scores[best])]
+
+    def _search_python(self, views, rows, terms, limit):
+        keys, values = views
+        dim = self.dim
+        scored = []
+        for row in rows:
+            base = row * dim
+            interaction_id, _, scale = KEY.unpack_from(keys, HEADER.size + row * KEY.size)
+            scored.append((sum(values[base + i] * x for i, x in terms) * scale, interaction_id))
+        return [(interaction_id, score) for score, interaction_id in heapq.nlargest(limit, scored)]
+
+    # --- maintenance ---
+
+    def compact(self):
+        """Drop rows whose interactions were archived or moved away, grouping each user's
+        rows together; returns rows dropped (0 when not worth rewriting yet)"""
+        with self._sync_lock:
+            count = self.count
+            with self.pool.connection() as conn:
+                live = conn.execute("SELECT COUNT(*) FROM interactions WHERE id <= ?", (self.last_id,)).fetchone()[0]
+                if count - live <= count * VECTOR_COMPACT_RATIO:
+                    return 0
+
+                self._files["keys"].seek(HEADER.size)
+                keys = list(KEY.iter_unpack(self._files["keys"].read(count * KEY.size)))
+                # Merge-join the file's rows against live ids, both in id order, so the
+                # live ids stream past instead of being collected into a set
+                by_id = sorted(range(count), key=lambda row: keys[row][0])
+                ids = [keys[row][0] for row in by_id]
+                kept, position = [], 0
+                for (live_id,) in conn.execute("SELECT id FROM interactions WHERE id <= ? ORDER BY id",
+                                               (self.last_id,)):
+                    while position < count and ids[position] < live_id:
+                        position += 1
+                    if position == count:
+                        break
+                    if ids[position] == live_id:
+                        kept.append(by_id[position])
+                        position += 1
+            kept.sort(key=lambda row: (keys[row][1], keys[row][0]))
+
+            self._create(time.time_ns(), suffix=".tmp")
+            for part in PARTS:
+                width = self.widths[part]
+                source = self._files[part]
+                with open(self.paths[part] + ".tmp", "ab") as target:
+                    for row in kept:
+                        source.seek(HEADER.size + row * width)
+                        target.write(source.read(width))
+            # Readers keep the mappings of the replaced files until they remap
+            for part in PARTS:
+                self._files[part].close()
+                os.replace(self.paths[part] + ".tmp", self.paths[part])
+            self._files = {part: open(path, "r+b") for part, path in self.paths.items()}
+            self._load(len(kept))
+
+        dropped = count - len(kept)
+        logger.info(f"🧭 Compacted vector index, dropped {dropped} rows")
+        return dropped
+
+    def snapshot(self):
+        with self._lock:
+            return {"vectors": self.count, "users": len(self.groups), "last_id": self.last_id,
+                    "dim": self.dim, "numpy": np is not None}
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._sync_lock:
+            for f in self._files.values():
+                f.close()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+📦 Wire format - how agents encode request and response bodies
+Bodies are JSON unless both sides speak MessagePack (negotiated with
+Content-Type / Accept), and large bodies are gzip-compressed when the peer
+accepts it. JSON goes through orjson when it is installed; msgpack and
+orjson are both optional.
+"""
+
+import os
+import json
+import gzip
+import zlib
+from flask import Response, abort, g, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Body format agents ask each other for: "msgpack" (JSON when msgpack is missing) or "json"
+WIRE_FORMAT = os.getenv("AGENT_WIRE_FORMAT", "msgpack")
+# Bodies at least this many bytes are gzip-compressed; 0 (default) turns compression off.
+# Worth it when agents talk across a network; on loopback it only costs CPU.
+WIRE_COMPRESS_MIN = int(os.getenv("AGENT_WIRE_COMPRESS_MIN", "0"))
+# Level 1 gets most of the size win for a fraction of the CPU of the default 9
+WIRE_COMPRESS_LEVEL = 1
+# Largest body a gzip request may inflate to; anything bigger is refused with 413
+WIRE_MAX_BODY = int(os.getenv("AGENT_WIRE_MAX_BODY", str(16 * 1024 * 1024)))
+
+
+def dumps_json(obj):
+    """Compact UTF-8 JSON bytes"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads_json(body):
+    return orjson.loads(body) if orjson else json.loads(body)
+
+
+def preferred_type():
+    """The body format this agent asks its peers for"""
+    return MSGPACK if WIRE_FORMAT == "msgpack" and msgpack else JSON
+
+
+def encode(obj, content_type=JSON):
+    if content_type == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    return dumps_json(obj)
+
+
+def decode(body, content_type=JSON):
+    if not body:
+        return None
+    if content_type and content_type.startswith(MSGPACK):
+        return msgpack.unpackb(body, raw=False)
+    return loads_json(body)
+
+
+def compress(body, accept_encoding=""):
+    """(body, content_encoding) - gzipped only if it is large and the peer accepts gzip"""
+    if WIRE_COMPRESS_MIN and len(body) >= WIRE_COMPRESS_MIN and "gzip" in accept_encoding:
+        return gzip.compress(body, compresslevel=WIRE_COMPRESS_LEVEL), "gzip"
+    return body, None
+
+
+def inflate(body, limit=None):
+    """gunzip `body`, or None if it would inflate past `limit` (default WIRE_MAX_BODY) bytes"""
+    limit = WIRE_MAX_BODY if limit is None else limit
+    # Streaming with an output cap, so a small bomb never expands in full
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = inflater.decompress(body, limit + 1)
+    return data if len(data) <= limit else None
+
+
+# --- server side ---
+
+def inflate_request():
+    """Before each request: unpack a gzip body, refusing bombs with 413 and garbage with 400"""
+    if request.headers.get("Content-Encoding") != "gzip":
+        return
+    try:
+        body = inflate(request.get_data(cache=False))
+    except zlib.error:
+        abort(400, "Malformed gzip body")
+    if body is None:
+        abort(413, f"Body inflates past {WIRE_MAX_BODY} bytes")
+    g.wire_body = body
+
+
+def read_body():
+    """The request body as a dict, whatever format and encoding the caller used"""
+    body = g.pop("wire_body", None)
+    if body is None:
+        body = request.get_data(cache=False)
+    return decode(body, request.mimetype) or {}
+
+
+def wants_minimal():
+    """Caller sent Prefer: return=minimal and only needs the fields it asked for"""
+    return "return=minimal" in request.headers.get("Prefer", "")
+
+
+def respond(obj, status=200):
+    """A response in the best format the caller accepts, compressed when worthwhile"""
+    offered = [JSON, MSGPACK] if msgpack else [JSON]
+    content_type = request.accept_mimetypes.best_match(offered, default=JSON)
+    body, encoding = compress(encode(obj, content_type), request.headers.get("Accept-Encoding", ""))
+    response = Response(body, status=status, content_type=content_type)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.update(("Accept", "Accept-Encoding"))
+    return response
+
+
+if orjson:
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """jsonify() through orjson, falling back to Flask's encoder for anything orjson rejects"""
+
+        def dumps(self, obj, **kwargs):
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+            except TypeError:
+                return super().dumps(obj, **kwargs)
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+
+def init_app(app):
+    """Use the fast JSON encoder for every jsonify() in this app and unpack gzip bodies"""
+    if orjson:
+        app.json = OrjsonProvider(app)
+    # Runs outside the routes' catch-all handlers, so a refused body keeps its status
+    app.before_request(inflate_request)
+
+
+# --- client side ---
+
+class WireClient:
+    """Encodes request bodies and decodes responses for one downstream agent"""
+
+    def __init__(self, content_type=None):
+        self.content_type = content_type or preferred_type()
+        accept = self.content_type if self.content_type == JSON else f"{self.content_type}, {JSON};q=0.5"
+        self.headers = {"Accept": accept, "Accept-Encoding": "gzip", "Prefer": "return=minimal"}
+
+    def body(self, payload):
+        """(data, headers) for a request carrying `payload`"""
+        data, encoding = compress(encode(payload, self.content_type), "gzip")
+        headers = {"Content-Type": self.content_type}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return data, headers
+
+    def parse(self, response):
+        """Decoded body of a requests.Response (requests already undoes gzip)"""
+        return decode(response.content, response.headers.get("Content-Type", JSON))
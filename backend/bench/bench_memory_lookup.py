@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+📊 Memory lookup scaling benchmark
+Grows the interactions table step by step and measures get_user_memory
+latency at each size; with the (user_id, ts) index it should stay flat.
+
+Usage: python bench_memory_lookup.py [--sizes 10000,100000,1000000,10000000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+
+def grow(agent, current, target, users):
+    """Bulk-insert synthetic interactions until the table holds `target` rows"""
+    base_ts = 1_700_000_000_000_000
+    with agent.pool.transaction() as conn:
+        batch = []
+        for i in range(current, target):
+            batch.append((f"user{i % users}", f"question {i}", f"answer {i}", None, base_ts + i * 1000))
+            if len(batch) >= 50_000:
+                conn.executemany(
+                    "INSERT INTO interactions (user_id, question, answer, timestamp, ts) VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+                batch = []
+        if batch:
+            conn.executemany(
+                "INSERT INTO interactions (user_id, question, answer, timestamp, ts) VALUES (?, ?, ?, ?, ?)",
+                batch,
+            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (user_id, total_interactions) VALUES (?, 0)",
+            [(f"user{u}",) for u in range(users)],
+        )
+
+
+def measure(agent, users, samples):
+    """Mean and p99 latency of get_user_memory over random users"""
+    latencies = []
+    for _ in range(samples):
+        user_id = f"user{random.randrange(users)}"
+        start = time.perf_counter()
+        agent.get_user_memory(user_id, 10)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return sum(latencies) / len(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import logging
+        logging.disable(logging.INFO)
+        import memory_agent
+
+        agent = memory_agent.MemoryAgent(os.path.join(tmp, "memory.db"), write_behind=False,
+                                          memory_cache=False)
+        current = 0
+        print(f"{'interactions':>14} {'mean ms':>10} {'p99 ms':>10}")
+        for size in sizes:
+            grow(agent, current, size, args.users)
+            current = size
+            mean, p99 = measure(agent, args.users, args.samples)
+            print(f"{size:>14,} {mean:>10.3f} {p99:>10.3f}")
+        agent.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+📊 Memory Agent connection benchmark
+Compares the old connect-per-call path with the pooled WAL connections
+by driving /save_interaction and /get_memory with a new thread per request,
+the way the threaded dev server runs them, and reports how many pooled
+connections are left open afterwards.
+
+Usage: python bench_memory_pool.py [--workers 8] [--requests 2000]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+
+class PerCallConnections:
+    """The original behaviour: open and close a connection for every call"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close_all(self):
+        pass
+
+
+def run(app, label, workers, total):
+    """Hammer the memory agent routes with a 1:4 write/read mix, one short-lived thread per request"""
+    client = app.test_client()
+    slots = threading.Semaphore(workers)
+    latencies = []
+
+    def one(i):
+        try:
+            user_id = f"user{i % 50}"
+            start = time.perf_counter()
+            if i % 5 == 0:
+                res = client.post("/save_interaction", json={
+                    "user_id": user_id,
+                    "question": f"question {i}",
+                    "answer": f"answer {i}",
+                })
+            else:
+                res = client.get(f"/get_memory/{user_id}")
+            assert res.status_code == 200, res.status_code
+            latencies.append(time.perf_counter() - start)
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    threads = []
+    for i in range(total):
+        slots.acquire()
+        thread = threading.Thread(target=one, args=(i,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    open_connections = len(getattr(app.extensions["agent"].pool, "_connections", []))
+    print(f"{label:<12} {total / elapsed:>10.0f} req/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms   "
+          f"open connections {open_connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import logging
+        logging.disable(logging.INFO)
+        # Measure the connection layer itself, not the RAM cache or write queue
+        os.environ.setdefault("MEMORY_CACHE", "0")
+        os.environ.setdefault("MEMORY_WRITE_BEHIND", "0")
+        import memory_agent
+
+        app = memory_agent.create_app(os.path.join(tmp, "memory.db"))
+        agent = app.extensions["agent"]
+        pooled = agent.pool
+
+        agent.pool = PerCallConnections(agent.db_path)
+        run(app, "per-call", args.workers, args.requests)
+
+        agent.pool = pooled
+        run(app, "pooled", args.workers, args.requests)
+        agent.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+📊 Semantic recall benchmark
+Fills a MemoryAgent with synthetic interactions on many topics, indexes
+their vectors, then times /recall-style lookups for typical users and for
+one user with a very long history. Also reports how often the top hit is on
+the query's topic, and (with NumPy) how many of the exact top-k the bit
+sketch pre-filter keeps for the long history.
+
+Usage: python bench_recall.py [--interactions 100000] [--users 1000] [--heavy-user 100000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+TOPICS = [
+    ("recursion", "recursive", "base case", "call stack", "factorial"),
+    ("sqlite", "database", "index", "transaction", "query planner"),
+    ("gradient", "descent", "learning rate", "loss function", "optimizer"),
+    ("linked list", "pointer", "node", "reverse", "traversal"),
+    ("http", "request", "status code", "header", "redirect"),
+    ("photosynthesis", "chlorophyll", "sunlight", "glucose", "leaves"),
+    ("derivative", "calculus", "slope", "limit", "tangent"),
+    ("docker", "container", "image", "volume", "compose"),
+    ("sorting", "quicksort", "pivot", "merge sort", "complexity"),
+    ("regex", "pattern", "capture group", "lookahead", "match"),
+    ("thread", "lock", "race condition", "mutex", "deadlock"),
+    ("hash table", "collision", "bucket", "load factor", "rehash"),
+]
+FILLER = "please explain again with a simple example for a beginner student in detail".split()
+
+
+def sentence(rng, topic, words=6):
+    terms = rng.sample(TOPICS[topic], 3) + rng.sample(FILLER, words - 3)
+    rng.shuffle(terms)
+    return " ".join(terms).capitalize() + "?"
+
+
+def fill(agent, rng, interactions, users, heavy_user):
+    """Write interactions in batches; returns the topic of each (user_id, question)"""
+    batch = []
+    for n in range(interactions + heavy_user):
+        user_id = "heavy" if n >= interactions else f"user{rng.randrange(users)}"
+        topic = rng.randrange(len(TOPICS))
+        question = sentence(rng, topic)
+        batch.append((user_id, question, sentence(rng, topic, 12) + " " + sentence(rng, topic, 12), None))
+        if len(batch) == 5000:
+            agent.save_interactions(batch)
+            batch = []
+    if batch:
+        agent.save_interactions(batch)
+
+
+def timed_recalls(agent, rng, user_ids, rounds, limit):
+    """(latencies in ms, share of queries whose top hit is on the query's topic)"""
+    latencies, on_topic = [], 0
+    for _ in range(rounds):
+        topic = rng.randrange(len(TOPICS))
+        user_id = rng.choice(user_ids)
+        started = time.perf_counter()
+        results = agent.recall(user_id, sentence(rng, topic, 4), limit)
+        latencies.append((time.perf_counter() - started) * 1e3)
+        if results and any(term in results[0]["question"].lower() for term in TOPICS[topic]):
+            on_topic += 1
+    return latencies, on_topic / rounds
+
+
+def report(name, latencies, on_topic):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<28} p50 {statistics.median(latencies):6.2f} ms   p99 {p99:6.2f} ms   on-topic {on_topic:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--interactions", type=int, default=100_000, help="spread over --users")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--heavy-user", type=int, default=100_000, help="extra interactions for one user")
+    parser.add_argument("--rounds", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+    import vectors
+    from memory_agent import MemoryAgent
+
+    rng = random.Random(7)
+    print(f"numpy: {'yes' if vectors.np is not None else 'no (pure Python scan)'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = MemoryAgent(os.path.join(tmp, "memory.db"), write_behind=False, memory_cache=False,
+                            maintenance_interval=0)
+        agent.vectors.close()
+        agent.vectors = vectors.VectorIndex(agent.db_path, agent.pool, background=False)
+        try:
+            fill(agent, rng, args.interactions, args.users, args.heavy_user)
+            started = time.perf_counter()
+            indexed = agent.vectors.sync()
+            elapsed = time.perf_counter() - started
+            size = sum(os.path.getsize(path) for path in agent.vectors.paths.values())
+            print(f"indexed {indexed} interactions in {elapsed:.1f} s ({indexed / elapsed:,.0f}/s), "
+                  f"{size / 1e6:.1f} MB of vector files")
+
+            users = [f"user{n}" for n in range(args.users)]
+            report(f"typical user (~{args.interactions // args.users} rows)",
+                   *timed_recalls(agent, rng, users, args.rounds, args.limit))
+            if args.heavy_user:
+                report(f"heavy user ({args.heavy_user} rows)",
+                       *timed_recalls(agent, rng, ["heavy"], args.rounds // 3, args.limit))
+
+            if args.heavy_user > vectors.VECTOR_EXACT_ROWS and vectors.np is not None:
+                kept, exact_rows = 0, vectors.VECTOR_EXACT_ROWS
+                for _ in range(50):
+                    query = sentence(rng, rng.randrange(len(TOPICS)), 4)
+                    approximate = agent.vectors.search("heavy", query, args.limit)
+                    vectors.VECTOR_EXACT_ROWS = 10 ** 9
+                    exact = agent.vectors.search("heavy", query, args.limit)
+                    vectors.VECTOR_EXACT_ROWS = exact_rows
+                    # Many rows tie on score, so compare scores rather than ids
+                    kept += sum(1 for _, score in approximate if score >= exact[-1][1] - 1e-6)
+                print(f"sketch pre-filter keeps {kept / (50 * args.limit):.0%} of the exact top-{args.limit}")
+        finally:
+            agent.close()
+
+
+if __name__ == '__main__':
+    main()
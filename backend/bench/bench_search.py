@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+📊 Search benchmark
+Fills memory.db with synthetic interactions and compares the FTS5 index
+behind /search with the original LIKE '%q%' scan.
+
+Usage: python bench_search.py [--rows 1000000] [--samples 50]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+WORDS = (
+    "memory garden family doctor birthday music walk coffee medicine friend "
+    "photo weather morning evening sister brother daughter son park river "
+    "appointment lunch dinner book movie holiday kitchen school church market"
+).split()
+
+
+def sentence(rng, length):
+    return " ".join(rng.choice(WORDS) + str(rng.randrange(2000)) for _ in range(length))
+
+
+def timed(fn, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return sum(latencies) / len(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import logging
+        logging.disable(logging.INFO)
+        import memory_agent
+
+        agent = memory_agent.MemoryAgent(os.path.join(tmp, "search.db"), write_behind=False)
+        start = time.perf_counter()
+        for offset in range(0, args.rows, 20_000):
+            agent.save_interactions([
+                (f"user{i % 1000}", sentence(rng, 8), sentence(rng, 30), None)
+                for i in range(offset, min(offset + 20_000, args.rows))
+            ])
+        print(f"loaded {args.rows:,} interactions in {time.perf_counter() - start:.1f}s")
+
+        queries = [rng.choice(WORDS) + str(rng.randrange(2000)) for _ in range(args.samples)]
+        scan = timed(lambda q: agent._scan_interactions(q, 20), queries)
+        fts = timed(lambda q: agent.search_interactions(q, 20), queries)
+        per_user = timed(lambda q: agent.search_interactions(q, 20, user_id="user7"), queries)
+
+        print(f"{'path':<16} {'mean ms':>10} {'p99 ms':>10}")
+        print(f"{'LIKE scan':<16} {scan[0]:>10.2f} {scan[1]:>10.2f}")
+        print(f"{'FTS5 bm25':<16} {fts[0]:>10.2f} {fts[1]:>10.2f}")
+        print(f"{'FTS5 per-user':<16} {per_user[0]:>10.2f} {per_user[1]:>10.2f}")
+
+        agent.close()
+
+
+if __name__ == '__main__':
+    main()
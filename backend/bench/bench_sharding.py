@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+📊 Memory sharding benchmark
+Runs concurrent synchronous save_interaction calls for many users against
+one SQLite file and against N shard files, and reports write throughput and
+how evenly the hash ring spread the users.
+
+Usage: python bench_sharding.py [--writes 8000] [--writers 8] [--shards 1,2,4,8]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+
+def drive(agent, writes, writers, users):
+    def one(i):
+        agent.save_interaction(f"user{i % users}", f"question {i} about sharding", "an answer " * 20)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as executor:
+        list(executor.map(one, range(writes)))
+    return writes / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writes", type=int, default=8000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--shards", default="1,2,4,8")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+    import sharding
+
+    options = {"write_behind": False, "memory_cache": False, "maintenance_interval": 0}
+    print(f"{'shards':>6} {'writes/s':>10} {'users per shard (min-max)':>26}")
+    for count in (int(n) for n in args.shards.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = sharding.create_memory_agent(os.path.join(tmp, "memory.db"), count, **options)
+            rate = drive(agent, args.writes, args.writers, args.users)
+            if count > 1:
+                spread = [sum(agent.ring.lookup(f"user{u}") == name for u in range(args.users))
+                          for name in agent.names]
+                balance = f"{min(spread)}-{max(spread)}"
+            else:
+                balance = str(args.users)
+            agent.close()
+        print(f"{count:>6} {rate:>10.0f} {balance:>26}")
+
+
+if __name__ == '__main__':
+    main()
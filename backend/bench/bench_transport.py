@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+📊 Agent transport benchmark
+Runs MasterAgent.process_user_request end to end over the "http" transport
+(memory and answer agents served on loopback) and the "inprocess" transport,
+and reports the per-request overhead the in-process bus removes. The answer
+agent runs without an API key so the LLM itself is out of the picture.
+
+Usage: python bench_transport.py [--requests 1000] [--workers 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+
+def serve(app):
+    """Serve a Flask app on an ephemeral loopback port; returns (server, url)"""
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def drive(master, total, workers):
+    def one(i):
+        start = time.perf_counter()
+        result = master.process_user_request(f"question number {i}", f"user{i % 20}")
+        assert result["status"] == "success", result
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = sorted(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return total / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.pop("GROQ_API_KEY", None)
+        os.environ["MEMORY_DB_PATH"] = os.path.join(tmp, "memory.db")
+        import logging
+        logging.disable(logging.WARNING)
+        import memory_agent
+        import answer_agent
+        import master_agent
+
+        results = {}
+
+        memory_server, memory_url = serve(memory_agent.create_app(os.path.join(tmp, "http.db")))
+        answer_server, answer_url = serve(answer_agent.create_app())
+        master_agent.MEMORY_AGENT_URL, master_agent.ANSWER_AGENT_URL = memory_url, answer_url
+        master = master_agent.MasterAgent(transport="http")
+        results["http"] = drive(master, args.requests, args.workers)
+        master.close()
+        memory_server.shutdown()
+        answer_server.shutdown()
+
+        master = master_agent.MasterAgent(transport="inprocess")
+        results["inprocess"] = drive(master, args.requests, args.workers)
+        master.close()
+
+        print(f"{'transport':<10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        for name, (rps, p50, p99) in results.items():
+            print(f"{name:<10} {rps:>10.0f} {p50:>10.3f} {p99:>10.3f}")
+        saved = results["http"][1] - results["inprocess"][1]
+        print(f"per-request overhead removed (p50): {saved:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+📊 Inter-agent wire format benchmark
+Encodes and decodes the bodies of one /process request's three hops
+(get_memory, answer, save_interaction) with the old stdlib-JSON full
+envelopes and with each negotiated format, and reports serialization CPU
+and bytes on the wire per request.
+
+Usage: python bench_wire.py [--interactions 10] [--answer-chars 1200] [--compress-min 4096]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+
+def sample_hops(interactions, answer_chars):
+    """(full, lean) lists of bodies crossing the wire for one request, from a real MemoryAgent"""
+    from memory_agent import MemoryAgent
+    from master_agent import MEMORY_CONTEXT_FIELDS
+
+    answer = ("Recursion is when a function calls itself on a smaller input. " * 40)[:answer_chars]
+    question = "Can you explain recursion with a Python example?"
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = MemoryAgent(os.path.join(tmp, "memory.db"), write_behind=False, maintenance_interval=0)
+        for i in range(interactions):
+            agent.save_interaction("junaid", f"Question {i}: {question}", answer)
+        memory = agent.get_user_memory("junaid", 10, set(MEMORY_CONTEXT_FIELDS), question, 5)
+        agent.close()
+
+    timestamp = datetime.now().isoformat()
+    answer_request = {"question": question, "user_id": "junaid", "memory_context": memory}
+    save_request = {"user_id": "junaid", "question": question, "answer": answer, "timestamp": timestamp}
+    full = [
+        memory,
+        answer_request,
+        {"question": question, "answer": answer, "user_id": "junaid", "timestamp": timestamp, "status": "success"},
+        save_request,
+        {"status": "success", "message": "Interaction saved"},
+    ]
+    # Prefer: return=minimal drops the echoed answer fields and the save body (204)
+    lean = [memory, answer_request, {"answer": answer}, save_request]
+    return full, lean
+
+
+def measure(bodies, encode, decode, rounds):
+    """(microseconds, bytes) to encode and decode every body once"""
+    wire_bytes = sum(len(encode(body)) for body in bodies)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for body in bodies:
+            decode(encode(body))
+    return (time.perf_counter() - started) / rounds * 1e6, wire_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--interactions", type=int, default=10)
+    parser.add_argument("--answer-chars", type=int, default=1200)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--compress-min", type=int, default=4096, help="AGENT_WIRE_COMPRESS_MIN to try")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+    import gzip
+    import wire
+    wire.WIRE_COMPRESS_MIN = args.compress_min
+
+    full, lean = sample_hops(args.interactions, args.answer_chars)
+
+    def codec(content_type, compressed=False):
+        def encode(body):
+            data = wire.encode(body, content_type)
+            return wire.compress(data, "gzip")[0] if compressed else data
+
+        def decode(data):
+            return wire.decode(gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data, content_type)
+        return encode, decode
+
+    json_name = "orjson" if wire.orjson else "json (compact)"
+    gzip_name = f"gzip >= {args.compress_min} B"
+    codecs = [
+        ("json, full envelope (before)", full, lambda body: json.dumps(body).encode("utf-8"), json.loads),
+        (f"{json_name}, lean", lean, *codec(wire.JSON)),
+        (f"{json_name} + {gzip_name}, lean", lean, *codec(wire.JSON, True)),
+    ]
+    if wire.msgpack:
+        codecs.append(("msgpack, lean", lean, *codec(wire.MSGPACK)))
+        codecs.append((f"msgpack + {gzip_name}, lean", lean, *codec(wire.MSGPACK, True)))
+    else:
+        print("(msgpack is not installed; pip install msgpack to compare it)")
+
+    print(f"{'format':<36} {'cpu us/req':>11} {'bytes/req':>10}")
+    for name, bodies, encode, decode in codecs:
+        micros, size = measure(bodies, encode, decode, args.rounds)
+        print(f"{name:<36} {micros:>11.1f} {size:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+📊 Memory write path benchmark
+Measures the per-write cost of save_interaction with the original
+INSERT OR REPLACE user update against the ON CONFLICT upsert, checks
+that total_interactions stays exact under concurrent writers, and shows
+group-commit throughput of save_interactions as the batch size grows.
+
+Usage: python bench_write_path.py [--writes 5000] [--writers 8]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+LEGACY_USER_SQL = '''
+    INSERT OR REPLACE INTO users (user_id, first_seen, last_seen, total_interactions)
+    VALUES (?,
+            COALESCE((SELECT first_seen FROM users WHERE user_id = ?), ?),
+            ?,
+            COALESCE((SELECT total_interactions FROM users WHERE user_id = ?), 0) + 1)
+'''
+
+
+def legacy_save(memory_agent, agent, user_id, question, answer):
+    """The original two-statement write with the delete/reinsert user update"""
+    timestamp = memory_agent.datetime.now().isoformat()
+    with agent.pool.transaction() as conn:
+        conn.execute(LEGACY_USER_SQL, (user_id, user_id, timestamp, timestamp, user_id))
+        conn.execute(memory_agent.INSERT_INTERACTION_SQL,
+                     (user_id, question, answer, timestamp, memory_agent.to_ts(timestamp)))
+
+
+def per_write_cost(label, save, writes):
+    start = time.perf_counter()
+    for i in range(writes):
+        save(f"user{i % 100}", f"question {i}", f"answer {i}")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed / writes * 1e6:8.1f} µs/write   {writes / elapsed:8.0f} writes/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--writers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import logging
+        logging.disable(logging.INFO)
+        import memory_agent
+
+        legacy = memory_agent.MemoryAgent(os.path.join(tmp, "legacy.db"))
+        per_write_cost("legacy", lambda *a: legacy_save(memory_agent, legacy, *a), args.writes)
+        legacy_ids = legacy.pool.get().execute("SELECT MAX(id) FROM users").fetchone()[0]
+
+        upsert = memory_agent.MemoryAgent(os.path.join(tmp, "upsert.db"))
+        per_write_cost("upsert", upsert.save_interaction, args.writes)
+        upsert_ids = upsert.pool.get().execute("SELECT MAX(id) FROM users").fetchone()[0]
+        print(f"users.id high-water mark for 100 users: legacy {legacy_ids}, upsert {upsert_ids}")
+
+        # Concurrent writers against a single hot user
+        hot = memory_agent.MemoryAgent(os.path.join(tmp, "hot.db"))
+        with ThreadPoolExecutor(max_workers=args.writers) as executor:
+            list(executor.map(lambda i: hot.save_interaction("hot", f"q{i}", f"a{i}"), range(args.writes)))
+        total = hot.get_user_memory("hot", 1)["total_interactions"]
+        status = "ok" if total == args.writes else "MISMATCH"
+        print(f"concurrent total_interactions: {total} / {args.writes} ({status})")
+
+        # Group commits: throughput should follow batch size, not fsync count
+        batched = memory_agent.MemoryAgent(os.path.join(tmp, "batched.db"), write_behind=False)
+        for batch_size in (1, 16, 256):
+            rows = [(f"user{i % 100}", f"question {i}", f"answer {i}", None) for i in range(args.writes)]
+            start = time.perf_counter()
+            for offset in range(0, len(rows), batch_size):
+                batched.save_interactions(rows[offset:offset + batch_size])
+            elapsed = time.perf_counter() - start
+            print(f"batch {batch_size:<4} {args.writes / elapsed:8.0f} writes/s")
+
+        for agent in (legacy, upsert, hot, batched):
+            agent.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+🏋️ End-to-end load test for the HoloMentor agents
+Starts the memory, answer and master agents against a temporary memory.db and
+the mock LLM (mock_llm.py), seeds some history, then drives closed-loop
+concurrent workloads and reports requests/s, latency percentiles and a latency
+histogram for each:
+
+  memory-read   90% GET /get_memory, 10% POST /save_interaction
+  write-burst   POST /save_interaction only
+  search        GET /search over the seeded history
+  process       POST /process through the master agent (memory -> LLM -> save)
+
+--mode http serves every agent on loopback; --mode inprocess calls the Flask
+apps directly and wires the master with the in-process transport; passing
+--memory-url / --master-url targets agents that are already running.
+
+Results can be saved as a baseline and compared against later runs:
+    python loadtest.py --save baselines/local.json
+    python loadtest.py --compare baselines/local.json --fail-on-regression 20
+
+Usage: python loadtest.py [--workload memory-read,process] [--requests 2000]
+                          [--concurrency 8] [--mode http|inprocess]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from itertools import count
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "agents"))
+
+WORKLOADS = ("memory-read", "write-burst", "search", "process")
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+TOPICS = ("python decorators", "sqlite indexes", "flask blueprints", "groq latency",
+          "memory recall", "streaming answers", "unit testing", "vector search")
+
+
+def serve(app):
+    """Serve a Flask app on an ephemeral loopback port; returns (server, url)"""
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class HttpClient:
+    def __init__(self, base_url, pool_size):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.base_url = base_url
+        self.http = requests.Session()
+        self.http.mount("http://", HTTPAdapter(pool_maxsize=pool_size))
+
+    def request(self, method, path, **kwargs):
+        res = self.http.request(method, self.base_url + path, timeout=60, **kwargs)
+        res.content
+        return res.status_code
+
+
+class WsgiClient:
+    """Calls a Flask app without sockets; one test client per thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, **kwargs):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        if "params" in kwargs:
+            kwargs["query_string"] = kwargs.pop("params")
+        res = client.open(path, method=method, **kwargs)
+        res.get_data()
+        return res.status_code
+
+
+class LatencyStats:
+    def __init__(self, latencies, errors, elapsed):
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.elapsed = elapsed
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        return self.latencies[min(len(self.latencies) - 1, int(len(self.latencies) * p))] * 1000
+
+    def histogram(self):
+        counts = [0] * len(BUCKETS_MS)
+        bucket = 0
+        for latency in self.latencies:
+            while latency * 1000 > BUCKETS_MS[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+        return counts
+
+    def summary(self):
+        total = len(self.latencies)
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "rps": round(total / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p90_ms": round(self.percentile(0.90), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.latencies[-1] * 1000, 3) if total else 0.0,
+            "histogram": self.histogram(),
+        }
+
+
+def run_workload(step, total, concurrency, duration=None, seed=0):
+    """Call step(i, rng) from `concurrency` threads until `total` calls or `duration` seconds"""
+    counter = count()
+    deadline = time.perf_counter() + duration if duration else None
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        mine, failed = [], 0
+        while True:
+            i = next(counter)
+            if (deadline is None and i >= total) or (deadline and time.perf_counter() >= deadline):
+                break
+            start = time.perf_counter()
+            try:
+                status = step(i, rng)
+            except Exception:
+                status = 599
+            mine.append(time.perf_counter() - start)
+            if status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return LatencyStats(latencies, errors[0], time.perf_counter() - started)
+
+
+def make_steps(memory, master, users):
+    def pick_user(rng):
+        return f"load_user{rng.randrange(users)}"
+
+    def save(i, rng):
+        topic = rng.choice(TOPICS)
+        return memory.request("POST", "/save_interaction", json={
+            "user_id": pick_user(rng),
+            "question": f"Question {i} about {topic}?",
+            "answer": f"Answer {i}: some notes on {topic}."
+        })
+
+    def memory_read(i, rng):
+        if rng.random() < 0.1:
+            return save(i, rng)
+        return memory.request("GET", f"/get_memory/{pick_user(rng)}", params={"limit": 10})
+
+    def search(i, rng):
+        word = rng.choice(TOPICS).split()[rng.randrange(2)]
+        return memory.request("GET", "/search", params={"q": word, "limit": 20})
+
+    def process(i, rng):
+        return master.request("POST", "/process", json={
+            "message": f"Tell me more about {rng.choice(TOPICS)} ({i})",
+            "user_id": pick_user(rng)
+        })
+
+    return {"memory-read": memory_read, "write-burst": save, "search": search, "process": process}
+
+
+def seed_history(memory, users, per_user):
+    """Bulk-load per_user interactions for each of `users` users"""
+    rng = random.Random(42)
+    for u in range(users):
+        batch = [{
+            "user_id": f"load_user{u}",
+            "question": f"Seed question {n} about {rng.choice(TOPICS)}?",
+            "answer": f"Seed answer {n} about {rng.choice(TOPICS)}."
+        } for n in range(per_user)]
+        status = memory.request("POST", "/save_interactions", json={"interactions": batch})
+        if status >= 400:
+            raise RuntimeError(f"seeding failed with HTTP {status}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_report(results):
+    print(f"{'workload':<12} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['rps']:>9.1f} {r['p50_ms']:>9.2f} {r['p90_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['max_ms']:>9.2f} {r['errors']:>7}")
+
+    for name, r in results.items():
+        print(f"\n{name} latency histogram")
+        peak = max(r["histogram"]) or 1
+        for bound, n in zip(BUCKETS_MS, r["histogram"]):
+            if n:
+                label = f"<= {bound:g} ms" if bound != float("inf") else "> 5000 ms"
+                print(f"  {label:>12} {n:>7} {'#' * max(1, round(40 * n / peak))}")
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas against a saved baseline; returns the workloads that regressed"""
+    regressed = []
+    print(f"\nvs baseline {baseline['meta'].get('revision') or '?'} ({baseline['meta'].get('created')})")
+    print(f"{'workload':<12} {'req/s':>16} {'p99 ms':>20}")
+    for name, r in results.items():
+        old = baseline["results"].get(name)
+        if not old:
+            print(f"{name:<12} {'(no baseline)':>16}")
+            continue
+        rps_delta = (r["rps"] - old["rps"]) / old["rps"] * 100 if old["rps"] else 0.0
+        p99_delta = (r["p99_ms"] - old["p99_ms"]) / old["p99_ms"] * 100 if old["p99_ms"] else 0.0
+        print(f"{name:<12} {r['rps']:>8.1f} {rps_delta:>+6.1f}% {r['p99_ms']:>10.2f} {p99_delta:>+7.1f}%")
+        if tolerance is not None and (rps_delta < -tolerance or p99_delta > tolerance):
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workload", default=",".join(WORKLOADS),
+                        help=f"comma-separated subset of {', '.join(WORKLOADS)}")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per workload")
+    parser.add_argument("--duration", type=float, default=None, help="seconds per workload (overrides --requests)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=("http", "inprocess"), default="http")
+    parser.add_argument("--memory-url", help="use a running memory agent instead of starting one")
+    parser.add_argument("--master-url", help="use a running master agent instead of starting one")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed-interactions", type=int, default=20, help="seeded history per user")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mock LLM time to first token")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--answer-cache", action="store_true", help="leave the answer cache on")
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="diff against a saved JSON baseline")
+    parser.add_argument("--fail-on-regression", type=float, default=None, metavar="PCT",
+                        help="exit 1 if req/s drops or p99 grows by more than PCT percent")
+    args = parser.parse_args()
+
+    workloads = [w.strip() for w in args.workload.split(",") if w.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workload(s): {', '.join(sorted(unknown))}")
+
+    tmp = tempfile.TemporaryDirectory()
+    servers, apps = [], []
+    import logging
+    logging.disable(logging.WARNING)
+
+    memory = HttpClient(args.memory_url, args.concurrency) if args.memory_url else None
+    master = HttpClient(args.master_url, args.concurrency) if args.master_url else None
+
+    if memory is None or (master is None and "process" in workloads):
+        import mock_llm
+        llm_server, llm_url = serve(mock_llm.create_app(args.llm_latency, args.llm_tokens_per_sec, seed=1))
+        servers.append(llm_server)
+
+        # Agent settings are read at import time, so they go in before the imports
+        os.environ["MEMORY_DB_PATH"] = os.path.join(tmp.name, "memory.db")
+        os.environ["LLM_API_URL"] = f"{llm_url}/v1/chat/completions"
+        os.environ.setdefault("GROQ_RATE_PER_MINUTE", "1000000000")
+        os.environ.setdefault("GROQ_BURST", "1000000")
+        os.environ.setdefault("GROQ_MAX_CONCURRENCY", str(max(args.concurrency, 8)))
+        if not args.answer_cache:
+            os.environ["ANSWER_CACHE"] = "0"
+        os.environ["AGENT_TRANSPORT"] = args.mode
+        import memory_agent
+        import answer_agent
+        import master_agent
+
+        memory_app = memory_agent.create_app()
+        apps.append(memory_app)
+        if args.mode == "http":
+            memory_server, memory_url = serve(memory_app)
+            answer_server, answer_url = serve(answer_agent.create_app())
+            servers += [memory_server, answer_server]
+            master_agent.MEMORY_AGENT_URL = args.memory_url or memory_url
+            master_agent.ANSWER_AGENT_URL = answer_url
+            memory = memory or HttpClient(memory_url, args.concurrency)
+        else:
+            memory = memory or WsgiClient(memory_app)
+
+        if master is None:
+            master_app = master_agent.create_app()
+            apps.append(master_app)
+            if args.mode == "http":
+                master_server, master_url = serve(master_app)
+                servers.append(master_server)
+                master = HttpClient(master_url, args.concurrency)
+            else:
+                master = WsgiClient(master_app)
+
+    print(f"🌱 Seeding {args.users} users x {args.seed_interactions} interactions...")
+    seed_history(memory, args.users, args.seed_interactions)
+
+    steps = make_steps(memory, master, args.users)
+    results = {}
+    for name in workloads:
+        print(f"🏋️ {name}: {args.duration and f'{args.duration:g}s' or args.requests} "
+              f"at concurrency {args.concurrency}")
+        results[name] = run_workload(steps[name], args.requests, args.concurrency, args.duration).summary()
+
+    print()
+    print_report(results)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "mode": "external" if args.memory_url else args.mode,
+            "requests": args.requests,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "seed_interactions": args.seed_interactions,
+            "llm_latency": args.llm_latency,
+            "llm_tokens_per_sec": args.llm_tokens_per_sec,
+            "buckets_ms": [b if b != float("inf") else None for b in BUCKETS_MS],
+        },
+        "results": results,
+    }
+
+    regressed = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.fail_on_regression)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    for server in servers:
+        server.shutdown()
+    for app in apps:
+        app.extensions["agent"].close()
+    tmp.cleanup()
+
+    if regressed:
+        print(f"❌ Regression beyond {args.fail_on_regression:g}% in: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
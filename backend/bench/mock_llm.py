@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+🤖 Mock LLM server - an OpenAI-compatible stand-in for offline benchmarks
+Serves POST /v1/chat/completions (plain and streaming) with configurable
+time-to-first-token, token rate, answer length, injected 429/500 errors and
+streams cut off halfway without their [DONE] marker.
+Answers are deterministic for a given prompt, so runs are reproducible.
+
+Point the Answer Agent at it with
+    LLM_API_URL=http://127.0.0.1:5099/v1/chat/completions
+
+Usage: python mock_llm.py [--port 5099] [--latency 0.2] [--tokens-per-sec 200]
+                          [--tokens 60] [--error-rate 0] [--rate-limit-rate 0]
+                          [--cut-rate 0]
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+from flask import Flask, Response, request, jsonify
+
+WORDS = ("memory context answer user question agent latency token stream cache "
+         "request model response history summary recall search index").split()
+
+
+def mock_answer(prompt, tokens):
+    """Deterministic pseudo-answer of `tokens` words seeded by the prompt"""
+    seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "big")
+    rng = random.Random(seed)
+    return ["Hello!"] + [" " + rng.choice(WORDS) for _ in range(tokens - 1)]
+
+
+def create_app(latency=0.2, tokens_per_sec=200.0, tokens=60, error_rate=0.0,
+               rate_limit_rate=0.0, retry_after=1, seed=None, cut_rate=0.0):
+    """Build the mock server; latency is time to first token in seconds"""
+    app = Flask("mock_llm")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0, "cut": 0}
+    app.extensions["mock_llm_stats"] = stats
+
+    def injected_error():
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return jsonify({"error": {"message": "Rate limit reached"}}), 429, {"Retry-After": str(retry_after)}
+        if roll < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            return jsonify({"error": {"message": "Internal server error"}}), 500
+        return None
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        stats["requests"] += 1
+        error = injected_error()
+        if error:
+            return error
+
+        body = request.get_json(silent=True) or {}
+        prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+        pieces = mock_answer(prompt, min(tokens, body.get("max_tokens") or tokens))
+        model = body.get("model", "mock")
+        interval = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0
+
+        if body.get("stream"):
+            # A cut stream stops halfway, as if the connection dropped
+            cut = rng.random() < cut_rate
+            if cut:
+                stats["cut"] += 1
+
+            def generate():
+                time.sleep(latency)
+                for piece in pieces[:len(pieces) // 2] if cut else pieces:
+                    chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    time.sleep(interval)
+                if not cut:
+                    yield "data: [DONE]\n\n"
+            return Response(generate(), mimetype="text/event-stream")
+
+        time.sleep(latency + interval * len(pieces))
+        return jsonify({
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                         "finish_reason": "stop"}],
+            "usage": {"completion_tokens": len(pieces)}
+        })
+
+    @app.route("/health", methods=["GET"])
+    def health():
+        return jsonify(dict(stats, status="healthy", agent="mock_llm"))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--tokens", type=int, default=60, help="answer length in tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--cut-rate", type=float, default=0.0, help="fraction of streams cut off halfway")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.tokens_per_sec, args.tokens, args.error_rate,
+                     args.rate_limit_rate, seed=args.seed, cut_rate=args.cut_rate)
+    print(f"🤖 Mock LLM on http://{args.host}:{args.port}/v1/chat/completions")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+⚙️ Gunicorn settings shared by all three agents
+Run from backend/agents, e.g.:
+    gunicorn -c ../gunicorn.conf.py --bind 0.0.0.0:5001 'memory_agent:create_app()'
+"""
+
+import os
+import multiprocessing
+
+# One process per core (plus one) unless overridden; each worker builds its
+# own agent through create_app(), so nothing is shared across a fork. The run
+# scripts pin every agent to one worker because each keeps per-process state
+# (write-behind queue, admission queue, LLM rate limiter)
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+# Requests waiting for admission in the master hold a thread, so for the master
+# this should cover MASTER_MAX_INFLIGHT + MASTER_MAX_QUEUED; otherwise excess
+# requests queue in gunicorn, where nothing sheds them. run_master.sh sizes
+# this and pins the master to one worker, since its admission queue and job
+# store are per process
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Streaming answers can legitimately run for a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", None)
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def worker_exit(server, worker):
+    """Drain queued writes and close pools before the worker goes away"""
+    app = getattr(worker, "wsgi", None)
+    agent = getattr(app, "extensions", {}).get("agent") if app else None
+    if agent is not None:
+        agent.close()
@@ -1,4 +1,13 @@
 #!/bin/bash
 echo "💬 Starting Answer Agent..."
 cd "$(dirname "$0")/../agents"
-python answer_agent.py
+if [ "$AURA_ENV" = "production" ]; then
+    # The LLM rate limiter, concurrency cap and response cache live in the process,
+    # so one worker keeps GROQ_RATE_PER_MINUTE the real upstream rate; requests
+    # waiting for a token or slot hold a thread, hence more than GROQ_MAX_CONCURRENCY
+    GUNICORN_WORKERS=${ANSWER_WORKERS:-1} \
+    GUNICORN_THREADS=${ANSWER_THREADS:-$(( ${GROQ_MAX_CONCURRENCY:-8} * 4 ))} \
+        exec gunicorn -c ../gunicorn.conf.py --bind 0.0.0.0:5002 'answer_agent:create_app()'
+else
+    python answer_agent.py
+fi
@@ -1,4 +1,12 @@
 #!/bin/bash
 echo "🎓 Starting Master Agent..."
 cd "$(dirname "$0")/../agents"
-python master_agent.py
+if [ "$AURA_ENV" = "production" ]; then
+    # Admission control and async jobs live in the process, so run one; every
+    # admitted or queued request holds a thread, plus a few for polls and health
+    GUNICORN_WORKERS=${MASTER_WORKERS:-1} \
+    GUNICORN_THREADS=${MASTER_THREADS:-$(( ${MASTER_MAX_INFLIGHT:-8} + ${MASTER_MAX_QUEUED:-32} + 8 ))} \
+        exec gunicorn -c ../gunicorn.conf.py --bind 0.0.0.0:5000 'master_agent:create_app()'
+else
+    python master_agent.py
+fi
@@ -1,4 +1,11 @@
 #!/bin/bash
 echo "🧠 Starting Memory Agent..."
 cd "$(dirname "$0")/../agents"
-python memory_agent.py
+if [ "$AURA_ENV" = "production" ]; then
+    # One process keeps the write-behind queue and memory cache coherent;
+    # threads give concurrency and SQLite WAL lets readers run alongside
+    GUNICORN_WORKERS=${MEMORY_WORKERS:-1} exec gunicorn -c ../gunicorn.conf.py \
+        --bind 0.0.0.0:5001 'memory_agent:create_app()'
+else
+    python memory_agent.py
+fi
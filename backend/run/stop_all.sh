@@ -1,8 +1,10 @@
 #!/bin/bash
 echo "🛑 Stopping all HoloMentor agents..."
 
-pkill -f "python.*master_agent.py"
-pkill -f "python.*memory_agent.py"
-pkill -f "python.*answer_agent.py"
+# SIGTERM lets gunicorn finish in-flight requests and drain queued writes
+pkill -TERM -f "python.*master_agent.py"
+pkill -TERM -f "python.*memory_agent.py"
+pkill -TERM -f "python.*answer_agent.py"
+pkill -TERM -f "gunicorn.*(master|memory|answer)_agent:create_app"
 
 echo "✅ All agents stopped!"
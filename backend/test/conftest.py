@@ -0,0 +1,15 @@
+# test/conftest.py
+# Agents read their settings at import time, so configure them before any test imports one
+import os
+import sys
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp(prefix="holomentor-test-")
+
+os.environ["MEMORY_DB_PATH"] = os.path.join(TMP_DIR, "memory.db")
+os.environ["MEMORY_WRITE_BEHIND"] = "0"
+os.environ["MEMORY_MAINTENANCE_INTERVAL"] = "0"
+os.environ["LLM_BACKEND"] = "template"
+os.environ["AGENT_TRANSPORT"] = "inprocess"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
@@ -0,0 +1,109 @@
+# test/test_answer.py
+import os
+import sys
+import json
+import threading
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+from answer_agent import UpstreamScheduler
+from llm import OpenAIBackend, RetryableError
+
+
+class TimingOutSession:
+    def __init__(self):
+        self.calls = 0
+
+    def post(self, *args, **kwargs):
+        self.calls += 1
+        raise requests.ReadTimeout("read timed out")
+
+    def close(self):
+        pass
+
+
+def test_upstream_timeout_is_not_retried():
+    backend = OpenAIBackend("http://llm.invalid/v1/chat/completions", None, "fake", timeout=0.1)
+    backend.http = TimingOutSession()
+    scheduler = UpstreamScheduler(max_retries=3, backoff_base=0)
+    with pytest.raises(requests.Timeout):
+        scheduler.run_with_retries(lambda: backend.complete("Hi"))
+    assert backend.http.calls == 1
+
+
+def test_retries_stop_at_the_budget():
+    calls = []
+
+    def busy():
+        calls.append(1)
+        raise RetryableError("upstream returned 503", retry_after=0.2)
+
+    scheduler = UpstreamScheduler(max_retries=10, backoff_max=0.2, retry_budget=0.5)
+    with pytest.raises(RetryableError):
+        scheduler.run_with_retries(busy)
+    assert len(calls) == 3
+    assert scheduler.stats["failed"] == 1
+
+
+def test_cut_off_stream_ends_with_an_error_event():
+    import answer_agent
+    from llm import OpenAIBackend
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+    import mock_llm
+
+    server = make_server("127.0.0.1", 0, mock_llm.create_app(latency=0, tokens_per_sec=0, cut_rate=1.0),
+                         threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app = answer_agent.create_app()
+    agent = app.extensions["agent"]
+    agent.llm = OpenAIBackend(f"http://127.0.0.1:{server.server_port}/v1/chat/completions", None, "mock")
+    try:
+        with app.test_client().post("/answer?stream=1", json={"question": "What is recursion?",
+                                                              "user_id": "cut"}) as res:
+            body = res.get_data(as_text=True)
+        events = [line for line in body.splitlines() if line.startswith(("event:", "data:"))]
+        assert any('"token"' in line for line in events)
+        assert events[-2] == "event: error"
+        assert json.loads(events[-1][len("data:"):])["status"] == "error"
+        assert agent.cache.snapshot()["entries"] == 0
+    finally:
+        agent.close()
+        server.shutdown()
+
+
+class FakeStreamResponse:
+    def __init__(self, lines):
+        self.status_code = 200
+        self.lines = lines
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeReplicas:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def request(self, *args, **kwargs):
+        return FakeStreamResponse(self.lines)
+
+
+def test_http_transport_raises_when_stream_has_no_done_event():
+    from transport import AgentError, HttpAnswerTransport
+
+    token = 'data: {"token": "Recursion is when"}'
+    done = HttpAnswerTransport(FakeReplicas([token, "", "event: done", 'data: {"status": "success"}']))
+    assert list(done.stream_answer("q", "u", {})) == ["Recursion is when"]
+
+    for lines in ([token], [token, "", "event: error", 'data: {"status": "error", "error": "cut"}']):
+        transport = HttpAnswerTransport(FakeReplicas(lines))
+        with pytest.raises(AgentError):
+            list(transport.stream_answer("q", "u", {}))
@@ -1,11 +1,233 @@
 # test/test_master.py
+import json
+import time
+import pytest
 
-import requests
+import master_agent
 
 payload = {
     "message": "Hello, I'm Junaid. What can you teach me?",
     "user_id": "junaid123"
 }
 
-res = requests.post("http://localhost:5000/process", json=payload)
-print(res.json())
+
+@pytest.fixture(scope="module")
+def client():
+    app = master_agent.create_app()
+    yield app.test_client()
+    app.extensions["agent"].close()
+
+
+def test_process(client):
+    res = client.post("/process", json=payload)
+    assert res.status_code == 200
+    assert res.json["status"] == "success"
+    assert res.json["user_id"] == "junaid123"
+    assert res.json["answer"]
+
+
+def test_process_requires_message(client):
+    assert client.post("/process", json={"user_id": "junaid123"}).status_code == 400
+
+
+def test_process_stream(client):
+    with client.post("/process/stream", json=payload) as res:
+        body = res.get_data(as_text=True)
+    events = [json.loads(line[len("data:"):]) for line in body.splitlines() if line.startswith("data:")]
+    assert "".join(e.get("token", "") for e in events)
+    assert events[-1]["status"] == "success"
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Hello, I'm Junaid. What can you teach me?", "Junaid"),
+    ("my name's sara, teach me calculus", "Sara"),
+    ("Hi! Call me: Bob", "Bob"),
+    ("I'm not sure what recursion is", "anonymous"),
+    ("What is a closure? " * 20 + "I'm Late", "anonymous"),
+    ("I am having trouble with recursion", "anonymous"),
+    ("I am asking about closures", "anonymous"),
+    ("I am unable to run my tests", "anonymous"),
+    ("I am using Python", "anonymous"),
+    ("I'm wondering how sorting works", "anonymous"),
+    ("I'm Wondering how sorting works", "anonymous"),
+    ("hi i'm junaid", "Junaid"),
+    ("im sara and i need help", "Sara"),
+    ("i am having a bad day", "anonymous"),
+    ("My name is Sterling", "Sterling"),
+    ("I am Amina", "Amina"),
+])
+def test_extract_user_id(client, message, expected):
+    assert client.application.extensions["agent"].extract_user_id(message) == expected
+
+
+def test_session_remembers_user(client):
+    headers = {"X-Session-ID": "session-test"}
+    client.post("/process", json={"message": "My name is Amina"}, headers=headers)
+    res = client.post("/process", json={"message": "What did I ask before?"}, headers=headers)
+    assert res.json["user_id"] == "Amina"
+
+
+def test_no_session_id_is_not_remembered(client):
+    client.post("/process", json={"message": "My name is Tariq"})
+    res = client.post("/process", json={"message": "What did I ask before?"})
+    assert res.json["user_id"] == "anonymous"
+
+
+def test_process_async_job(client):
+    res = client.post("/process?async=1", json=payload)
+    assert res.status_code == 202
+    job = client.get(f"{res.headers['Location']}?wait=10").json
+    assert job["status"] == "done"
+    assert job["result"]["answer"]
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_job_store_caps_pending_jobs():
+    import threading
+    jobs = master_agent.JobStore(max_pending=5, max_pending_per_user=100)
+    statuses = []
+
+    def submit():
+        try:
+            jobs.create("u", None, lambda: 1)
+            statuses.append(202)
+        except master_agent.Overloaded as e:
+            statuses.append(e.status)
+
+    threads = [threading.Thread(target=submit) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert statuses.count(202) == 5 and statuses.count(503) == 15
+    assert jobs.pending == 5
+
+
+def test_job_store_is_fair_between_users():
+    jobs = master_agent.JobStore(max_pending=100, max_pending_per_user=3)
+    for n in range(3):
+        jobs.create("busy", f"busy{n}", lambda: 1)
+    with pytest.raises(master_agent.Overloaded) as shed:
+        jobs.create("busy", "busy3", lambda: 1)
+    assert shed.value.status == 429
+    jobs.create("quiet", "quiet0", lambda: 1)
+
+    # The quiet user's job runs second, not behind the busy user's backlog
+    order = [jobs.take()[1] for _ in range(4)]
+    assert order == ["busy0", "quiet0", "busy1", "busy2"]
+
+
+def test_stream_releases_admission_slot(client):
+    with client.post("/process/stream", json=payload) as res:
+        res.get_data()
+    assert client.get("/admission/stats").json["inflight"] == 0
+
+
+def test_admission_is_fair_and_sheds():
+    import threading
+    admission = master_agent.AdmissionController(max_inflight=1, max_queued=4, max_queued_per_user=3)
+    admission.acquire("first")
+    order = []
+
+    def wait(user_id):
+        admission.acquire(user_id, timeout=5)
+        order.append(user_id)
+
+    threads = []
+    for user_id in ["chatty", "chatty", "chatty", "quiet"]:
+        threads.append(threading.Thread(target=wait, args=(user_id,)))
+        threads[-1].start()
+        while admission.queued < len(threads):
+            pass
+
+    with pytest.raises(master_agent.Overloaded) as shed:
+        admission.acquire("chatty")
+    assert shed.value.status == 429
+    with pytest.raises(master_agent.Overloaded) as shed:
+        admission.acquire("other")
+    assert shed.value.status == 503
+
+    for served in range(1, len(threads) + 1):
+        admission.release(0.01)
+        while len(order) < served:
+            pass
+    assert order == ["chatty", "quiet", "chatty", "chatty"]
+
+
+class CountingLLM:
+    name, model, api_url = "fake", "fake-1", "memory://"
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, prompt):
+        self.calls += 1
+        return f"Answer number {self.calls}"
+
+    def close(self):
+        pass
+
+
+def test_repeated_question_hits_answer_cache():
+    app = master_agent.create_app()
+    client = app.test_client()
+    answer_agent = app.extensions["agent"].answer.agent
+    answer_agent.llm = CountingLLM()
+    try:
+        message = {"message": "What is memoization?", "user_id": "cache-tester"}
+        first = client.post("/process", json=message).json
+        # Interactions are saved in the background; wait until the first one is stored
+        memory = app.extensions["agent"].memory.agent
+        for _ in range(100):
+            if memory.get_user_memory("cache-tester")["total_interactions"]:
+                break
+            time.sleep(0.05)
+        second = client.post("/process", json=message).json
+        # The second ask sees the first in its history, with a higher interaction count
+        assert second["answer"] == first["answer"] == "Answer number 1"
+        assert answer_agent.llm.calls == 1
+        assert answer_agent.cache.stats["hits_exact"] == 1
+    finally:
+        app.extensions["agent"].close()
+
+
+def test_answer_cache_is_not_shared_between_users():
+    app = master_agent.create_app()
+    client = app.test_client()
+    answer_agent = app.extensions["agent"].answer.agent
+    answer_agent.llm = CountingLLM()
+    try:
+        # Both users are new, so only the user id tells their contexts apart
+        alice = client.post("/process", json={"message": "What is Python?", "user_id": "cache-alice"}).json
+        bob = client.post("/process", json={"message": "What is Python?", "user_id": "cache-bob"}).json
+        assert alice["answer"] != bob["answer"]
+        assert answer_agent.llm.calls == 2
+        assert answer_agent.cache.stats["hits_exact"] == 0
+    finally:
+        app.extensions["agent"].close()
+
+
+class BreakingStreamLLM(CountingLLM):
+    def stream(self, prompt):
+        yield "Recursion is when"
+        raise ConnectionError("connection dropped")
+
+
+def test_cut_off_stream_is_not_saved():
+    app = master_agent.create_app()
+    client = app.test_client()
+    master = app.extensions["agent"]
+    master.answer.agent.llm = BreakingStreamLLM()
+    try:
+        message = {"message": "What is recursion?", "user_id": "stream-cut"}
+        with client.post("/process/stream", json=message) as res:
+            body = res.get_data(as_text=True)
+        events = [json.loads(line[len("data:"):]) for line in body.splitlines() if line.startswith("data:")]
+        assert events[-2]["token"] == "Recursion is when"
+        assert events[-1]["status"] == "error"
+        assert "event: done" not in body
+
+        master.save_executor.submit(lambda: None).result()
+        assert master.memory.agent.get_user_memory("stream-cut")["total_interactions"] == 0
+    finally:
+        master.close()
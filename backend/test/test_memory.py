@@ -1,13 +1,258 @@
 # test/test_memory.py
-import requests
-
-# 1. Save an interaction
-requests.post("http://localhost:5001/save_interaction", json={
-    "user_id": "ali123",
-    "question": "What's the weather?",
-    "answer": "It's sunny today."
-})
-
-# 2. Get memory
-res = requests.get("http://localhost:5001/get_memory/ali123")
-print(res.json())
+import os
+import json
+import pytest
+
+import memory_agent
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = memory_agent.create_app(os.path.join(tmp_path, "memory.db"))
+    yield app.test_client()
+    app.extensions["agent"].close()
+
+
+def test_save_and_get_memory(client):
+    # 1. Save an interaction
+    res = client.post("/save_interaction", json={
+        "user_id": "ali123",
+        "question": "What's the weather?",
+        "answer": "It's sunny today."
+    })
+    assert res.status_code == 200
+
+    # 2. Get memory
+    memory = client.get("/get_memory/ali123").json
+    assert memory["total_interactions"] == 1
+    assert memory["recent_interactions"][0]["answer"] == "It's sunny today."
+
+
+def test_pool_reuses_connections_of_exited_threads(tmp_path):
+    import threading
+
+    pool = memory_agent.ConnectionPool(os.path.join(tmp_path, "pool.db"), max_idle=2)
+    for _ in range(3):
+        threads = [threading.Thread(target=lambda: pool.get().execute("SELECT 1")) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(pool._connections) <= 2
+    pool.close_all()
+
+
+def test_save_interaction_requires_fields(client):
+    assert client.post("/save_interaction", json={"user_id": "ali123"}).status_code == 400
+    assert client.post("/save_interaction", json={
+        "user_id": "ali123", "question": {"text": "Hi?"}, "answer": "Hello."
+    }).status_code == 400
+
+
+def test_queued_write_is_visible_for_uncached_user(tmp_path):
+    import threading
+    agent = memory_agent.MemoryAgent(os.path.join(tmp_path, "memory.db"), write_behind=True,
+                                     maintenance_interval=0, vectors=False)
+    try:
+        agent.save_interaction("regular", "Old question?", "Old answer.")
+        # Hold the flush so the rows are still queued while we read
+        release = threading.Event()
+        flush = agent.writer._flush
+        agent.writer._flush = lambda batch: (release.wait(5), flush(batch))[1]
+
+        agent.queue_interaction("newbie", "First question?", "First answer.")
+        agent.queue_interaction("regular", "New question?", "New answer.")
+        assert agent.get_user_memory("newbie")["total_interactions"] == 1
+        memory = agent.get_user_memory("regular")
+        assert [i["question"] for i in memory["recent_interactions"]] == ["New question?", "Old question?"]
+
+        release.set()
+        agent.writer.join()
+        assert agent.get_user_memory("newbie")["total_interactions"] == 1
+    finally:
+        agent.close()
+
+
+def test_gzip_bodies_are_inflated_with_a_cap(client, monkeypatch):
+    import gzip
+    import wire
+
+    body = json.dumps({"user_id": "zip", "question": "Gzipped?", "answer": "Yes."}).encode()
+    headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    assert client.post("/save_interaction", data=gzip.compress(body), headers=headers).status_code == 200
+
+    monkeypatch.setattr(wire, "WIRE_MAX_BODY", 1024)
+    bomb = gzip.compress(b"[" + b" " * 10 ** 6 + b"]")
+    assert client.post("/save_interaction", data=bomb, headers=headers).status_code == 413
+    assert client.post("/save_interaction", data=b"not gzip", headers=headers).status_code == 400
+
+
+def test_failed_group_commit_keeps_good_rows(tmp_path):
+    agent = memory_agent.MemoryAgent(os.path.join(tmp_path, "memory.db"), write_behind=True,
+                                     maintenance_interval=0, vectors=False)
+    try:
+        # A row that slipped past validation must not take the rest of its batch down with it
+        agent.queue_interaction("alice", "What is WAL?", "Write-ahead logging.")
+        agent.queue_interaction("bob", {"text": "bad"}, "Unstorable.")
+        agent.writer.join()
+
+        memory = agent.get_user_memory("alice")
+        assert [i["question"] for i in memory["recent_interactions"]] == ["What is WAL?"]
+        assert agent.get_user_memory("bob")["total_interactions"] == 0
+    finally:
+        agent.close()
+
+
+def test_bulk_save_and_search(client):
+    res = client.post("/save_interactions", json={"interactions": [
+        {"user_id": "ali123", "question": "How do sqlite indexes work?", "answer": "B-trees."},
+        {"user_id": "sara", "question": "What is a flask blueprint?", "answer": "A group of routes."},
+    ]})
+    assert res.json["saved"] == 2
+
+    results = client.get("/search", query_string={"q": "sqlite"}).json["results"]
+    assert [r["user_id"] for r in results] == ["ali123"]
+    assert {u["user_id"] for u in client.get("/users").json["users"]} == {"ali123", "sara"}
+
+    for limit in (0, -5):
+        res = client.get("/search", query_string={"q": "sqlite", "limit": limit})
+        assert res.status_code == 200 and len(res.json["results"]) == 1
+    for cursor in ("not-a-cursor", memory_agent.encode_cursor(-1.5, 3)[:-4], memory_agent.encode_cursor("a", 1)):
+        assert client.get("/search", query_string={"q": "sqlite", "cursor": cursor}).status_code == 400
+
+
+def test_users_pagination_and_export(client):
+    client.post("/save_interactions", json={"interactions": [
+        {"user_id": f"user{n}", "question": f"Question {n}?", "answer": f"Answer {n}.",
+         "timestamp": f"2024-01-01T00:00:{n:02d}"}
+        for n in range(7)
+    ]})
+
+    seen, cursor = [], None
+    while True:
+        page = client.get("/users", query_string={"limit": 3, **({"cursor": cursor} if cursor else {})}).json
+        seen += [u["user_id"] for u in page["users"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"user{n}" for n in reversed(range(7))]
+    for cursor in ("garbage!!", memory_agent.encode_cursor(1), memory_agent.encode_cursor(1, "user3")):
+        assert client.get("/users", query_string={"cursor": cursor}).status_code == 400
+
+    lines = client.get("/export/users").get_data(as_text=True).splitlines()
+    assert [json.loads(line)["user_id"] for line in lines] == seen
+
+    client.post("/save_interaction", json={"user_id": "user3", "question": "Again?", "answer": "Yes."})
+    history = [json.loads(line) for line in client.get("/export/interactions/user3").get_data(as_text=True).splitlines()]
+    assert [h["question"] for h in history] == ["Question 3?", "Again?"]
+
+
+def test_retention_archives_old_interactions(client):
+    client.post("/save_interactions", json={"interactions": [
+        {"user_id": "ali123", "question": f"Topic {n}?", "answer": f"Answer {n}.",
+         "timestamp": f"2024-01-01T00:00:{n:02d}"}
+        for n in range(12)
+    ]})
+    assert client.put("/retention/ali123", json={"keep_last": 3}).json["keep_last"] == 3
+    for bad in ({"keep_last": True}, {"keep_days": False}, {"keep_last": -1}, {"keep_last": 2.5}):
+        assert client.put("/retention/ali123", json=bad).status_code == 400
+
+    agent = client.application.extensions["agent"]
+    status = agent.run_maintenance()
+    assert status["archived_interactions"] == 9
+
+    memory = client.get("/get_memory/ali123", query_string={"limit": 10}).json
+    assert [i["question"] for i in memory["recent_interactions"]] == ["Topic 11?", "Topic 10?", "Topic 9?"]
+    assert "- Topic 8?" in memory["summary"]
+
+    archived = client.get("/export/archive/ali123").get_data(as_text=True).splitlines()
+    assert [json.loads(line)["question"] for line in archived] == [f"Topic {n}?" for n in range(9)]
+    assert agent.run_maintenance()["archived_interactions"] == 0
+
+
+def test_stats_rollups(client):
+    client.post("/save_interactions", json={"interactions": [
+        {"user_id": "ali123", "question": "Why?", "answer": "Because."},
+        {"user_id": "sara", "question": "How?", "answer": "Like this."},
+    ]})
+    client.post("/save_interaction", json={"user_id": "ali123", "question": "When?", "answer": "Now."})
+
+    stats = client.get("/stats", query_string={"user_id": "ali123"}).json
+    assert stats["total_interactions"] == 3
+    assert stats["active_users"] == 2
+    assert sum(day["interactions"] for day in stats["daily"]) == 3
+    assert stats["user"]["interactions"] == 2
+
+    assert client.post("/stats/rebuild").json["interactions"] == 3
+    assert client.get("/stats", query_string={"user_id": "ali123"}).json == stats
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_recall_by_meaning(client, monkeypatch, use_numpy):
+    import vectors
+    if not use_numpy:
+        monkeypatch.setattr(vectors, "np", None)
+    elif vectors.np is None:
+        pytest.skip("numpy is not installed")
+
+    client.post("/save_interactions", json={"interactions": [
+        {"user_id": "ali123", "question": "How do recursive functions work?", "answer": "They call themselves."},
+        {"user_id": "ali123", "question": "What is a docker volume?", "answer": "Storage that outlives containers."},
+        {"user_id": "sara", "question": "Explain recursion again", "answer": "A base case stops it."},
+    ]})
+    client.application.extensions["agent"].vectors.sync()
+
+    results = client.get("/recall/ali123", query_string={"q": "recursion examples"}).json["results"]
+    assert [r["question"] for r in results] == ["How do recursive functions work?"]
+    assert client.get("/recall/ali123").status_code == 400
+
+    memory = client.get("/get_memory/ali123", query_string={"q": "containers"}).json
+    assert memory["relevant_interactions"][0]["question"] == "What is a docker volume?"
+
+
+def test_vector_compaction_drops_only_removed_rows(client):
+    agent = client.application.extensions["agent"]
+    client.post("/save_interactions", json={"interactions": [
+        {"user_id": f"user{n % 2}", "question": f"Question about topic{n} recursion", "answer": "Yes."}
+        for n in range(10)
+    ]})
+    agent.vectors.sync()
+    with agent.pool.transaction() as conn:
+        conn.execute("DELETE FROM interactions WHERE id % 3 = 0")
+
+    assert agent.vectors.compact() == 3
+    assert agent.vectors.count == 7
+    hits = agent.vectors.search("user0", "recursion", 10)
+    assert sorted(interaction_id for interaction_id, _ in hits) == [1, 5, 7]
+
+
+def test_sharded_agent_routes_and_merges(tmp_path):
+    import sharding
+
+    base = os.path.join(tmp_path, "memory.db")
+    single = memory_agent.MemoryAgent(base, write_behind=False, maintenance_interval=0)
+    single.save_interactions([(f"user{n}", f"How do shards work {n}?", "By hashing.", None) for n in range(20)])
+    single.close()
+
+    assert sharding.rebalance(base, 3) == 20
+    agent = sharding.ShardedMemoryAgent(base, 3, write_behind=False, maintenance_interval=0)
+    try:
+        assert agent.get_user_memory("user7")["total_interactions"] == 1
+        assert sum(len(shard.get_all_users(100)[0]) for shard in agent.shards.values()) == 20
+
+        users, cursor = agent.get_all_users(8)
+        while cursor:
+            page, cursor = agent.get_all_users(8, cursor)
+            users += page
+        assert sorted(u["user_id"] for u in users) == sorted(f"user{n}" for n in range(20))
+
+        results, cursor = agent.search_interactions("shards", 15)
+        more, cursor = agent.search_interactions("shards", 15, cursor=cursor)
+        assert cursor is None
+        assert len({r["user_id"] for r in results + more}) == 20
+        with pytest.raises(memory_agent.BadCursor):
+            agent.search_interactions("shards", 15, cursor=memory_agent.encode_cursor(1, 2))
+        with pytest.raises(memory_agent.BadCursor):
+            agent.get_all_users(8, memory_agent.encode_cursor(1))
+    finally:
+        agent.close()
@@ -0,0 +1,63 @@
+# test/test_replicas.py
+import time
+import pytest
+import requests
+
+from replicas import CircuitBreaker, ReplicaSet
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Answers by URL: an int is a status code, an exception is raised"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(url)
+        outcome = self.outcomes[url.split("/")[2]]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failures=2, cooldown=0.05)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()  # a single half-open trial
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_failover_skips_failing_replica():
+    session = FakeSession({"bad": 503, "good": 200})
+    replicas = ReplicaSet("answer", ["http://bad", "http://good"], session, health_interval=0)
+    bad = replicas.replicas[0]
+    bad.breaker = CircuitBreaker(failures=1, cooldown=60)
+    for _ in range(20):
+        with replicas.request("POST", "/answer") as response:
+            assert response.status_code == 200
+    assert session.calls.count("http://bad/answer") == 1
+    assert bad.breaker.state == "open"
+    assert all(replica.outstanding == 0 for replica in replicas.replicas)
+
+
+def test_no_failover_for_unsafe_calls():
+    session = FakeSession({"a": requests.ReadTimeout(), "b": requests.ReadTimeout()})
+    replicas = ReplicaSet("memory", ["http://a", "http://b"], session, health_interval=0)
+    with pytest.raises(requests.ReadTimeout):
+        with replicas.request("POST", "/save_interaction", idempotent=False):
+            pass
+    assert len(session.calls) == 1
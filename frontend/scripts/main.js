@@ -7,6 +7,34 @@ function addMessage(text, sender) {
   msg.innerText = text;
   chatLog.appendChild(msg);
   chatLog.scrollTop = chatLog.scrollHeight;
+  return msg;
+}
+
+// Read server-sent events from a fetch() body, calling onEvent(event, data)
+async function readEvents(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
 }
 
 async function sendMessage() {
@@ -18,14 +46,25 @@ async function sendMessage() {
   input.value = "";
 
   try {
-    const res = await fetch("http://localhost:5000/process", {
+    const res = await fetch("http://localhost:5000/process/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ message, user_id: userId })
     });
 
-    const data = await res.json();
-    addMessage("Aura: " + data.answer, "agent");
+    if (!res.ok || !res.body) throw new Error("Streaming failed: " + res.status);
+
+    // Show tokens as they arrive instead of waiting for the full answer
+    const chatLog = document.getElementById("chat-log");
+    const reply = addMessage("Aura: ", "agent");
+    let answer = "";
+    await readEvents(res, (event, data) => {
+      if (data.token) {
+        answer += data.token;
+        reply.innerText = "Aura: " + answer;
+        chatLog.scrollTop = chatLog.scrollHeight;
+      }
+    });
   } catch (err) {
     addMessage("Aura: Sorry, I'm offline or backend is unreachable.", "agent");
     console.error(err);